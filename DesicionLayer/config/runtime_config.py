@@ -15,4 +15,33 @@ class AgentRuntimeConfig:
 
     # 最大规划和反思触发步长
     reflect_min_interval_steps = 20
-    plan_min_interval_steps = 20
\ No newline at end of file
+    plan_min_interval_steps = 20
+
+
+    # LLM 后端：openai 为真实接口，mock 为本地确定性替身（离线压测用）
+    llm_backend: str = "openai"
+    mock_seed: int = 0
+    mock_latency_dist: str = "uniform"
+    mock_latency_s: float = 0.8
+    mock_latency_jitter_s: float = 0.3
+    mock_error_rate: float = 0.0
+
+    # 生存反射层：属性低于上面的阈值时跳过 LLM，本地直接给出动作
+    reflex_enabled: bool = True
+    reflex_sleep_minutes: float = 60
+
+    # 并发上限：同时决策的角色数、同时进行的 LLM 请求数、同时等待 Unity 回执的动作数
+    max_concurrent_agents: int = 32
+    max_concurrent_llm: int = 16
+    max_concurrent_unity: int = 32
+    # 超时（秒）
+    llm_timeout_s: float = 60.0
+    unity_ack_timeout_s: float = 25.0
+
+    # 调试日志：提示词写入后台线程，按运行分目录追加到 JSONL 分段文件；队列满时丢弃
+    debug_log_enabled: bool = True
+    debug_log_dir: str = "debug_log/runs"
+    debug_log_queue_size: int = 10000
+    debug_log_segment_bytes: int = 32 * 1024 * 1024
+    debug_log_compress: bool = False
+    debug_log_sample_rates: dict = {"prompt": 1.0}
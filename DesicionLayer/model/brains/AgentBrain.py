@@ -13,19 +13,19 @@ class Agent:
     actor: ActorState
     prompt_builder:PromptBuilder
 
-    def plan(self, obs:Any) -> None:
+    async def plan(self, obs:Any) -> None:
         prompt = self.prompt_builder.build_plan(obs)
-        plan = self.model.generate(prompt)
+        plan = await self.model.agenerate(prompt)
         self.prompt_builder.plan_txt = plan
 
-    def act(self, obs:Any) ->Dict|List:
+    async def act(self, obs:Any) ->Dict|List:
         prompt = self.prompt_builder.build_act(obs)
-        action = self.model.generate(prompt,restrict="json")
+        action = await self.model.agenerate(prompt,restrict="json")
         return action
 
-    def reflect(self, obs:Any) -> None:
+    async def reflect(self, obs:Any) -> None:
         prompt = self.prompt_builder.build_reflect(obs)
-        reflect = self.model.generate(prompt)
+        reflect = await self.model.agenerate(prompt)
         self.prompt_builder.reflect_txt = reflect
 
 
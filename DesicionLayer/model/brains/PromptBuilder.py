@@ -3,7 +3,28 @@
 import json
 import os
 from dataclasses import asdict, dataclass
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Mapping
+
+from common.prompt_stats import PrefixStats, estimate_tokens
+from runtime import log_sink
+
+
+# 前缀稳定模式下段落的排序：越静态越靠前；SYSTEM_KINDS 中的段落进入系统消息
+SECTION_RANK = {"info": 0, "rules": 1, "task": 2, "world": 3, "guide": 4, "memory": 5, "state": 6, "error": 7}
+SYSTEM_KINDS = ("info", "rules", "task")
+
+
+def _render_sections(sections: List["PromptSection"]) -> str:
+    parts: List[str] = []
+    for section in sections:
+        content = (section.content or "").strip()
+        if not content and not section.title:
+            continue
+        if section.title:
+            parts.append(f"{section.title}\n{content}".strip())
+        else:
+            parts.append(content)
+    return "\n\n".join(parts).strip()
 
 
 @dataclass
@@ -22,23 +43,27 @@ class PromptPacket:
     meta: Dict[str, Any]
 
     def render_for_llm(self) -> str:
-        parts: List[str] = []
-        for section in self.sections:
-            content = (section.content or "").strip()
-            if not content and not section.title:
-                continue
-            if section.title:
-                parts.append(f"{section.title}\n{content}".strip())
-            else:
-                parts.append(content)
-        return "\n\n".join(parts).strip()
+        return _render_sections(self.sections)
+
+    def render_messages(self) -> List[Dict[str, str]]:
+        """按 静态 → 易变 重排段落，静态部分作为系统消息以便供应商侧前缀缓存命中"""
+        ordered = sorted(self.sections, key=lambda s: SECTION_RANK.get(s.kind, len(SECTION_RANK)))
+        system = [s for s in ordered if s.kind in SYSTEM_KINDS]
+        user = [s for s in ordered if s.kind not in SYSTEM_KINDS]
+        return [
+            {"role": "system", "content": _render_sections(system)},
+            {"role": "user", "content": _render_sections(user)},
+        ]
 
 
 class PromptBuilder:
-    def __init__(self) -> None:
+    def __init__(self, prefix_stable: bool = False) -> None:
         self.plan_txt: str = ""
         self.reflect_txt: str = ""
         self.error_log: str = ""
+        # 前缀稳定模式下 get_* 返回 [system, user] 消息列表而不是单个字符串
+        self.prefix_stable = prefix_stable
+        self.prefix_stats = PrefixStats()
 
     def _mkdir(self, path: str) -> None:
         if not os.path.exists(path):
@@ -65,18 +90,25 @@ class PromptBuilder:
             meta=meta,
         )
 
-    def _write_prompt_log(self, packet: PromptPacket) -> None:
-        base_dir = "debug_log/prompt"
-        self._mkdir(base_dir)
-        fname_base = f"{packet.prompt_type}_{packet.actor_id}_{packet.created_at}"
-
-        md_path = os.path.join(base_dir, f"{fname_base}.md")
-        with open(md_path, "w", encoding="utf-8") as f:
-            f.write(packet.render_for_llm())
+    def _emit(self, packet: PromptPacket) -> str | List[Dict[str, str]]:
+        if self.prefix_stable:
+            prompt: str | List[Dict[str, str]] = packet.render_messages()
+            text = "\n".join(m["content"] for m in prompt)
+        else:
+            prompt = text = packet.render_for_llm()
+        packet.meta["shared_prefix_tokens"] = self.prefix_stats.observe(packet.prompt_type, text)
+        self._write_prompt_log(packet)
+        return prompt
 
-        json_path = os.path.join(base_dir, f"{fname_base}.json")
-        with open(json_path, "w", encoding="utf-8") as f:
-            json.dump(asdict(packet), f, ensure_ascii=False, indent=2)
+    def _write_prompt_log(self, packet: PromptPacket) -> None:
+        # 交给后台日志线程，不在决策路径上写文件
+        log_sink.emit(
+            "prompt",
+            kind=packet.prompt_type,
+            actor_id=packet.actor_id,
+            text=packet.render_for_llm(),
+            packet=asdict(packet),
+        )
 
     def _format_inventory(self, inventory_snapshot: Any) -> str:
         if inventory_snapshot is None:
@@ -142,7 +174,7 @@ class PromptBuilder:
         catalog_locations = (getattr(obs, "catalog_snapshot", {}) or {}).get("locations", {}) or {}
 
         for loc_id, loc_obs in location_snapshot.items():
-            if isinstance(loc_obs, dict) and "market" in loc_obs:
+            if isinstance(loc_obs, Mapping) and "market" in loc_obs:
                 return loc_id
         for loc_id, loc_def in catalog_locations.items():
             name = str(loc_def.get("name", "")).lower()
@@ -224,11 +256,11 @@ class PromptBuilder:
         ]
         return "\n".join(lines)
 
-    def get_top_level_plan(self, obs: Any) -> str:
+    def get_top_level_plan(self, obs: Any) -> str | List[Dict[str, str]]:
         sections: List[PromptSection] = []
         sections += self._build_base_sections(obs)
         sections.append(self._sec("## 上次反思", self.reflect_txt or "暂无", "memory"))
-        sections.append(self._sec("## 地点信息", self._format_locations_info(obs), "state"))
+        sections.append(self._sec("## 地点信息", self._format_locations_info(obs), "world"))
 
         task = "\n".join(
             [
@@ -241,10 +273,9 @@ class PromptBuilder:
         sections.append(self._sec("## 任务", task, "task"))
 
         packet = self._packet("plan", obs, sections)
-        self._write_prompt_log(packet)
-        return packet.render_for_llm()
+        return self._emit(packet)
 
-    def get_local_action(self, obs: Any) -> str:
+    def get_local_action(self, obs: Any) -> str | List[Dict[str, str]]:
         sections: List[PromptSection] = []
         sections += self._build_base_sections(obs)
 
@@ -286,10 +317,9 @@ class PromptBuilder:
             sections.append(self._sec("## 上一步错误", self.error_log, "error"))
 
         packet = self._packet("act", obs, sections)
-        self._write_prompt_log(packet)
-        return packet.render_for_llm()
+        return self._emit(packet)
 
-    def get_reflection_and_summary(self, obs: Any) -> str:
+    def get_reflection_and_summary(self, obs: Any) -> str | List[Dict[str, str]]:
         sections: List[PromptSection] = []
         sections += self._build_base_sections(obs)
 
@@ -311,15 +341,14 @@ class PromptBuilder:
         sections.append(self._sec("## 任务", task, "task"))
 
         packet = self._packet("summary", obs, sections)
-        self._write_prompt_log(packet)
-        return packet.render_for_llm()
+        return self._emit(packet)
 
     # Compatibility for AgentBrain current API
-    def build_plan(self, obs: Any) -> str:
+    def build_plan(self, obs: Any) -> str | List[Dict[str, str]]:
         return self.get_top_level_plan(obs)
 
-    def build_act(self, obs: Any) -> str:
+    def build_act(self, obs: Any) -> str | List[Dict[str, str]]:
         return self.get_local_action(obs)
 
-    def build_reflect(self, obs: Any) -> str:
+    def build_reflect(self, obs: Any) -> str | List[Dict[str, str]]:
         return self.get_reflection_and_summary(obs)
@@ -1,5 +1,5 @@
 from dataclasses import dataclass 
-from typing import Optional,Dict,Any 
+from typing import Any, Callable, Dict, Optional
 
 ActorId = str 
 
@@ -8,4 +8,10 @@ class ActorDef:
     id:ActorId
     name:str 
     description:str=""
-    skill:function=None
\ No newline at end of file
+    skill:Optional[Callable[..., Any]]=None
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "description": self.description
+        }
\ No newline at end of file
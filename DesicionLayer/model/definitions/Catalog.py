@@ -1,8 +1,31 @@
-from dataclasses import dataclass
+"""
+静态定义表（物品、地点、角色）。
+
+定义都是不可变的，快照在加载时（以及 reload 热更新时）构建一次，以只读映射的形式共享；
+同时预先计算常用的派生视图：
+- items_by_effect：属性 -> 能回复该属性的物品，按基础价格从低到高；
+- items_by_category：类别 -> 物品；
+- items_by_price_band：价格档 -> 物品，档位见 PRICE_BANDS。
+每次 reload 后 version 递增，世界快照据此重建定义表部分。
+"""
+import sys
+from dataclasses import dataclass, field
+from types import MappingProxyType
 from model.definitions.ItemDef import ItemId, ItemDef
 from model.definitions.ActorDef import ActorId, ActorDef
 from model.definitions.LocationDef import LocationId, LocationDef
-from typing import Dict, Any
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+
+# (档位名, 基础价格上限)，按上限升序；价格不超过上限即落入该档
+PRICE_BANDS: Tuple[Tuple[str, float], ...] = (("低价", 10.0), ("中价", 50.0), ("高价", float("inf")))
+
+
+def _freeze(snapshot: Dict[str, Any]) -> Mapping[str, Any]:
+    return MappingProxyType({sys.intern(k): v for k, v in snapshot.items()})
+
+
+def _group(groups: Dict[str, List[ItemId]]) -> Mapping[str, Tuple[ItemId, ...]]:
+    return MappingProxyType({k: tuple(v) for k, v in groups.items()})
 
 
 @dataclass(slots=True)
@@ -10,6 +33,17 @@ class Catalog:
     items: Dict[ItemId, ItemDef]
     locations: Dict[LocationId, LocationDef]
     actors: Dict[ActorId, ActorDef]
+    price_bands: Tuple[Tuple[str, float], ...] = PRICE_BANDS
+
+    version: int = field(default=0, init=False)
+    item_ids: Tuple[ItemId, ...] = field(init=False)
+    items_by_effect: Mapping[str, Tuple[ItemId, ...]] = field(init=False)
+    items_by_category: Mapping[str, Tuple[ItemId, ...]] = field(init=False)
+    items_by_price_band: Mapping[str, Tuple[ItemId, ...]] = field(init=False)
+    _snapshot: Mapping[str, Any] = field(init=False, repr=False)
+
+    def __post_init__(self):
+        self._build()
 
     def item(self, item_id: ItemId) -> ItemDef:
         return self.items[item_id]
@@ -19,9 +53,55 @@ class Catalog:
     
     def actor(self,actor_id:ActorId) -> ActorDef:
         return self.actors[actor_id]    
-    def snapshot(self) -> Dict[str, Any]:
-        return {
-            "items": {k: v.snapshot() for k, v in self.items.items()},
-            "locations": {k: v.snapshot() for k, v in self.locations.items()},
-            "actors": {k: v.snapshot() for k, v in self.actors.items()},
-        }
\ No newline at end of file
+
+    def snapshot(self) -> Mapping[str, Any]:
+        """预先构建的只读快照，所有调用方共享同一对象"""
+        return self._snapshot
+
+    def price_band(self, item_id: ItemId) -> str:
+        price = self.items[item_id].base_price
+        for band, upper in self.price_bands:
+            if price <= upper:
+                return band
+        return self.price_bands[-1][0]
+
+    def reload(
+        self,
+        items: Optional[Dict[ItemId, ItemDef]] = None,
+        locations: Optional[Dict[LocationId, LocationDef]] = None,
+        actors: Optional[Dict[ActorId, ActorDef]] = None,
+    ) -> None:
+        """热更新定义，未传入的部分保持不变；重建快照与派生视图并递增 version"""
+        if items is not None:
+            self.items = items
+        if locations is not None:
+            self.locations = locations
+        if actors is not None:
+            self.actors = actors
+        self._build()
+        self.version += 1
+
+    def _build(self) -> None:
+        self.item_ids = tuple(sys.intern(k) for k in self.items)
+
+        by_effect: Dict[str, List[ItemId]] = {}
+        by_category: Dict[str, List[ItemId]] = {}
+        by_band: Dict[str, List[ItemId]] = {band: [] for band, _ in self.price_bands}
+        for item_id in sorted(self.item_ids, key=lambda k: (self.items[k].base_price, k)):
+            item = self.items[item_id]
+            for effect, value in (item.effects or {}).items():
+                if float(value or 0) > 0:
+                    by_effect.setdefault(sys.intern(effect), []).append(item_id)
+            by_category.setdefault(item.category, []).append(item_id)
+            by_band[self.price_band(item_id)].append(item_id)
+        self.items_by_effect = _group(by_effect)
+        self.items_by_category = _group(by_category)
+        self.items_by_price_band = _group(by_band)
+        self._snapshot = MappingProxyType({
+            "items": MappingProxyType({k: _freeze(v.snapshot()) for k, v in self.items.items()}),
+            "locations": MappingProxyType({k: _freeze(v.snapshot()) for k, v in self.locations.items()}),
+            "actors": MappingProxyType({k: _freeze(v.snapshot()) for k, v in self.actors.items()}),
+            "items_by_effect": self.items_by_effect,
+            "items_by_category": self.items_by_category,
+            "items_by_price_band": self.items_by_price_band,
+        })
\ No newline at end of file
@@ -1,6 +1,5 @@
 from dataclasses import dataclass,field
-from ItemDef import ItemId
-from ItemDef import ItemId
+from model.definitions.ItemDef import ItemId
 from typing import Dict
 
 @dataclass(slots=True)
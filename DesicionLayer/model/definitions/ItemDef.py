@@ -1,4 +1,4 @@
-from dataclasses import dataclass 
+from dataclasses import dataclass, field
 from typing import Dict,Any
 
 ItemId = str 
@@ -8,8 +8,10 @@ class ItemDef:
     id: ItemId
     name: str
     description: str = ""
-    effects: Dict[str, str] = None  
+    # 属性名 -> 每个物品的回复量，例如 {"hunger": 30}
+    effects: Dict[str, float] = field(default_factory=dict)
     base_price: float = 0.0
+    category: str = ""
     
 
     def snapshot(self) -> Dict[str, Any]:
@@ -17,10 +19,8 @@ class ItemDef:
             "name": self.name,
             "description":self.description,
             "base_price":self.base_price,
+            "category":self.category,
         }
-        for effect,value in self.effects.items():
+        for effect,value in (self.effects or {}).items():
             snapshot[effect] = value
-
-
-
-
+        return snapshot
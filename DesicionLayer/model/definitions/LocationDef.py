@@ -3,7 +3,7 @@ from typing import Dict,Any
 
 LocationId = str
 
-@dataclass(forzen=True,slots=True)
+@dataclass(frozen=True,slots=True)
 class LocationDef: 
     id: LocationId
     name: str
@@ -0,0 +1,101 @@
+from __future__ import annotations
+import asyncio
+import json
+import random
+import re
+import time
+from types import SimpleNamespace
+from typing import Any, Dict, Optional
+from model.definitions.OpenAIModel import LLM
+from model.definitions.PromptCache import PromptCache
+from common.mock_llm import MockLLMError, maybe_fail, prompt_rng, sample_latency
+
+
+_ATTR_RE = re.compile(r"饥饿\s*(-?[\d.]+)，口渴\s*(-?[\d.]+)，疲劳\s*(-?[\d.]+)")
+_MONEY_RE = re.compile(r"金钱：(-?[\d.]+)")
+_MARKET_RE = re.compile(r"^- .+?\((.+?)\) \| 库存 (\d+) \| 价格 ([\d.]+)", re.M)
+
+
+class MockLLM(LLM):
+    """
+    本地确定性 LLM 替身，接口与 LLM 相同，不访问网络。
+    根据提示词中的角色状态生成动作 JSON / 计划 / 反思文本；同一 seed + 同一提示词结果固定。
+    """
+
+    def __init__(
+        self,
+        model_name: str = "mock-llm",
+        seed: int = 0,
+        latency_dist: str = "uniform",
+        latency: float = 0.8,
+        latency_jitter: float = 0.3,
+        error_rate: float = 0.0,
+        cache: Optional[PromptCache] = None,
+    ):
+        super().__init__(model_name=model_name, api_key=None, cache=cache)
+        self.seed = seed
+        self.latency_dist = latency_dist
+        self.latency = latency
+        self.latency_jitter = latency_jitter
+        self.error_rate = error_rate
+
+    def _rng(self, kwargs: Dict[str, Any]) -> random.Random:
+        return prompt_rng(self.seed, json.dumps(kwargs, ensure_ascii=False, sort_keys=True))
+
+    def _latency(self, rng: random.Random) -> float:
+        return sample_latency(rng, self.latency_dist, self.latency, self.latency_jitter)
+
+    def _create(self, kwargs: Dict[str, Any]) -> Any:
+        rng = self._rng(kwargs)
+        time.sleep(self._latency(rng))
+        return self._respond(kwargs, rng)
+
+    async def _acreate(self, kwargs: Dict[str, Any]) -> Any:
+        rng = self._rng(kwargs)
+        await asyncio.sleep(self._latency(rng))
+        return self._respond(kwargs, rng)
+
+    def _respond(self, kwargs: Dict[str, Any], rng: random.Random) -> Any:
+        maybe_fail(rng, self.error_rate)
+        text = "\n".join(m["content"] for m in kwargs["messages"])
+        if kwargs.get("response_format", {}).get("type") == "json_object":
+            content = json.dumps(self._action(text), ensure_ascii=False)
+        elif "请制定接下来几个小时的计划" in text:
+            content = "我接下来应该先保证饮水和食物充足，再去市场观察价格，低买高卖。"
+        else:
+            content = "目前按计划行动，生存属性稳定；需要继续关注价格变化。"
+        usage = SimpleNamespace(
+            prompt_tokens=len(text),
+            completion_tokens=len(content),
+            prompt_tokens_details=SimpleNamespace(cached_tokens=0),
+        )
+        message = SimpleNamespace(content=content)
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)], usage=usage)
+
+    def _action(self, text: str) -> Dict[str, Any]:
+        attrs = _ATTR_RE.search(text)
+        hunger, thirst, fatigue = (float(x) for x in attrs.groups()) if attrs else (100.0, 100.0, 100.0)
+        money = _MONEY_RE.search(text)
+        money = float(money.group(1)) if money else 0.0
+        market = {m.group(1): (int(m.group(2)), float(m.group(3))) for m in _MARKET_RE.finditer(text)}
+        if fatigue < 20:
+            return {"type": "sleep", "minutes": 60}
+        if min(hunger, thirst) < 40:
+            cheapest = sorted((price, item) for item, (qty, price) in market.items() if qty > 0 and price <= money)
+            if cheapest:
+                return {"type": "trade", "mode": "buy", "item": cheapest[0][1], "qty": 1}
+        return {"type": "wait", "seconds": 5}
+
+
+def make_llm(config: Any, cache: Optional[PromptCache] = None) -> LLM:
+    """按 AgentRuntimeConfig.llm_backend 创建真实 LLM 或本地替身"""
+    if getattr(config, "llm_backend", "openai") == "mock":
+        return MockLLM(
+            seed=config.mock_seed,
+            latency_dist=config.mock_latency_dist,
+            latency=config.mock_latency_s,
+            latency_jitter=config.mock_latency_jitter_s,
+            error_rate=config.mock_error_rate,
+            cache=cache,
+        )
+    return LLM(cache=cache)
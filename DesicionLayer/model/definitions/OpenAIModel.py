@@ -1,7 +1,40 @@
 from __future__ import annotations
+import json
 import os
-from typing import Optional, Any
-from openai import OpenAI
+from typing import Optional, Any, Dict, List, Union
+import httpx
+from openai import OpenAI, AsyncOpenAI, DefaultAsyncHttpxClient
+from model.definitions.PromptCache import PromptCache
+
+# 共享连接池上限
+MAX_CONNECTIONS = 200
+MAX_KEEPALIVE = 50
+
+# 同一 api_key 的所有 LLM 实例共用一个异步客户端（即一个连接池）
+_ASYNC_CLIENTS: Dict[str, AsyncOpenAI] = {}
+
+
+def shared_async_client(api_key: Optional[str]) -> AsyncOpenAI:
+    key = api_key or ""
+    client = _ASYNC_CLIENTS.get(key)
+    if client is None:
+        client = AsyncOpenAI(
+            api_key=api_key,
+            http_client=DefaultAsyncHttpxClient(
+                limits=httpx.Limits(
+                    max_connections=MAX_CONNECTIONS,
+                    max_keepalive_connections=MAX_KEEPALIVE,
+                )
+            ),
+        )
+        _ASYNC_CLIENTS[key] = client
+    return client
+
+
+async def aclose_shared_clients() -> None:
+    for client in _ASYNC_CLIENTS.values():
+        await client.close()
+    _ASYNC_CLIENTS.clear()
 
 
 class LLM:
@@ -10,23 +43,38 @@ class LLM:
         self,
         model_name: str = "gpt-4.1-mini-2025-04-14",
         api_key: str = os.getenv("OPENAI_API_KEY"),
+        cache: Optional[PromptCache] = None,
     ):
-        self.client = OpenAI(api_key=api_key)
+        self.api_key = api_key
+        self._client: Optional[OpenAI] = None
         self.model_name = model_name
+        self.cache = cache
+        # 供应商返回的提示词 token 与前缀缓存命中 token 累计
+        self.prompt_tokens = 0
+        self.cached_tokens = 0
 
-    def generate(self, prompt: str, restrict: Optional[str] = None) -> Any:
-        """
-        restrict:
-            - None: 普通文本输出
-            - "json": 强制输出合法 JSON（API 级约束）
-        """
+    @property
+    def client(self) -> OpenAI:
+        # 第一次发请求时才创建客户端，不发请求的子类（如 MockLLM）不需要 api_key
+        if self._client is None:
+            self._client = OpenAI(api_key=self.api_key)
+        return self._client
 
-        # 基础参数
+    @property
+    def aclient(self) -> AsyncOpenAI:
+        return shared_async_client(self.api_key)
+
+    def _request(self, prompt: Union[str, List[Dict[str, str]]], restrict: Optional[str]) -> Dict[str, Any]:
+        # 基础参数；prompt 也可以是已经分好 system/user 的消息列表（前缀稳定布局）
+        if isinstance(prompt, list):
+            messages = prompt
+        else:
+            messages = [
+                {"role": "user", "content": prompt}
+            ]
         kwargs = {
             "model": self.model_name,
-            "messages": [
-                {"role": "user", "content": prompt}
-            ],
+            "messages": messages,
         }
 
         # JSON 强约束
@@ -34,20 +82,77 @@ class LLM:
             kwargs["response_format"] = {
                 "type": "json_object"
             }
+        return kwargs
 
-        response = self.client.chat.completions.create(**kwargs)
+    def _create(self, kwargs: Dict[str, Any]) -> Any:
+        return self.client.chat.completions.create(**kwargs)
 
-        content = response.choices[0].message.content
+    async def _acreate(self, kwargs: Dict[str, Any]) -> Any:
+        return await self.aclient.chat.completions.create(**kwargs)
 
+    def _cached(self, kwargs: Dict[str, Any]):
+        if self.cache is None:
+            return None, None
+        key = self.cache.make_key(kwargs["model"], kwargs["messages"], kwargs.get("response_format"))
+        return key, self.cache.get(key)
+
+    def _store(self, key: Optional[str], content: Optional[str]) -> None:
+        if key is not None and isinstance(content, str):
+            self.cache.put(key, content)
+
+    # 异步路径：SQLite 读写放到线程里，不阻塞事件循环
+    async def _acached(self, kwargs: Dict[str, Any]):
+        if self.cache is None:
+            return None, None
+        key = self.cache.make_key(kwargs["model"], kwargs["messages"], kwargs.get("response_format"))
+        return key, await self.cache.aget(key)
+
+    async def _astore(self, key: Optional[str], content: Optional[str]) -> None:
+        if key is not None and isinstance(content, str):
+            await self.cache.aput(key, content)
+
+    def _record_usage(self, response: Any) -> None:
+        usage = getattr(response, "usage", None)
+        if usage is None:
+            return
+        self.prompt_tokens += usage.prompt_tokens or 0
+        details = getattr(usage, "prompt_tokens_details", None)
+        self.cached_tokens += getattr(details, "cached_tokens", 0) or 0
+
+    def _finish(self, content: str, restrict: Optional[str]) -> Any:
         # 如果是 JSON 模式，直接反序列化更安全
         if restrict == "json":
-            import json
             return json.loads(content)
-
         return content
 
+    def generate(self, prompt: Union[str, List[Dict[str, str]]], restrict: Optional[str] = None) -> Any:
+        """
+        restrict:
+            - None: 普通文本输出
+            - "json": 强制输出合法 JSON（API 级约束）
+        """
+        kwargs = self._request(prompt, restrict)
+        key, content = self._cached(kwargs)
+        if content is None:
+            response = self._create(kwargs)
+            self._record_usage(response)
+            content = response.choices[0].message.content
+            self._store(key, content)
+        return self._finish(content, restrict)
+
+    async def agenerate(self, prompt: Union[str, List[Dict[str, str]]], restrict: Optional[str] = None) -> Any:
+        """generate 的异步版本，请求在事件循环上等待，走共享连接池"""
+        kwargs = self._request(prompt, restrict)
+        key, content = await self._acached(kwargs)
+        if content is None:
+            response = await self._acreate(kwargs)
+            self._record_usage(response)
+            content = response.choices[0].message.content
+            await self._astore(key, content)
+        return self._finish(content, restrict)
+
 
 
 if __name__ == "__main__":
     llm = LLM()
-    print(llm.generate("你好,请用json和我打招呼",restrict="json"))
\ No newline at end of file
+    print(llm.generate("你好,请用json和我打招呼",restrict="json"))
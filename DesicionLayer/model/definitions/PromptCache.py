@@ -0,0 +1,21 @@
+"""
+LLM 提示词 → 回复 的持久化缓存，实现见 common/prompt_cache.py（与 server 共用），这里只绑定默认参数。
+"""
+from __future__ import annotations
+
+from common.prompt_cache import PromptCache as _PromptCache
+
+CACHE_PATH = "debug_log/llm_cache.sqlite"
+CACHE_MAX_ENTRIES = 50000
+CACHE_MAX_BYTES = 256 * 1024 * 1024
+
+
+class PromptCache(_PromptCache):
+    def __init__(
+        self,
+        path: str = CACHE_PATH,
+        max_entries: int = CACHE_MAX_ENTRIES,
+        max_bytes: int = CACHE_MAX_BYTES,
+        readonly: bool = False,
+    ):
+        super().__init__(path, max_entries, max_bytes, readonly)
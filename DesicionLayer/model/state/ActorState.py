@@ -31,7 +31,7 @@ class ActorState:
     memory: List[str] = field(default_factory=list)
 
     # 人物的特殊概率加成或其它特殊处理配置
-    mods:List[Dict[str,Any]]
+    mods:List[Dict[str,Any]] = field(default_factory=list)
 
     def can_go(self, loc: LocationId) -> bool:
         return loc in self.unlocked_locations
\ No newline at end of file
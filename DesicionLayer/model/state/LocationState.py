@@ -11,7 +11,7 @@ class MarketComponent:
 
     def init_stock(self, catalog:Catalog):
         self.stock = {item_id:0 for item_id in catalog.item_ids}
-        self.price = {item_id:catalog.item(item_id).price for item_id in catalog.item_ids}
+        self.price = {item_id:catalog.item(item_id).base_price for item_id in catalog.item_ids}
     
     def observe(self) -> Dict[str,Any]:
         return {"stock":self.stock, "price":self.price}
@@ -28,7 +28,8 @@ class LocationState:
     
     
     def observe(self) -> Dict[str,Any]:
-        obs = {"id":self.id, "desp":self.desp}
+        # 地点描述属于静态定义，在 catalog_snapshot 中
+        obs = {"id":self.id}
         for name,c in self.component.items():
             obs[name] = c.observe()
         return obs
\ No newline at end of file
@@ -0,0 +1,125 @@
+"""
+世界共享状态的只读快照。
+
+WorldState 为每个可变部分维护版本号（见 WorldState.bump）：
+- "day"：日期；
+- "catalog"：静态定义表，取自 Catalog.version，reload 时递增；
+- "loc:<地点id>"：某个地点的组件（库存、价格等）。
+SnapshotManager 只重建版本变化过的部分，其余部分沿用上一份快照里的对象；
+所有部分都没变时直接返回同一个 WorldSnapshot。快照内部的字典都是只读视图，
+多个角色共享时不会被某一方改写。
+
+run_tick 开始时调用 pin()，本 tick 内所有角色拿到同一份快照，结束后 unpin()。
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import TYPE_CHECKING, Any, Dict, Mapping, Optional, Tuple
+
+if TYPE_CHECKING:
+    from model.state.WorldState import WorldState
+
+
+def loc_key(loc_id: Any) -> str:
+    """地点组件在 WorldState.versions 中的键"""
+    return f"loc:{loc_id}"
+
+
+def freeze(value: Any) -> Any:
+    """把嵌套的 dict / list 复制成只读结构"""
+    if isinstance(value, Mapping):
+        return MappingProxyType({k: freeze(v) for k, v in value.items()})
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze(v) for v in value)
+    if isinstance(value, set):
+        return frozenset(value)
+    return value
+
+
+@dataclass(frozen=True, slots=True)
+class WorldSnapshot:
+    day: int
+    location_snapshot: Mapping[str, Mapping[str, Any]]
+    catalog_snapshot: Mapping[str, Any]
+    # 构建这份快照时各部分的版本号，便于调试和比较
+    versions: Mapping[str, int]
+
+
+class SnapshotManager:
+    def __init__(self, world: WorldState):
+        self.world = world
+        self._locations: Dict[Any, Tuple[int, Mapping[str, Any]]] = {}
+        self._catalog: Optional[Tuple[int, Mapping[str, Any]]] = None
+        self._current: Optional[WorldSnapshot] = None
+        self._pinned: Optional[WorldSnapshot] = None
+        self.builds = 0
+        self.reused = 0
+        self.location_builds = 0
+        self.catalog_builds = 0
+
+    def get(self) -> WorldSnapshot:
+        """当前世界的快照；固定期间返回固定的那一份"""
+        if self._pinned is not None:
+            self.reused += 1
+            return self._pinned
+        versions = self._versions()
+        if self._current is not None and self._current.versions == versions:
+            self.reused += 1
+            return self._current
+        self._current = self._build(versions)
+        self.builds += 1
+        return self._current
+
+    def pin(self) -> WorldSnapshot:
+        """固定当前快照，直到 unpin；同一 tick 内的角色观察到同一份世界"""
+        self._pinned = None
+        self._pinned = self.get()
+        return self._pinned
+
+    def unpin(self) -> None:
+        self._pinned = None
+
+    def _versions(self) -> Mapping[str, int]:
+        world = self.world
+        versions = {"day": world.day, "catalog": world.catalog.version}
+        for loc_id in world.locations:
+            key = loc_key(loc_id)
+            versions[key] = world.version(key)
+        return versions
+
+    def _build(self, versions: Mapping[str, int]) -> WorldSnapshot:
+        world = self.world
+        catalog_version = versions["catalog"]
+        if self._catalog is None or self._catalog[0] != catalog_version:
+            # Catalog 的快照在加载时已构建为只读映射，直接共享
+            self._catalog = (catalog_version, world.catalog.snapshot())
+            self.catalog_builds += 1
+
+        locations = {}
+        for loc_id, location in world.locations.items():
+            version = versions[loc_key(loc_id)]
+            cached = self._locations.get(loc_id)
+            if cached is None or cached[0] != version:
+                cached = (version, freeze(location.observe()))
+                self._locations[loc_id] = cached
+                self.location_builds += 1
+            locations[loc_id] = cached[1]
+        # 已删除的地点不再保留
+        for loc_id in self._locations.keys() - locations.keys():
+            del self._locations[loc_id]
+
+        return WorldSnapshot(
+            day=world.day,
+            location_snapshot=MappingProxyType(locations),
+            catalog_snapshot=self._catalog[1],
+            versions=MappingProxyType(dict(versions)),
+        )
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "builds": self.builds,
+            "reused": self.reused,
+            "location_builds": self.location_builds,
+            "catalog_builds": self.catalog_builds,
+        }
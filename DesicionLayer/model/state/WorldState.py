@@ -1,25 +1,46 @@
 from typing import Dict
 from datetime import datetime
 from dataclasses import dataclass,field
+from typing import Any
 from model.definitions.Catalog import Catalog
 from model.state.ActorState import ActorState
 from model.definitions.LocationDef import LocationId
 from model.definitions.ActorDef import ActorId
 from model.state.LocationState import LocationState
+from model.state.WorldSnapshot import SnapshotManager, WorldSnapshot, loc_key
 from actions.hooks import ON_DAILY_SETTLE
 
 @dataclass(slots=True)
 class WorldState:
-    day:int = 0
     catalog:Catalog
+    day:int = 0
     actors:Dict[ActorId,ActorState] = field(default_factory=dict)
     locations:Dict[LocationId,LocationState] = field(default_factory=dict)
+    # 共享状态各部分的版本号，修改后调用 bump；快照只重建版本变化的部分
+    versions:Dict[str,int] = field(default_factory=dict)
+    snapshots:SnapshotManager = field(init=False)
+
+    def __post_init__(self):
+        self.snapshots = SnapshotManager(self)
 
     def actor(self, actor_id:ActorId) -> ActorState:
         return self.actors[actor_id]
     
     def loc(self, loc_id:LocationId) -> LocationState:
         return self.locations[loc_id]
+
+    def bump(self, key:str) -> None:
+        self.versions[key] = self.versions.get(key, 0) + 1
+
+    def version(self, key:str) -> int:
+        return self.versions.get(key, 0)
+
+    def touch_location(self, loc_id:LocationId) -> None:
+        """地点组件（库存、价格等）被修改后调用"""
+        self.bump(loc_key(loc_id))
+
+    def snapshot(self) -> WorldSnapshot:
+        return self.snapshots.get()
     
     def update_day(self):
 
@@ -29,11 +50,16 @@ class WorldState:
         最后执行每日结算操作。
         """
         self.day += 1  # 增加游戏天数
-        for location in self.locations.values():  # 遍历所有地点
+        for loc_id,location in self.locations.items():  # 遍历所有地点
             location.update_day()  # 对每个地点进行每日更新
+            self.touch_location(loc_id)
         ON_DAILY_SETTLE(self)
 
-    def observe(self,actor_id:ActorId):
+    def observe(self,actor_id:ActorId) -> Dict[str,Any]:
+        """
+        角色的观察：地点与定义表来自共享快照（所有角色同一对象），
+        只有角色自身的部分逐个计算
+        """
         actor = self.actor(actor_id)
         actor_snapshot = {
             "name":actor.name,
@@ -45,16 +71,13 @@ class WorldState:
             "fatigue":actor.attrs["fatigue"].current,
             "inventory":actor.inventory.snapshot(),
         }
-        location_snapshot = {}
-        for loc_id,location in self.locations.items():
-            location_snapshot[loc_id] = location.observe()
-        catalog_snapshot = self.catalog.snapshot()
+        shared = self.snapshot()
         working_events = [e.name for e in actor.working_events]
         return {
             "actor_snapshot": actor_snapshot,
-            "day": self.day,
-            "location_snapshot": location_snapshot,
-            "catalog_snapshot": catalog_snapshot,
+            "day": shared.day,
+            "location_snapshot": shared.location_snapshot,
+            "catalog_snapshot": shared.catalog_snapshot,
             "working_events": working_events
         }
          
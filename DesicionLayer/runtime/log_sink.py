@@ -0,0 +1,40 @@
+"""
+后台调试日志，实现见 common/log_sink.py（与 server 共用），这里按 AgentRuntimeConfig 创建共享实例。
+"""
+from __future__ import annotations
+
+from typing import Any, Dict, Optional
+
+from common.log_sink import LogSink, SharedSink
+from config.runtime_config import AgentRuntimeConfig
+
+
+def sink_from_config(config: Optional[AgentRuntimeConfig] = None) -> Optional[LogSink]:
+    """按配置创建日志实例；debug_log_enabled=False 时返回 None"""
+    config = config or AgentRuntimeConfig()
+    if not config.debug_log_enabled:
+        return None
+    return LogSink(
+        out_dir=config.debug_log_dir,
+        max_queue=config.debug_log_queue_size,
+        segment_bytes=config.debug_log_segment_bytes,
+        compress=config.debug_log_compress,
+        sample_rates=config.debug_log_sample_rates,
+    )
+
+
+_shared = SharedSink(sink_from_config)
+
+
+def get_sink() -> Optional[LogSink]:
+    """进程内共享的日志实例；debug_log_enabled=False 时返回 None"""
+    return _shared.get()
+
+
+def emit(stream: str, **record: Any) -> bool:
+    return _shared.emit(stream, **record)
+
+
+def close_sink() -> Optional[Dict[str, Any]]:
+    """关闭共享实例并返回最终统计；之后的 emit 会重新创建实例"""
+    return _shared.close()
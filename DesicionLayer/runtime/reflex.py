@@ -0,0 +1,92 @@
+from __future__ import annotations
+import time
+from typing import Any, Dict, Mapping, Optional, Tuple
+from config.runtime_config import AgentRuntimeConfig
+from model.definitions.Action import Action
+from common.reflex_stats import ReflexStats
+
+
+class ReflexEngine:
+    """
+    生存反射层：hunger_low / thirst_low / fatigue_low 触发时不调用 LLM，
+    直接根据观测给出最便宜的 consume / buy / sleep 动作；无法处理时返回 None。
+    """
+
+    def __init__(self, config: Optional[AgentRuntimeConfig] = None):
+        config = config or AgentRuntimeConfig()
+        self.thresholds = {
+            "hunger": config.hunger_low,
+            "thirst": config.thirst_low,
+            "fatigue": config.fatigue_low,
+        }
+        self.sleep_minutes = config.reflex_sleep_minutes
+        self.stats = ReflexStats()
+
+    def decide(self, obs: Any) -> Optional[Action]:
+        start = time.perf_counter()
+        actor = obs.actor_snapshot
+        critical = sorted(
+            (float(actor[attr]) - low, attr)
+            for attr, low in self.thresholds.items()
+            if attr in actor and float(actor[attr]) < low
+        )
+        for _, attr in critical:
+            action = self._fatigue() if attr == "fatigue" else self._supply(attr, obs)
+            if action is not None:
+                self.stats.record_reflex(attr, time.perf_counter() - start)
+                return action
+        return None
+
+    def _fatigue(self) -> Action:
+        return Action(name="sleep", params={"minutes": self.sleep_minutes})
+
+    def _supply(self, attr: str, obs: Any) -> Optional[Action]:
+        catalog = obs.catalog_snapshot or {}
+        items = catalog.get("items", {}) or {}
+        # 定义表预先按效果分好组；没有该视图时退回到逐个检查库存
+        candidates = (catalog.get("items_by_effect") or {}).get(attr)
+        best: Optional[Tuple[float, str]] = None
+        for item_id, qty in _inventory(obs.actor_snapshot.get("inventory")).items():
+            if qty > 0 and _effect(items.get(item_id), attr) > 0:
+                cost = float(items[item_id].get("base_price", 0) or 0)
+                if best is None or (cost, item_id) < best:
+                    best = (cost, item_id)
+        if best is not None:
+            return Action(name="consume", params={"item": best[1], "qty": 1})
+
+        money = float(obs.actor_snapshot.get("money", 0) or 0)
+        for loc in (obs.location_snapshot or {}).values():
+            market = (loc or {}).get("market") if isinstance(loc, Mapping) else None
+            if not market:
+                continue
+            stocks = market.get("stock") or {}
+            for item_id in (stocks if candidates is None else candidates):
+                stock = stocks.get(item_id, 0)
+                gain = _effect(items.get(item_id), attr)
+                price = float((market.get("price") or {}).get(item_id, 0) or 0)
+                if gain <= 0 or stock <= 0 or price > money:
+                    continue
+                if best is None or (price / gain, item_id) < best:
+                    best = (price / gain, item_id)
+        if best is not None:
+            return Action(name="trade", params={"mode": "buy", "item": best[1], "qty": 1})
+        return None
+
+
+def _inventory(snapshot: Any) -> Dict[str, int]:
+    """背包快照可能是 dict 或 Inventory.snapshot() 的 "面包x2,水x1" 字符串"""
+    if isinstance(snapshot, dict):
+        return {k: int(v) for k, v in snapshot.items()}
+    qty: Dict[str, int] = {}
+    for part in str(snapshot or "").split(","):
+        name, _, n = part.strip().rpartition("x")
+        if name and n.isdigit():
+            qty[name] = int(n)
+    return qty
+
+
+def _effect(item: Optional[Mapping[str, Any]], attr: str) -> float:
+    try:
+        return float((item or {}).get(attr, 0) or 0)
+    except (TypeError, ValueError):
+        return 0.0
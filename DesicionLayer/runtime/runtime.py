@@ -6,11 +6,13 @@ import time
 from model.state.action_result import ActionResult
 from model.state.WorldState import WorldState
 from model.brains.AgentBrain import Agent
+from model.definitions.OpenAIModel import aclose_shared_clients
 from actions.executor import ActionExecutor
 from config.runtime_config import AgentRuntimeConfig
 from model.definitions.LocationDef import LocationId
 from model.state.ActorState import ActorState  
 from  model.definitions.Action import Action
+from runtime.reflex import ReflexEngine
 
 
 logger = logging.getLogger(__name__)
@@ -38,12 +40,16 @@ class AgentRuntime:
         executor:ActionExecutor,
         config:Optional[AgentRuntimeConfig] = None,
         logger:Optional[Any] = None,
+        reflex:Optional[ReflexEngine] = None,
     ):  
         self.world = world
         self.agent = agent
         self.executor = executor
         self.config = config or AgentRuntimeConfig()
         self.logger = logger
+        if reflex is None and self.config.reflex_enabled:
+            reflex = ReflexEngine(self.config)
+        self.reflex = reflex
 
         self._actors:Dict[int,ActorState] = {}
 
@@ -107,8 +113,11 @@ class AgentRuntime:
                         logger.error(f"LLM error for actor {actor_id}: {e}")
 
             last_err:Optional[ActionResult] = None
-            for _ in range(self.config.max_action_retries + 1):
+            # 危险属性先走反射层，命中则不调用 LLM
+            proposal = self.reflex.decide(obs) if self.reflex is not None else None
+            for _ in range(0 if proposal is not None else self.config.max_action_retries + 1):
                 async with self._llm_sem:
+                    started = time.perf_counter()
                     try:
                         proposal = await asyncio.wait_for(
                             self.agent.act(obs),timeout=self.config.llm_timeout_s
@@ -123,9 +132,11 @@ class AgentRuntime:
                             False,code="CRASH",message=f"动作生成异常: {e}"
                         )
                         proposal = None
+                    if self.reflex is not None:
+                        self.reflex.stats.record_llm(time.perf_counter() - started)
                 
-                if proposal is None:
-                    continue
+                if proposal is not None:
+                    break
 
             if proposal is None:
                 res = last_err or ActionResult(False, code="NO_ACTION", msg="No valid action")
@@ -151,6 +162,10 @@ class AgentRuntime:
 
             return res
 
+    async def aclose(self) -> None:
+        """关闭 LLM 共享的异步连接池（程序退出时调用）"""
+        await aclose_shared_clients()
+
     def _ledger(self,actor_id:int,obs:Observation,action:Optional[Action],result:ActionResult):
         self.memory.append_ledger(actor_id,obs,{
             "day":str(obs.day),
@@ -164,5 +179,10 @@ class AgentRuntime:
     async def run_tick(self, *, dt: float = 1.0) -> None:
 
         actor_ids = self.world.list_actor_ids()
-        await asyncio.gather(*(self.tick_actor(aid) for aid in actor_ids))
+        # 本 tick 内所有角色观察同一份世界快照
+        self.world.snapshots.pin()
+        try:
+            await asyncio.gather(*(self.tick_actor(aid) for aid in actor_ids))
+        finally:
+            self.world.snapshots.unpin()
         self.world.step_time(dt)
\ No newline at end of file
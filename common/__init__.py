@@ -0,0 +1,9 @@
+"""
+server 与 DesicionLayer 两个应用共用的组件（只依赖标准库）。
+
+这里的实现不读取任何一方的配置，参数都由构造函数传入；各应用在自己的模块里按本地配置
+绑定默认值后再导出。
+
+使用前在仓库根目录执行一次 `pip install -e .`（见 pyproject.toml），两个应用都以自己的目录为
+工作目录运行，直接 `import common`。
+"""
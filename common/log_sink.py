@@ -0,0 +1,175 @@
+"""
+后台调试日志：提示词与模型回复不再在决策路径上逐条开新文件写盘。
+
+- `emit` 只把记录放进有界队列，立即返回；队列满时直接丢弃并计数，绝不阻塞 Agent；
+- 每类日志（prompt / resp）可以按比例采样；
+- 后台线程批量取出记录，追加到本次运行目录下的 JSONL 分段文件，
+  单段超过 segment_bytes 时轮转，可选 gzip 压缩。
+`SharedSink` 管理进程内共享的实例：第一次 `emit` 时用应用给的工厂函数按各自的配置创建，
+进程退出时自动关闭。
+"""
+from __future__ import annotations
+
+import atexit
+import gzip
+import json
+import logging
+import os
+import queue
+import random
+import threading
+import time
+from typing import Any, Callable, Dict, IO, Optional
+
+logger = logging.getLogger(__name__)
+
+# 每次最多合并写入的记录数
+WRITE_BATCH = 256
+_STOP = object()
+
+
+class LogSink:
+    def __init__(
+        self,
+        out_dir: str,
+        run_id: Optional[str] = None,
+        max_queue: int = 10000,
+        segment_bytes: int = 32 * 1024 * 1024,
+        compress: bool = False,
+        sample_rates: Optional[Dict[str, float]] = None,
+        rng: Optional[random.Random] = None,
+    ):
+        self.run_id = run_id or time.strftime("%Y%m%d%H%M%S")
+        self.run_dir = os.path.join(out_dir, self.run_id)
+        self.segment_bytes = segment_bytes
+        self.compress = compress
+        self.sample_rates = dict(sample_rates or {})
+        # 采样用的随机数流；由应用传入按运行种子派生的流，采样结果可复现
+        self._rng = rng if rng is not None else random.Random()
+        self._queue: queue.Queue = queue.Queue(maxsize=max_queue)
+        self._file: Optional[IO[str]] = None
+        self._segment = 0
+        self._segment_size = 0
+        self.emitted = 0
+        self.sampled_out = 0
+        self.dropped = 0
+        self.written = 0
+        self.errors = 0
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="debug-log-sink", daemon=True)
+        self._thread.start()
+
+    def emit(self, stream: str, **record: Any) -> bool:
+        """放入一条日志；被采样掉、队列已满或已关闭时返回 False"""
+        if self._closed:
+            return False
+        rate = self.sample_rates.get(stream, 1.0)
+        if rate < 1.0 and self._rng.random() >= rate:
+            self.sampled_out += 1
+            return False
+        record["stream"] = stream
+        record.setdefault("ts", time.time())
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+            return False
+        self.emitted += 1
+        return True
+
+    def _run(self) -> None:
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < WRITE_BATCH:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            stop = any(r is _STOP for r in batch)
+            self._write([r for r in batch if r is not _STOP])
+            if stop:
+                self._close_segment()
+                return
+
+    def _write(self, records) -> None:
+        if not records:
+            return
+        try:
+            lines = "".join(json.dumps(r, ensure_ascii=False, default=str) + "\n" for r in records)
+            if self._file is None or self._segment_size >= self.segment_bytes:
+                self._rotate()
+            self._file.write(lines)
+            self._file.flush()
+            self._segment_size += len(lines.encode("utf-8"))
+            self.written += len(records)
+        except Exception:
+            self.errors += 1
+            logger.exception("debug log write failed")
+
+    def _rotate(self) -> None:
+        self._close_segment()
+        os.makedirs(self.run_dir, exist_ok=True)
+        self._segment += 1
+        name = f"log-{self._segment:05d}.jsonl"
+        path = os.path.join(self.run_dir, name)
+        if self.compress:
+            self._file = gzip.open(path + ".gz", "at", encoding="utf-8")
+        else:
+            self._file = open(path, "a", encoding="utf-8")
+        self._segment_size = 0
+
+    def _close_segment(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def close(self, timeout: float = 5.0) -> None:
+        """写完队列中剩余的记录后停止后台线程"""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "run_dir": self.run_dir,
+            "emitted": self.emitted,
+            "written": self.written,
+            "sampled_out": self.sampled_out,
+            "dropped": self.dropped,
+            "errors": self.errors,
+            "pending": self._queue.qsize(),
+            "segments": self._segment,
+        }
+
+
+class SharedSink:
+    """进程内共享的 LogSink；factory 返回 None 表示调试日志关闭"""
+
+    def __init__(self, factory: Callable[[], Optional[LogSink]]):
+        self._factory = factory
+        self._sink: Optional[LogSink] = None
+        self._lock = threading.Lock()
+
+    def get(self) -> Optional[LogSink]:
+        if self._sink is None:
+            with self._lock:
+                if self._sink is None:
+                    self._sink = self._factory()
+                    if self._sink is not None:
+                        atexit.register(self._sink.close)
+        return self._sink
+
+    def emit(self, stream: str, **record: Any) -> bool:
+        sink = self.get()
+        return sink.emit(stream, **record) if sink is not None else False
+
+    def close(self) -> Optional[Dict[str, Any]]:
+        """关闭共享实例并返回最终统计；之后的 emit 会重新创建实例"""
+        with self._lock:
+            sink, self._sink = self._sink, None
+        if sink is None:
+            return None
+        sink.close()
+        return sink.stats()
@@ -0,0 +1,37 @@
+"""
+本地 LLM 替身共用的随机部分：按提示词取随机数生成器、采样延迟、按错误率模拟供应商错误。
+
+两个应用的替身各自按本地的提示词格式生成回复，这里只放与回复内容无关、必须保持一致的部分。
+同一 seed + 同一提示词得到同一个随机数生成器，回复与延迟都与并发调度顺序无关。
+"""
+from __future__ import annotations
+
+import hashlib
+import random
+
+
+class MockLLMError(Exception):
+    """模拟的供应商错误，status_code 与 OpenAI 的限流错误一致"""
+
+    status_code = 429
+
+
+def prompt_rng(seed: int, text: str) -> random.Random:
+    """每条提示词单独取一个随机数生成器，而不是共用一个流"""
+    digest = hashlib.sha256(f"{seed}:{text}".encode("utf-8")).digest()
+    return random.Random(int.from_bytes(digest[:8], "big"))
+
+
+def sample_latency(rng: random.Random, dist: str, latency: float, jitter: float) -> float:
+    """dist 为 uniform（latency ± jitter）、lognormal（jitter 为对数标准差）或 fixed"""
+    if dist == "uniform":
+        return max(0.0, rng.uniform(latency - jitter, latency + jitter))
+    if dist == "lognormal" and latency > 0:
+        return rng.lognormvariate(0.0, jitter) * latency
+    return latency
+
+
+def maybe_fail(rng: random.Random, error_rate: float) -> None:
+    """按 error_rate 抛出 MockLLMError"""
+    if rng.random() < error_rate:
+        raise MockLLMError("mock llm: rate limited")
@@ -0,0 +1,173 @@
+"""
+LLM 提示词 → 回复 的持久化缓存（SQLite）。
+
+键为 模型名 + 消息列表 + response_format 的 sha256，状态未变时提示词逐字节相同，可直接命中缓存。
+- 按最近访问时间做 LRU 淘汰，同时受条数与总字节数上限约束；
+- 命中时的访问时间先记在内存里，攒够 touch_batch 条或下一次写入时与写入合并提交，
+  读缓存不再触发磁盘同步；
+- 异步代码使用 `aget` / `aput`，SQLite 读写放到线程里执行，不阻塞事件循环；
+- 只读（回放）模式下只查不写，也不更新访问时间。
+"""
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# 命中后暂存的访问时间条数上限，超过后单独提交一次
+TOUCH_BATCH = 256
+
+
+def _message_parts(msgs: List[Any]) -> List[Dict[str, Any]]:
+    parts = []
+    for m in msgs:
+        if isinstance(m, dict):
+            parts.append({"role": m.get("role"), "content": m.get("content")})
+        else:
+            parts.append({"role": getattr(m, "type", type(m).__name__), "content": getattr(m, "content", str(m))})
+    return parts
+
+
+class PromptCache:
+    def __init__(
+        self,
+        path: str,
+        max_entries: int,
+        max_bytes: int,
+        readonly: bool = False,
+        touch_batch: int = TOUCH_BATCH,
+    ):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.readonly = readonly
+        self.touch_batch = touch_batch
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # 连接在事件循环线程与 to_thread 的工作线程之间共用，所有访问串行化
+        self._lock = threading.Lock()
+        self._touched: Dict[str, float] = {}
+        self._conn: Optional[sqlite3.Connection] = None
+        if readonly:
+            if os.path.exists(path):
+                self._conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True, check_same_thread=False)
+            else:
+                logger.warning("LLM 缓存文件 %s 不存在，回放模式下所有请求都会未命中", path)
+        else:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            self._conn = sqlite3.connect(path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL, last_access REAL NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_last_access ON entries(last_access)")
+            self._conn.commit()
+        self._count, self._bytes = self._totals()
+
+    @staticmethod
+    def make_key(model: str, msgs: List[Any], response_format: Any = None) -> str:
+        payload = json.dumps(
+            {"model": model, "messages": _message_parts(msgs), "response_format": response_format},
+            ensure_ascii=False,
+            sort_keys=True,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _totals(self):
+        if self._conn is None:
+            return 0, 0
+        count, size = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+        return count, size
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = None
+            if self._conn is not None:
+                row = self._conn.execute("SELECT value FROM entries WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            if not self.readonly:
+                self._touched[key] = time.time()
+                if len(self._touched) >= self.touch_batch:
+                    self._apply_touches()
+                    self._conn.commit()
+            return row[0]
+
+    def put(self, key: str, value: str) -> None:
+        if self.readonly or self._conn is None:
+            return
+        size = len(value.encode("utf-8"))
+        with self._lock:
+            self._apply_touches()
+            old = self._conn.execute("SELECT size FROM entries WHERE key = ?", (key,)).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO entries (key, value, size, last_access) VALUES (?, ?, ?, ?)",
+                (key, value, size, time.time()),
+            )
+            if old is None:
+                self._count += 1
+                self._bytes += size
+            else:
+                self._bytes += size - old[0]
+            self._evict()
+            self._conn.commit()
+
+    async def aget(self, key: str) -> Optional[str]:
+        return await asyncio.to_thread(self.get, key)
+
+    async def aput(self, key: str, value: str) -> None:
+        await asyncio.to_thread(self.put, key, value)
+
+    def _apply_touches(self) -> None:
+        """把暂存的访问时间写进当前事务（调用方持有锁并负责提交）"""
+        if self._touched:
+            self._conn.executemany(
+                "UPDATE entries SET last_access = ? WHERE key = ?",
+                [(ts, key) for key, ts in self._touched.items()],
+            )
+            self._touched.clear()
+
+    def _evict(self) -> None:
+        while self._count > self.max_entries or self._bytes > self.max_bytes:
+            row = self._conn.execute(
+                "SELECT key, size FROM entries ORDER BY last_access ASC LIMIT 1"
+            ).fetchone()
+            if row is None:
+                break
+            self._conn.execute("DELETE FROM entries WHERE key = ?", (row[0],))
+            self._count -= 1
+            self._bytes -= row[1]
+            self.evictions += 1
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            "evictions": self.evictions,
+            "entries": self._count,
+            "bytes": self._bytes,
+            "readonly": self.readonly,
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                if not self.readonly:
+                    self._apply_touches()
+                    self._conn.commit()
+                self._conn.close()
+                self._conn = None
@@ -0,0 +1,48 @@
+"""
+提示词 token 数的粗略估算与公共前缀统计，用于核对供应商侧前缀缓存的命中情况。
+"""
+from __future__ import annotations
+
+import os
+from typing import Any, Dict
+
+
+def estimate_tokens(text: str) -> int:
+    """粗略估算 token 数：中日韩字符约 1 token/字，其余约 4 字符/token"""
+    cjk = sum(1 for ch in text if ord(ch) >= 0x2E80)
+    return cjk + (len(text) - cjk + 3) // 4
+
+
+class PrefixStats:
+    """记录同类提示词与上一次之间的公共前缀长度，用于核对供应商侧前缀缓存的命中情况"""
+
+    def __init__(self) -> None:
+        self._last: Dict[str, str] = {}
+        self.calls = 0
+        self.prompt_tokens = 0
+        self.shared_prefix_tokens = 0
+        self.provider_prompt_tokens = 0
+        self.provider_cached_tokens = 0
+
+    def observe(self, kind: str, text: str) -> int:
+        prev = self._last.get(kind, "")
+        shared = estimate_tokens(os.path.commonprefix([prev, text]))
+        self._last[kind] = text
+        self.calls += 1
+        self.prompt_tokens += estimate_tokens(text)
+        self.shared_prefix_tokens += shared
+        return shared
+
+    def record_provider(self, prompt_tokens: int, cached_tokens: int) -> None:
+        self.provider_prompt_tokens += prompt_tokens
+        self.provider_cached_tokens += cached_tokens
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "est_prompt_tokens": self.prompt_tokens,
+            "est_shared_prefix_tokens": self.shared_prefix_tokens,
+            "est_shared_ratio": round(self.shared_prefix_tokens / self.prompt_tokens, 4) if self.prompt_tokens else 0.0,
+            "provider_prompt_tokens": self.provider_prompt_tokens,
+            "provider_cached_tokens": self.provider_cached_tokens,
+        }
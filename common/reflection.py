@@ -0,0 +1,86 @@
+"""
+后台反思：把 summary 从 Agent 主循环的关键路径上移走。
+
+每个 Agent 一个 `ReflectionWorker`，内部是有界队列 + 单个后台任务：
+- `submit` 立即返回，队列满时丢弃最旧的待处理请求（合并成最新一次）；
+- 下一轮计划使用 `latest`，即最近一次已完成的总结；
+- 后台完成的反思耗时累计为 `saved_idle`，即主循环本来要空等的时间。
+多个 worker 可以共用一个 `ReflectionStats` 汇总统计。
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, Generic, Optional, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class ReflectionStats:
+    """后台反思的提交、完成、合并次数；完成的反思耗时即主循环不再空等的时间"""
+
+    def __init__(self):
+        self.submitted = 0
+        self.completed = 0
+        self.coalesced = 0
+        self.failed = 0
+        self.saved_idle = 0.0
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "submitted": self.submitted,
+            "completed": self.completed,
+            "coalesced": self.coalesced,
+            "failed": self.failed,
+            "saved_idle_s": round(self.saved_idle, 3),
+            "avg_s": round(self.saved_idle / self.completed, 3) if self.completed else 0.0,
+        }
+
+
+class ReflectionWorker(Generic[T]):
+    def __init__(self, name: str = "", maxsize: int = 1, stats: Optional[ReflectionStats] = None):
+        self.name = name
+        self.stats = stats or ReflectionStats()
+        self.latest: Optional[T] = None
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=max(1, maxsize))
+        self._task: Optional[asyncio.Task] = None
+
+    def submit(self, job: Callable[[], Awaitable[T]]) -> None:
+        """提交一次反思；不等待结果"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run(), name=f"reflection-{self.name}")
+        if self._queue.full():
+            # 还没开始的旧反思已经过时，只保留最新的
+            self._queue.get_nowait()
+            self._queue.task_done()
+            self.stats.coalesced += 1
+        self._queue.put_nowait(job)
+        self.stats.submitted += 1
+
+    async def _run(self) -> None:
+        while True:
+            job = await self._queue.get()
+            started = time.perf_counter()
+            try:
+                self.latest = await job()
+                self.stats.completed += 1
+                self.stats.saved_idle += time.perf_counter() - started
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                self.stats.failed += 1
+                logger.exception("background reflection failed: %s", self.name)
+            finally:
+                self._queue.task_done()
+
+    async def stop(self) -> None:
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {**self.stats.snapshot(), "pending": self._queue.qsize()}
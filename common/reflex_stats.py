@@ -0,0 +1,38 @@
+"""
+生存反射层的统计：两个应用的反射规则各自按本地的观测格式实现，命中次数与节省时间的统计共用这里。
+"""
+from __future__ import annotations
+
+from typing import Any, Dict
+
+
+class ReflexStats:
+    """反射命中次数与耗时，对比 LLM 生成动作的平均耗时估算节省的时间"""
+
+    def __init__(self):
+        self.saved_calls = 0
+        self.by_attr: Dict[str, int] = {}
+        self.reflex_latency = 0.0
+        self.llm_calls = 0
+        self.llm_latency = 0.0
+
+    def record_reflex(self, attr: str, elapsed: float) -> None:
+        self.saved_calls += 1
+        self.by_attr[attr] = self.by_attr.get(attr, 0) + 1
+        self.reflex_latency += elapsed
+
+    def record_llm(self, elapsed: float) -> None:
+        self.llm_calls += 1
+        self.llm_latency += elapsed
+
+    def snapshot(self) -> Dict[str, Any]:
+        reflex_avg = self.reflex_latency / self.saved_calls if self.saved_calls else 0.0
+        llm_avg = self.llm_latency / self.llm_calls if self.llm_calls else 0.0
+        return {
+            "saved_calls": self.saved_calls,
+            "by_attr": dict(self.by_attr),
+            "llm_calls": self.llm_calls,
+            "reflex_avg_ms": round(reflex_avg * 1000, 3),
+            "llm_act_avg_ms": round(llm_avg * 1000, 3),
+            "saved_ms_est": round(self.saved_calls * max(llm_avg - reflex_avg, 0.0) * 1000, 1),
+        }
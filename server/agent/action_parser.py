@@ -0,0 +1,302 @@
+"""
+动作 JSON 解析流水线。
+
+LLM 的动作回复依次经过：
+1. fast   —— 快速 JSON 解码 + 预编译的 `TypeAdapter(ActionList)` 校验；
+2. repair —— 本地修复：去掉代码块、截取 JSON 主体、中文标点/单引号/尾逗号、
+             多个顶层对象补成数组、按字段推断缺失的 `type`；
+3. llm    —— 仍失败时才调用 `OutputFixingParser` 让模型修复（可关闭）；
+4. failed —— 全部失败，返回兜底的 wait 动作。
+各阶段的命中次数与耗时汇总在 `parse_stats` 中。
+
+流式模式下由 `ActionStreamParser` 从 token 流中逐个切出完整的动作对象，
+每个对象单独用 `TypeAdapter(Action)` 校验，不必等整段回复结束。
+"""
+from __future__ import annotations
+
+import json
+import logging
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from pydantic import TypeAdapter
+
+from .agent_config import ACTION_PARSE_LLM_REPAIR
+from .models.actions import Action, ActionList
+
+try:
+    import orjson
+
+    _loads = orjson.loads
+except ImportError:  # orjson 可选，没有时退回标准库
+    _loads = json.loads
+
+logger = logging.getLogger(__name__)
+
+ACTION_LIST_ADAPTER = TypeAdapter(ActionList)
+ACTION_ADAPTER = TypeAdapter(Action)
+FALLBACK_ACTIONS = [{"type": "wait", "seconds": 1}]
+STAGES = ("fast", "repair", "llm", "failed")
+
+# 结构位置上的全角标点 → ASCII
+_PUNCT = {"，": ",", "：": ":", "｛": "{", "｝": "}", "［": "[", "］": "]", "【": "[", "】": "]"}
+# 引号 → 对应的闭合引号
+_QUOTES = {'"': '"', "'": "'", "“": "”", "‘": "’"}
+
+# 缺少 type 时按独有字段推断，顺序即优先级
+_TYPE_HINTS = (
+    ("mode", "trade"),
+    ("target", "move"),
+    ("container", "store"),
+    ("input", "cook"),
+    ("to", "talk"),
+    ("content", "talk"),
+    ("seconds", "wait"),
+    ("minutes", "sleep"),
+    ("item", "consume"),
+)
+
+
+class ParseStats:
+    """各解析阶段的命中次数与累计耗时"""
+
+    def __init__(self):
+        self.counts: Dict[str, int] = {s: 0 for s in STAGES}
+        self.latency: Dict[str, float] = {s: 0.0 for s in STAGES}
+        self.max_latency = 0.0
+        # 流式模式：请求发出到第一个动作可执行的耗时
+        self.first_action_count = 0
+        self.first_action_latency = 0.0
+        self.stream_rejected = 0
+
+    def record_first_action(self, elapsed: float) -> None:
+        self.first_action_count += 1
+        self.first_action_latency += elapsed
+
+    def record(self, stage: str, elapsed: float) -> None:
+        self.counts[stage] += 1
+        self.latency[stage] += elapsed
+        self.max_latency = max(self.max_latency, elapsed)
+
+    def snapshot(self) -> Dict[str, Any]:
+        total = sum(self.counts.values())
+        return {
+            "total": total,
+            "counts": dict(self.counts),
+            "ratio": {s: round(c / total, 4) if total else 0.0 for s, c in self.counts.items()},
+            "avg_ms": {
+                s: round(self.latency[s] / c * 1000, 3) if c else 0.0 for s, c in self.counts.items()
+            },
+            "max_ms": round(self.max_latency * 1000, 3),
+            "stream_first_action_avg_ms": round(self.first_action_latency / self.first_action_count * 1000, 3)
+            if self.first_action_count
+            else 0.0,
+            "stream_rejected": self.stream_rejected,
+        }
+
+
+parse_stats = ParseStats()
+
+
+def strip_code_fence(s: str) -> str:
+    s = s.strip()
+    if s.startswith("```"):
+        s = s.strip("` \n")
+        if "\n" in s:
+            s = s.split("\n", 1)[1]
+        if s.endswith("```"):
+            s = s[:-3].strip()
+    return s
+
+
+def _extract_body(s: str) -> str:
+    """截取第一个 [ 或 { 到最后一个 ] 或 } 之间的内容，丢掉前后的解释文字"""
+    starts = [i for i in (s.find("["), s.find("{"), s.find("［"), s.find("｛")) if i >= 0]
+    ends = [s.rfind(c) for c in "]}］｝"]
+    if not starts or max(ends) < 0:
+        return s
+    return s[min(starts): max(ends) + 1]
+
+
+def _normalize(s: str) -> str:
+    """
+    逐字符扫描，只改动字符串外的结构字符：
+    引号统一为双引号，全角标点换成 ASCII，去掉 ] } 前的尾逗号，
+    顶层出现多个对象时补逗号并包成数组。
+    """
+    out: List[str] = []
+    close: Optional[str] = None
+    escape = False
+    depth = 0
+    roots = 0
+    for ch in s:
+        if close is not None:
+            if escape:
+                out.append(ch)
+                escape = False
+            elif ch == "\\":
+                out.append(ch)
+                escape = True
+            elif ch == close or (close == "”" and ch == '"'):
+                out.append('"')
+                close = None
+            elif ch == '"':
+                out.append('\\"')
+            else:
+                out.append(ch)
+            continue
+        if ch in _QUOTES:
+            close = _QUOTES[ch]
+            out.append('"')
+            continue
+        ch = _PUNCT.get(ch, ch)
+        if ch in "]}":
+            while out and out[-1] in " \t\r\n":
+                out.pop()
+            if out and out[-1] == ",":
+                out.pop()
+            depth -= 1
+        elif ch in "[{":
+            if depth == 0:
+                roots += 1
+                # 模型自己写了分隔逗号时不再重复补
+                if roots > 1 and "".join(out).rstrip()[-1:] != ",":
+                    out.append(",")
+            depth += 1
+        out.append(ch)
+    text = "".join(out)
+    if roots > 1:
+        text = f"[{text}]"
+    return text
+
+
+def _fill_type(obj: Any) -> Any:
+    if isinstance(obj, list):
+        return [_fill_type(o) for o in obj]
+    if isinstance(obj, dict) and "type" not in obj:
+        for key, action_type in _TYPE_HINTS:
+            if key in obj:
+                return {"type": action_type, **obj}
+    return obj
+
+
+def parse_local(text: str) -> Tuple[Optional[ActionList], str]:
+    """不调用 LLM 的解析，返回 (结果, 阶段)；失败时结果为 None"""
+    try:
+        return ACTION_LIST_ADAPTER.validate_python(_loads(text)), "fast"
+    except Exception:
+        pass
+    try:
+        body = _normalize(_extract_body(strip_code_fence(text)))
+        return ACTION_LIST_ADAPTER.validate_python(_fill_type(_loads(body))), "repair"
+    except Exception:
+        return None, "failed"
+
+
+def parse_action_object(text: str) -> Optional[Dict[str, Any]]:
+    """校验单个动作对象（流式模式使用），失败时先本地修复一次，仍失败返回 None"""
+    for candidate in (text, _normalize(text)):
+        try:
+            action = ACTION_ADAPTER.validate_python(_fill_type(_loads(candidate)))
+        except Exception:
+            continue
+        return action.model_dump(exclude_none=True)
+    return None
+
+
+class ActionStreamParser:
+    """
+    增量切分 JSON 动作流：`feed` 接收新到的文本片段，返回其中已经闭合的顶层对象文本。
+    只跟踪字符串外的花括号深度，因此数组外壳、代码块标记和前后说明文字都会被跳过。
+    """
+
+    def __init__(self):
+        self._buf: List[str] = []
+        self._depth = 0
+        self._close: Optional[str] = None
+        self._escape = False
+
+    def feed(self, chunk: str) -> List[str]:
+        done: List[str] = []
+        for ch in chunk:
+            if self._depth == 0 and ch not in "{｛":
+                continue
+            self._buf.append(ch)
+            if self._close is not None:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == self._close or (self._close == "”" and ch == '"'):
+                    self._close = None
+                continue
+            if ch in _QUOTES:
+                self._close = _QUOTES[ch]
+            elif ch in "{｛":
+                self._depth += 1
+            elif ch in "}｝":
+                self._depth -= 1
+                if self._depth == 0:
+                    done.append("".join(self._buf))
+                    self._buf.clear()
+        return done
+
+    def pending(self) -> str:
+        """还没有闭合的对象文本（流被截断时留下的半个对象）"""
+        return "".join(self._buf)
+
+
+def to_action_dicts(actions_obj: Any) -> List[Dict[str, Any]]:
+    actions = getattr(actions_obj, "root", actions_obj)
+    if actions is None:
+        return list(FALLBACK_ACTIONS)
+    if not isinstance(actions, list):
+        actions = [actions]
+    return [a.model_dump(exclude_none=True) if hasattr(a, "model_dump") else a for a in actions]
+
+
+class ActionParser:
+    """
+    包装解析流水线；fixer 为可选的 `OutputFixingParser`，只在本地修复失败时使用。
+    """
+
+    def __init__(
+        self,
+        fixer: Any = None,
+        name: str = "",
+        llm_repair: bool = ACTION_PARSE_LLM_REPAIR,
+        stats: ParseStats = parse_stats,
+    ):
+        self.fixer = fixer
+        self.name = name
+        self.llm_repair = llm_repair and fixer is not None
+        self.stats = stats
+
+    def parse(self, text: str) -> List[Dict[str, Any]]:
+        start = time.perf_counter()
+        obj, stage = parse_local(text)
+        if obj is None and self.llm_repair:
+            try:
+                obj, stage = self.fixer.parse(strip_code_fence(text)), "llm"
+            except Exception:
+                pass
+        return self._finish(text, obj, stage, start)
+
+    async def aparse(self, text: str) -> List[Dict[str, Any]]:
+        start = time.perf_counter()
+        obj, stage = parse_local(text)
+        if obj is None and self.llm_repair:
+            try:
+                obj, stage = await self.fixer.aparse(strip_code_fence(text)), "llm"
+            except Exception:
+                pass
+        return self._finish(text, obj, stage, start)
+
+    def _finish(self, text: str, obj: Any, stage: str, start: float) -> List[Dict[str, Any]]:
+        if obj is None:
+            stage = "failed"
+        self.stats.record(stage, time.perf_counter() - start)
+        if obj is None:
+            logger.error("Agent %s act parse failed, response: %s", self.name, text)
+            return list(FALLBACK_ACTIONS)
+        return to_action_dicts(obj)
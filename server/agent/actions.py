@@ -9,17 +9,59 @@ import logging
 import random
 import time
 from dataclasses import dataclass
-from typing import Any, Dict, Optional
+from typing import Any, Dict, List, Optional, Tuple
 
+from .clock import action_seconds
 from .agent_config import ACTION_FATIGUE_COST, TIME_RATIO, WORLD_PLACE_MAP, SLEEP_RECOVER
 from .models.actions import ActionList
-from .models.schema import Container, Item, Market
+from .item_registry import CompactInventory
+from .models.state import Market
 from .world import World
 logger = logging.getLogger(__name__)
 
 __all__ = ["ActionList", "ActionMethod"]
 
 
+def _acked(msg:Optional[Dict[str,Any]]) -> bool:
+    """前端（或无头调度器）是否确认动作完成；WsDispatcher 返回 {"OK": True}，原始回包为 {"status": "ok"}"""
+    return bool(msg) and (msg.get("OK") is True or msg.get("status") == "ok")
+
+
+def _remember(player,world:World,kind:str,text:str) -> None:
+    """记录一条玩家记忆，时间取当前游戏时间"""
+    player.memory.record(world.get_time().strftime("%Y-%m-%d %H:%M"),kind,text)
+
+
+# 动作成功后写入记忆的文本；推测执行用同一份模板在预测副本上补记
+MEMORY_TEXT = {
+    "move": "你离开{origin},来到{target}",
+    "consume": "你消耗了{qty}个{item}",
+    "buy": "你购买了{qty}个{item}",
+    "sell": "你出售了{qty}个{item}",
+    "sleep": "你睡了{minutes}分钟",
+}
+
+
+def memory_lines(player,action:Dict[str,Any]) -> List[Tuple[str,str]]:
+    """action 在 player 当前状态下成功执行时依次写入的 (类型, 文本)；不写记忆或无法预测的动作返回空列表"""
+    kind = action.get("type")
+    if kind == "move":
+        if player.cur_location == action.get("target"):
+            return []
+        return [("move", MEMORY_TEXT["move"].format(origin=player.cur_location, target=action.get("target")))]
+    if kind == "consume":
+        return [("consume", MEMORY_TEXT["consume"].format(qty=action.get("qty",1), item=action.get("item")))]
+    if kind == "trade" and action.get("mode") in ("buy", "sell"):
+        lines = []
+        if player.cur_location != "集市":
+            lines.append(("move", MEMORY_TEXT["move"].format(origin=player.cur_location, target="集市")))
+        lines.append(("trade", MEMORY_TEXT[action["mode"]].format(qty=action.get("qty"), item=action.get("item"))))
+        return lines
+    if kind == "sleep":
+        return [("sleep", MEMORY_TEXT["sleep"].format(minutes=action.get("minutes")))]
+    return []
+
+
 
 
 
@@ -28,6 +70,14 @@ __all__ = ["ActionList", "ActionMethod"]
 class ActionMethod:
     
     async def method_action(self,ctx,action:Dict[str,Any]) -> Dict[str,Any]:
+        origin = ctx.player.cur_location
+        res = await self._run_action(ctx,action)
+        if res.get("OK"):
+            # 离散事件时钟下按建模耗时推进游戏时间；实时时钟不做任何事
+            await ctx.world.clock.elapse(action_seconds(action,origin))
+        return res
+
+    async def _run_action(self,ctx,action:Dict[str,Any]) -> Dict[str,Any]:
 
         player = ctx.player
         dispatch = ctx.dispatch
@@ -37,15 +87,15 @@ class ActionMethod:
         action_type = action.get("type")
         try:
             if action_type == "consume":
-                return await self.consume(action, player, world, dispatch, agent_id)
+                return await self.consume(action, player, world, dispatch, agent_id, world_lock)
             elif action_type == "cook":
-                return await self.cook(action, world, player, agent_id, dispatch)
+                return await self.cook(action, world, player, agent_id, dispatch, world_lock)
             elif action_type == "trade":
                 return await self.trade(player, action, agent_id, dispatch, world, world_lock)
             elif action_type == "talk":
                 return await self.talk()
             elif action_type == "wait":
-                return await self.wait(dispatch, agent_id, action, player)
+                return await self.wait(dispatch, agent_id, action, player, world)
             elif action_type == "store":
                 return await self.store(action, world, player)
             elif action_type == "retrieve":
@@ -53,7 +103,7 @@ class ActionMethod:
             # elif action_type == "fishing":
             #     return await self.fishing(action, player, dispatch, agent_id, world)
             elif action_type == "move":
-                return await self._move(world, player, agent_id, dispatch, target=action["target"])
+                return await self._move(world, player, agent_id, dispatch, world_lock, target=action["target"])
             # elif action_type == "pick_up":
             #     return await self.pick_up(action, player, dispatch, agent_id, world)
             elif action_type == "sleep":
@@ -65,7 +115,7 @@ class ActionMethod:
             return {"action": action_type or "unknown", "OK": False, "MSG": "服务端处理动作时出现异常"}
 
     
-    async def _move(self,world,player,agent_id,dispatch,target:str,inner_target:str|None=None) -> Dict[str,Any]:
+    async def _move(self,world,player,agent_id,dispatch,world_lock,target:str,inner_target:str|None=None) -> Dict[str,Any]:
         '''玩家移动
         1) 时间消耗
         2) 改变位置
@@ -93,18 +143,21 @@ class ActionMethod:
                 'OK':False,
                 'MSG':f"移动失败,目标{target}不存在"
             }
-        if resolved_target in player.accessible and player.accessible[resolved_target] == 1: # 1表示未知，0代表已知
-            player.accessible[resolved_target] = 0
-        
         begin_time = time.time()     
         msg = await dispatch.action(agent_id=agent_id,cmd="go_to",target=inner_target,cur_location=player.cur_location)
-        if not msg or not msg.get("status") !="ok":
+        if not _acked(msg):
             return {"action": "move", "target": target, "OK": False, "MSG": "前端移动失败或超时"}
         time_cost=round((time.time() - begin_time))*TIME_RATIO # 实际时间消耗
         logger.info("移动耗时: %s", time_cost)
-        memory = {world.get_time().strftime("%Y-%m-%d %H:%M"):f"你离开{player.cur_location},来到{target}"}
-        player.memory.append(json.dumps(memory,ensure_ascii=False))
-        player.cur_location = target
+        # 到达后再一次写入可达地点、记忆和位置
+        async with world_lock:
+            if resolved_target in player.accessible and player.accessible[resolved_target] == 1: # 1表示未知，0代表已知
+                player.accessible[resolved_target] = 0
+                world.bump(f"accessible:{player.id}")
+                world.record("accessible", player=player.id, location=resolved_target, value=0)
+            _remember(player,world,"move",MEMORY_TEXT["move"].format(origin=player.cur_location,target=target))
+            player.cur_location = target
+            world.record("move", player=player.id, location=target)
         return {
             'action':"move",
             'target':target,
@@ -114,11 +167,12 @@ class ActionMethod:
         }
 
     
-    async def consume(self,action,player,world,dispatch,agent_id) -> Dict[str,Any]:
+    async def consume(self,action,player,world,dispatch,agent_id,world_lock) -> Dict[str,Any]:
         """消耗物品:包括食物等
         - 减少背包中物品
         - 触发物品对应效果
         - 加入记忆
+        前端动画全部完成后才在 world_lock 内一次写入属性、背包和记忆，断点不会落在只改了一半的状态上
         """
         
         item:str = action['item']
@@ -126,26 +180,29 @@ class ActionMethod:
         msg = self._ensure_item(action,world,player.inventory,item,qty)
         if msg is not None:
             return msg
-        item_data:Dict[str,Any] = world.item_data[item]
+        item_data:Dict[str,Any] = world.item_registry.data(item)
         if item_data.get('consumable') is not None:
 
             # 前端动画
             msg = await dispatch.action(agent_id=agent_id,type="animation",target="item",value = -1 *qty)
-            if not msg or not msg.get("status") != "ok":
+            if not _acked(msg):
                 return {"action": "consume", "target": item, "OK": False, "MSG": "前端使用物品动画失败或超时"}
             effect_data:Dict[str,Any] = item_data['consumable']['effect']
-            # 触发属性回复
             for attr,value in effect_data.items():
-                player.attribute[attr].current = min(player.attribute[attr].current + value,100)
                 msg = await dispatch.action(agent_id=agent_id,type="animation",target=attr,value=value)
-                if not msg or not msg.get("status")!="ok":
+                if not _acked(msg):
                     return {"action": "consume", "target": item, "OK": False, "MSG": "前端更新属性动画失败或超时"}
 
-            # 减少背包物品
-            self._decreace_qty(world,player.inventory,item,qty)
-            # 加入记忆
-            memory = {world.get_time().strftime("%Y-%m-%d %H:%M"):f"你消耗了{qty}个{item}"}
-            player.memory.append(json.dumps(memory,ensure_ascii=False))
+            async with world_lock:
+                # 动画期间物品可能已被其它动作取走
+                if not self._decreace_qty(world,player.inventory,item,qty):
+                    return {"action": "consume", "target": item, "OK": False, "MSG": f"你没有足够的{item}"}
+                # 触发属性回复
+                for attr,value in effect_data.items():
+                    player.attribute[attr].current = min(player.attribute[attr].current + value,100)
+                    world.record("attr", player=player.id, attr=attr, value=player.attribute[attr].current)
+                # 加入记忆
+                _remember(player,world,"consume",MEMORY_TEXT["consume"].format(qty=qty,item=item))
             return {
                 'action':"consume",
                 'item':item,
@@ -156,11 +213,12 @@ class ActionMethod:
             }
         elif item_data.get('equipment'):
             msg = await dispatch.action(agent_id=agent_id,type = "animation",target=item,value=1)
-            if not msg or not msg.get("status")!="ok":
+            if not _acked(msg):
                 return {"action": "consume", "OK": False, "MSG": "前端装备物品动画失败或超时"}
-            self._decreace_qty(world,player.inventory,item,qty)
-            memory = {world.get_time().strftime("%Y-%m-%d %H:%M"):f"你装备了{item}"}
-            player.memory.append(json.dumps(memory,ensure_ascii=False))
+            async with world_lock:
+                if not self._decreace_qty(world,player.inventory,item,qty):
+                    return {"action": "consume", "target": item, "OK": False, "MSG": f"你没有足够的{item}"}
+                _remember(player,world,"equip",f"你装备了{item}")
             return {
                 'action':"consume",
                 'item':item,
@@ -178,7 +236,7 @@ class ActionMethod:
             
     
     
-    async def cook(self,action,world,player,agent_id,dispatch) -> Dict[str,Any]:
+    async def cook(self,action,world,player,agent_id,dispatch,world_lock) -> Dict[str,Any]:
         """烹饪
         - 物品消耗
         - 得到物品
@@ -187,10 +245,10 @@ class ActionMethod:
         """
         item = action['input']
         tool = action.get('tool', "锅")
-        item_meta = world.item_data.get(item) or {}
+        item_meta = world.item_registry.data(item) or {}
         ingredient = item_meta.get("ingredient") or {}
         cooked_item = ingredient.get("result_item")
-        if not cooked_item or cooked_item not in world.item_data:
+        if not cooked_item or cooked_item not in world.item_registry:
             return {
                 "action": "cook",
                 "input": item,
@@ -211,7 +269,7 @@ class ActionMethod:
                 'MSG':f"工具{tool}不存在"
             }
         if tool == "锅":
-            msg =await self._move(world,player,agent_id,dispatch,target="家",inner_target="锅")
+            msg =await self._move(world,player,agent_id,dispatch,world_lock,target="家",inner_target="锅")
             if not msg.get('OK'):
                 return msg
 
@@ -221,22 +279,17 @@ class ActionMethod:
 
         if not self._decreace_qty(world, player.inventory, item, 1):
             return {"action": "cook", "OK": False, "MSG": "食材不足"}
-        if not self._apply_fatigue_cost(player, "cook"):
+        if not self._apply_fatigue_cost(world, player, "cook"):
             return {
                 'action':"cook",
                 'input':item,
                 'OK':False,
                 'MSG':f"玩家烹饪时体力耗尽，游戏结束"
             }
-        cooked_meta = world.item_data.get(cooked_item, {})
-        cooked_desc = cooked_meta.get('description', '')
-        cooked_func = cooked_meta.get('function') or {}
-        if not isinstance(cooked_func, dict):
-            cooked_func = {}
-        if not self._increase_qty(world, player.inventory, cooked_item, 1, cooked_desc, cooked_func):
+        cooked_meta = world.item_registry.data(cooked_item)
+        if not self._increase_qty(world, player.inventory, cooked_item, 1):
             return {"action": "cook", "input": item, "OK": False, "MSG": "成品放入背包失败"}
-        memory = {world.get_time().strftime("%Y-%m-%d %H:%M"):f"你烹饪了{item}"}
-        player.memory.append(json.dumps(memory,ensure_ascii=False))
+        _remember(player,world,"cook",f"你烹饪了{item}")
         effect = cooked_meta.get("consumable", {}).get("effect", {})
         return {
             'action':"cook",
@@ -252,7 +305,7 @@ class ActionMethod:
     async def trade(self,player,action,agent_id,dispatch,world,world_lock) -> Dict[str,Any]:
         """交易"""
         if player.cur_location != "集市":
-            msg = await self._move(world,player,agent_id,dispatch,target="集市",inner_target="收银台")
+            msg = await self._move(world,player,agent_id,dispatch,world_lock,target="集市",inner_target="收银台")
             if not msg.get('OK'):
                 return msg
         mode = action['mode']
@@ -263,7 +316,8 @@ class ActionMethod:
             return {"action": "trade", "OK": False, "MSG": "市场未初始化"}
 
         if mode == "buy":
-            if item not in world.item_data:
+            item_id = world.item_registry.get(item)
+            if item_id is None:
                 return {
                     "action": "trade",
                     "mode": mode,
@@ -273,7 +327,7 @@ class ActionMethod:
                 }
             async with world_lock:
                 market_item = market.items.get(item)
-                if not market_item or market_item.get("quantity", 0) < qty:
+                if not market_item or not world.market_stock.has(item_id, qty):
                     return {
                         'action':"trade",
                         'mode':mode,
@@ -291,17 +345,7 @@ class ActionMethod:
                         'OK':False,
                         'MSG':f"金币不足，无法购买{qty}个{item}"
                     }
-                func = world.item_data[item].get('function') or {}
-                if not isinstance(func, dict):
-                    func = {}
-                if not self._increase_qty(
-                    world,
-                    player.inventory,
-                    item,
-                    qty,
-                    world.item_data[item]['description'],
-                    func,
-                ):
+                if not self._increase_qty(world, player.inventory, item, qty):
                     return {
                         "action": "trade",
                         "mode": mode,
@@ -310,9 +354,11 @@ class ActionMethod:
                         "MSG": "购买失败",
                     }
                 player.money -= cost
-                market_item["quantity"] -= qty
-            memory = {world.get_time().strftime("%Y-%m-%d %H:%M"):f"你购买了{qty}个{item}"}
-            player.memory.append(json.dumps(memory,ensure_ascii=False))
+                world.record("money", player=player.id, value=player.money)
+                world.market_stock.remove(item_id, qty)
+                world.record_inventory(world.market_stock, item)
+                world.bump("market")
+            _remember(player,world,"trade",MEMORY_TEXT["buy"].format(qty=qty,item=item))
             return {
                 'action':"trade",
                 'mode':mode,
@@ -346,9 +392,11 @@ class ActionMethod:
                         "MSG": "物品数量不足，出售失败",
                     }
                 player.money += price*qty
-                market_item["quantity"] = market_item.get("quantity", 0) + qty
-            memory = {world.get_time().strftime("%Y-%m-%d %H:%M"):f"你出售了{qty}个{item}"}
-            player.memory.append(json.dumps(memory,ensure_ascii=False))
+                world.record("money", player=player.id, value=player.money)
+                world.market_stock.add(world.item_registry.id(item), qty)
+                world.record_inventory(world.market_stock, item)
+                world.bump("market")
+            _remember(player,world,"trade",MEMORY_TEXT["sell"].format(qty=qty,item=item))
             return {
                 'action':"trade",
                 'mode':mode,
@@ -430,12 +478,12 @@ class ActionMethod:
     #     return {}
 
     
-    async def wait(self,dispatch,agent_id,action,player,) -> Dict[str,Any]:
+    async def wait(self,dispatch,agent_id,action,player,world) -> Dict[str,Any]:
         """等待"""
         msg = await dispatch.action(agent_id=agent_id,cmd="waiting",target=action['seconds'],cur_location=player.cur_location)
-        if not msg or msg.get("status")!="ok":
+        if not _acked(msg):
             return {"action": "wait", "OK": False, "MSG": "前端等待动画失败或超时"}
-        if not self._apply_fatigue_cost(player, "wait"):
+        if not self._apply_fatigue_cost(world, player, "wait"):
             return {
                 'action':"wait",
                 'OK':False,
@@ -465,7 +513,7 @@ class ActionMethod:
         item = action['item']
         qty = action['qty']
         container = world.players_home[player.id].inner_things.get(action['container'])
-        if container is None:
+        if not isinstance(container, CompactInventory):
             return {
                 'action':"store",
                 'item':item,
@@ -475,10 +523,8 @@ class ActionMethod:
         msg = self._ensure_item(action,world,player.inventory,item,qty)
         if msg is not None:
             return msg
-        func = world.item_data[item].get('function') or {}
-        if not isinstance(func, dict):
-            func = {}
-        self._increase_qty(world,container, item, qty, world.item_data[item]['description'], func)
+        self._increase_qty(world,container, item, qty)
+        world.bump(f"home:{player.id}")
         if not self._decreace_qty(world,player.inventory,item,qty):
             return {
                 'action':"store",
@@ -486,8 +532,7 @@ class ActionMethod:
                 'OK':False,
                 'MSG':f"你没有足够的{item}"
             }
-        memory = {world.get_time().strftime("%Y-%m-%d %H:%M"):f"你存储了{qty}个{item}到{action['container']}中"}
-        player.memory.append(json.dumps(memory,ensure_ascii=False))
+        _remember(player,world,"store",f"你存储了{qty}个{item}到{action['container']}中")
         return{
             'action':"store",
             'item':item,
@@ -506,7 +551,7 @@ class ActionMethod:
         item = action['item']
         qty = action['qty']
         container = world.players_home[player.id].inner_things.get(action['container'])
-        if container is None:
+        if not isinstance(container, CompactInventory):
             return {
                 'action':"retrieve",
                 'item':item,
@@ -516,10 +561,7 @@ class ActionMethod:
         msg = self._ensure_item(action,world,container,item,qty)
         if msg:
             return msg
-        func = world.item_data[item].get('function') or {}
-        if not isinstance(func, dict):
-            func = {}
-        self._increase_qty(world,player.inventory, item, qty, world.item_data[item]['description'], func)
+        self._increase_qty(world,player.inventory, item, qty)
         if not self._decreace_qty(world,container,item,qty):
             return {
                 'action':"retrieve",
@@ -527,8 +569,8 @@ class ActionMethod:
                 'OK':False,
                 'MSG':f"容器{action['container']}没有足够的{item}"
             }
-        memory = {world.get_time().strftime("%Y-%m-%d %H:%M"):f"你从{action['container']}中取出了{qty}个{item}"}
-        player.memory.append(json.dumps(memory,ensure_ascii=False))
+        world.bump(f"home:{player.id}")
+        _remember(player,world,"retrieve",f"你从{action['container']}中取出了{qty}个{item}")
         return {
             'action':"retrieve",
             'item':item,
@@ -541,16 +583,15 @@ class ActionMethod:
         """睡觉"""
         # 前端发送睡觉指令
         msg = await dispatch.action(agent_id=agent_id,cmd="sleeping",value=action['minutes']*60/TIME_RATIO)
-        if not msg or msg.get("status")!="ok":
+        if not _acked(msg):
             return {"action": "sleep", "OK": False, "MSG": "前端睡觉动画失败或超时"}
-        if not self._apply_attribute_delta(player, {"fatigue": SLEEP_RECOVER}):
+        if not self._apply_attribute_delta(world, player, {"fatigue": SLEEP_RECOVER}):
             return {
                 'action':"sleep",
                 'OK':False,
                 'MSG':f"玩家睡觉时体力耗尽，游戏结束"
         }
-        memory = {world.get_time().strftime("%Y-%m-%d %H:%M"):f"你睡了{action['minutes']}分钟"}
-        player.memory.append(json.dumps(memory,ensure_ascii=False))
+        _remember(player,world,"sleep",MEMORY_TEXT["sleep"].format(minutes=action['minutes']))
         return {
             'action':"sleep",
             'OK':True,
@@ -600,50 +641,51 @@ class ActionMethod:
         
             
 
-    def _apply_attribute_delta(self,player,delta:Dict[str,float]) -> bool:
+    def _apply_attribute_delta(self,world,player,delta:Dict[str,float]) -> bool:
         for name,value in (delta or {}).items():
             attr = player.attribute.get(name)
             if not attr:
                 continue
             attr.current = min(attr.max_value, attr.current + value)
+            world.record("attr", player=player.id, attr=name, value=attr.current)
             if attr.current < 0:
                 return False
         return True
 
-    def _apply_fatigue_cost(self,player,action_type:str) -> bool:
+    def _apply_fatigue_cost(self,world,player,action_type:str) -> bool:
         cost = ACTION_FATIGUE_COST.get(action_type, 0)
         if cost <= 0:
             return True
-        return self._apply_attribute_delta(player, {"fatigue": -cost})
+        return self._apply_attribute_delta(world, player, {"fatigue": -cost})
     
     
-    def _decreace_qty(self,world,container:Container,item:str,qty:int) -> bool:
-        if container.items.get(item) is None or container.items[item].quantity < qty:
+    def _decreace_qty(self,world,container:CompactInventory,item:str,qty:int) -> bool:
+        item_id = world.item_registry.get(item)
+        if item_id is None or not container.remove(item_id, qty):
             return False
-        container.items[item].quantity -= qty
-        if container.items[item].quantity <= 0:
-            del container.items[item]
+        world.record_inventory(container, item)
         return True
     
-    def _increase_qty(self,world,container:Container,item:str,qty:int,description:str="",function:Dict[str,Any]|None = None) -> bool:
-        if function is None or not isinstance(function, dict):
-            function = {}
-        if container.items.get(item) is None:
-            # 初始化为 0，再统一叠加，避免重复计数
-            container.items[item] = Item(name=item, quantity=0, description=description, function=function)
-        container.items[item].quantity += qty
+    def _increase_qty(self,world,container:CompactInventory,item:str,qty:int) -> bool:
+        # 物品描述、功能等元数据统一在 world.item_registry 中，容器只记数量
+        item_id = world.item_registry.get(item)
+        if item_id is None:
+            return False
+        container.add(item_id, qty)
+        world.record_inventory(container, item)
         return True
         
     
-    def _ensure_item(self,action:Dict,world:World,container:Container,item:str,qty:int) -> Optional[Dict[str,Any]]:        
-        if world.item_data.get(item) is None:
+    def _ensure_item(self,action:Dict,world:World,container:CompactInventory,item:str,qty:int) -> Optional[Dict[str,Any]]:        
+        item_id = world.item_registry.get(item)
+        if item_id is None:
             return {
                 'action':action['type'],
                 'item':item,
                 'OK':False,
                 'MSG':f"物品{item}不存在或不是可消耗物品"
             }
-        if container.items.get(item) is None or container.items[item].quantity < qty:
+        if not container.has(item_id, qty):
             return {
                 'action':action['type'],
                 'item':item,
@@ -1,7 +1,11 @@
+import copy
 import json
 import logging
-from typing import Any, Dict, List
-from .new_prompt import PromptModule
+import time
+from contextlib import nullcontext
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+import httpx
+from .new_prompt import PromptModule, estimate_tokens
 from langchain_openai import ChatOpenAI
 from langchain_core.messages import HumanMessage, SystemMessage
 from langchain_core.output_parsers import PydanticOutputParser
@@ -10,103 +14,370 @@ from langchain_classic.output_parsers import (
     PydanticOutputParser,
     RetryWithErrorOutputParser,
 )
-from datetime import datetime
+from . import log_sink
+from .action_parser import FALLBACK_ACTIONS, ActionParser, ActionStreamParser, parse_action_object
+from .agent_config import (
+    LLM_BACKEND,
+    LLM_BUDGET_FALLBACK_MODEL,
+    LLM_EST_COMPLETION_TOKENS,
+    LLM_MAX_CONNECTIONS,
+    LLM_MAX_KEEPALIVE,
+    LLM_RATE_LIMIT_ENABLED,
+    LLM_TIMEOUT,
+)
+from .metering import BUDGET_HARD, BUDGET_NORMAL, MeterCallback, usage_tokens
+from .mock_llm import MockChatModel
 from .models.actions import ActionList
 
 logger = logging.getLogger(__name__)
 
+PLAN_INSTRUCTION = "请只输出你的计划，不要任何解释文本"
+REFLECT_INSTRUCTION = "请根据提示内容进行反思和总结，不要任何解释文本"
+ACT_INSTRUCTION = "只输出动作JSON（可单个或数组），不要任何解释文本"
+
+# 所有 Agent 共用的连接池与模型实例，避免每个玩家各自建立一套 HTTP 连接
+_ASYNC_HTTP_CLIENT: Optional[httpx.AsyncClient] = None
+_LLM_POOL: Dict[str, ChatOpenAI] = {}
+
+
+def _shared_async_http_client() -> httpx.AsyncClient:
+    global _ASYNC_HTTP_CLIENT
+    if _ASYNC_HTTP_CLIENT is None or _ASYNC_HTTP_CLIENT.is_closed:
+        _ASYNC_HTTP_CLIENT = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=LLM_MAX_CONNECTIONS,
+                max_keepalive_connections=LLM_MAX_KEEPALIVE,
+            ),
+            timeout=LLM_TIMEOUT,
+        )
+    return _ASYNC_HTTP_CLIENT
+
+
+def get_llm(model: str) -> ChatOpenAI:
+    """按模型名复用 ChatOpenAI 实例，异步调用走共享连接池；LLM_BACKEND=mock 时换成本地替身"""
+    llm = _LLM_POOL.get(model)
+    if llm is None and LLM_BACKEND == "mock":
+        llm = _LLM_POOL[model] = MockChatModel(model_name=f"mock-{model}")
+    elif llm is None:
+        llm = ChatOpenAI(
+            model=model,
+            temperature=0,
+            timeout=LLM_TIMEOUT,
+            http_async_client=_shared_async_http_client(),
+            stream_usage=True,
+            # 开启共享限流时由限流器统一退避重试，SDK 不再各自重试
+            max_retries=0 if LLM_RATE_LIMIT_ENABLED else 2,
+        )
+        _LLM_POOL[model] = llm
+    return llm
+
+
+async def aclose_llm_clients() -> None:
+    """关闭共享连接池（服务退出时调用）"""
+    global _ASYNC_HTTP_CLIENT
+    if _ASYNC_HTTP_CLIENT is not None and not _ASYNC_HTTP_CLIENT.is_closed:
+        await _ASYNC_HTTP_CLIENT.aclose()
+    _ASYNC_HTTP_CLIENT = None
+    _LLM_POOL.clear()
+
 
 class Agent:
     def __init__(self, name: str, model: str = "gpt-4.1-mini-2025-04-14", **kwargs):
-        self.llm = ChatOpenAI(model=model, temperature=0)
+        self.llm = get_llm(model)
         self.prompt_builder = PromptModule()
         self.name = name
+        # 最近一次调用时的游戏日，计量按日汇总
+        self.day = 0
         self.parser = PydanticOutputParser(pydantic_object=ActionList)
-        self.fixer = OutputFixingParser.from_llm(parser=self.parser, llm=self.llm)
+        # fixer 的 LLM 调用由解析器内部发起，挂回调计入 repair
+        self.fixer = OutputFixingParser.from_llm(
+            parser=self.parser, llm=self.llm.with_config(callbacks=[MeterCallback(self)])
+        )
         self.retry = RetryWithErrorOutputParser.from_llm(
             parser=self.parser, llm=self.llm
         )
+        # 本地解析/修复优先，fixer 只作为最后手段
+        self.action_parser = ActionParser(fixer=self.fixer, name=name)
         self.state = kwargs.get("state", {})
         self.cfg = kwargs
+        # 可选的跨 Agent 合批器（LLMBatcher）、提示词缓存（PromptCache）、计量（Meter）
+        # 与限流器（AdaptiveLimiter），由 main 统一注入
+        self.batcher = kwargs.get("batcher")
+        self.cache = kwargs.get("cache")
+        self.meter = kwargs.get("meter")
+        self.limiter = kwargs.get("limiter")
+
+    def fork(self) -> "Agent":
+        """推测执行与后台反思用的副本：共用模型、解析器、缓存、计量与限流，提示词模块独立"""
+        other = copy.copy(self)
+        other.prompt_builder = self.prompt_builder.fork()
+        return other
 
+    # --- 同步接口（保留给脚本/调试使用） ---
     def plan(self, player, world) -> str:
-        prompt = self.prompt_builder.get_top_level_plan(player, world)
-        msgs = [
-            SystemMessage(content="请只输出你的计划，不要任何解释文本"),
-            HumanMessage(content=prompt),
-        ]
-        resp = self.llm.invoke(msgs).content
-        with open(f"debug_log/resp/plan_{player.id}_{datetime.now().strftime('%Y%m%d%H%M%S')}.txt","w",encoding="utf-8") as f:
-            f.write(f"{resp}\n")
+        if self._budget(world) == BUDGET_HARD:
+            return self.prompt_builder.plan
+        msgs = self._msgs("plan", PLAN_INSTRUCTION, self.prompt_builder.get_top_level_plan(player, world), player)
+        resp = self._complete(msgs, "plan", self.llm)
+        self._write_resp_log("plan", player, resp)
         return resp
 
+    def reflect(self, player, world) -> str:
+        if self._budget(world) != BUDGET_NORMAL:
+            return self.prompt_builder.summary
+        msgs = self._msgs("summary", REFLECT_INSTRUCTION, self.prompt_builder.get_reflection_and_summary(player, world), player)
+        resp = self._complete(msgs, "summary", self.llm)
+        self._write_resp_log("reflect", player, resp)
+        return resp
 
+    def act(self, player, world) -> List[Dict[str, Any]]:
+        llm = self._act_llm(self._budget(world))
+        msgs = self._msgs("act", ACT_INSTRUCTION, self.prompt_builder.get_local_action(player, world), player)
+        resp = self._complete(msgs, "act", llm)
+        logger.debug("Agent %s act response: %s", self.name, resp)
+        self._write_resp_log("act", player, resp)
+        if not isinstance(resp, str):
+            return list(FALLBACK_ACTIONS)
+        return self.action_parser.parse(resp)
 
-    def reflect(self, player, world) -> str:
-        prompt = self.prompt_builder.get_reflection_and_summary(player, world)
-        msgs = [
-            SystemMessage(content="请根据提示内容进行反思和总结，不要任何解释文本"),
-            HumanMessage(content=prompt),
-        ]
-        resp = self.llm.invoke(msgs).content
-        with open(f"debug_log/resp/reflect_{player.id}_{datetime.now().strftime('%Y%m%d%H%M%S')}.txt","w",encoding="utf-8") as f:
-            f.write(f"{resp}\n")
+    # --- 异步接口：直接在事件循环上等待 LLM，不占用线程池 ---
+    async def aplan(self, player, world) -> str:
+        if self._budget(world) == BUDGET_HARD:
+            return self.prompt_builder.plan
+        msgs = self._msgs("plan", PLAN_INSTRUCTION, self.prompt_builder.get_top_level_plan(player, world), player)
+        resp = await self._acomplete(msgs, "plan", self.llm)
+        self._write_resp_log("plan", player, resp)
         return resp
 
+    async def areflect(self, player, world) -> str:
+        if self._budget(world) != BUDGET_NORMAL:
+            return self.prompt_builder.summary
+        msgs = self._msgs("summary", REFLECT_INSTRUCTION, self.prompt_builder.get_reflection_and_summary(player, world), player)
+        resp = await self._acomplete(msgs, "summary", self.llm)
+        self._write_resp_log("reflect", player, resp)
+        return resp
 
-    def act(self, player, world) -> List[Dict[str, Any]]:
-        prompt = self.prompt_builder.get_local_action(player, world)
-        msgs = [
-            SystemMessage(content="只输出动作JSON（可单个或数组），不要任何解释文本"),
+    async def aact(self, player, world) -> List[Dict[str, Any]]:
+        llm = self._act_llm(self._budget(world))
+        msgs = self._msgs("act", ACT_INSTRUCTION, self.prompt_builder.get_local_action(player, world), player)
+        resp = await self._acomplete(msgs, "act", llm)
+        logger.debug("Agent %s act response: %s", self.name, resp)
+        self._write_resp_log("act", player, resp)
+        if not isinstance(resp, str):
+            return list(FALLBACK_ACTIONS)
+        return await self.action_parser.aparse(resp)
+
+    async def astream_act(self, player, world) -> AsyncIterator[Dict[str, Any]]:
+        """
+        流式版本的 aact：边接收 token 边切出完整的动作对象，校验通过即产出，
+        调用方可以在模型生成剩余动作的同时执行前面的动作。
+        流式请求不经过合批器；缓存命中时直接按完整回复逐个产出。
+        某个对象校验失败时停止逐个产出：它和之后的全部文本等流结束后交给完整的解析流水线
+        （本地修复、LLM 修复），保证动作仍按模型给出的顺序执行。
+        """
+        llm = self._act_llm(self._budget(world))
+        msgs = self._msgs("act", ACT_INSTRUCTION, self.prompt_builder.get_local_action(player, world), player)
+        start = time.perf_counter()
+        key = None
+        if self.cache is not None:
+            key = self.cache.make_key(llm.model_name, msgs)
+            hit = await self.cache.aget(key)
+            if hit is not None:
+                self._meter("act", start, cache_hit=True)
+                for action in await self.action_parser.aparse(hit):
+                    yield action
+                return
+        stats = self.action_parser.stats
+        stream = ActionStreamParser()
+        parts: List[str] = []
+        merged = None
+        emitted = 0
+        # 第一个被拒绝的对象及其后切出的对象；不为 None 时不再逐个产出
+        rest: Optional[List[str]] = None
+        est = self._estimate(msgs)
+        # 流式请求不重试，只占用限流名额直到流结束
+        slot = self.limiter.slot(est) if self.limiter is not None else nullcontext()
+        # 调用方遇到 finish 会提前关闭生成器（GeneratorExit / CancelledError），这时仍按已收到的部分记账
+        outcome = "cancelled"
+        try:
+            async with slot:
+                async for chunk in llm.astream(msgs):
+                    merged = chunk if merged is None else merged + chunk
+                    if not isinstance(chunk.content, str):
+                        continue
+                    parts.append(chunk.content)
+                    for text in stream.feed(chunk.content):
+                        if rest is not None:
+                            rest.append(text)
+                            continue
+                        action = parse_action_object(text)
+                        if action is None:
+                            stats.stream_rejected += 1
+                            logger.warning("Agent %s stream action rejected, parsing the rest in full: %s", self.name, text)
+                            rest = [text]
+                            continue
+                        if emitted == 0:
+                            stats.record_first_action(time.perf_counter() - start)
+                        emitted += 1
+                        yield action
+            outcome = "ok"
+        except Exception:
+            outcome = "error"
+            raise
+        finally:
+            self._settle_stream(player, start, est, merged, parts, outcome)
+        resp = "".join(parts)
+        if key is not None:
+            await self.cache.aput(key, resp)
+        logger.debug("Agent %s act response: %s", self.name, resp)
+        if rest is not None:
+            rest.append(stream.pending())
+            for action in await self.action_parser.aparse("\n".join(rest)):
+                yield action
+        elif emitted == 0:
+            # 一个动作都没切出来，退回整段解析（含本地修复与 LLM 修复）
+            for action in await self.action_parser.aparse(resp):
+                yield action
+
+    def _settle_stream(self, player, start: float, est: int, merged, parts: List[str], outcome: str) -> None:
+        """流式请求结束（含被取消）后的计量、限流校正与日志"""
+        tokens = usage_tokens(merged)
+        if outcome == "cancelled" and not any(tokens):
+            # 用量只在最后一个分片里，提前结束时按已发送的提示词和已收到的文本估算
+            tokens = (est - LLM_EST_COMPLETION_TOKENS, estimate_tokens("".join(parts)))
+        if self.limiter is not None:
+            self.limiter.settle(est, sum(tokens))
+        self._meter("act", start, tokens=tokens, error=outcome == "error")
+        if merged is not None:
+            self._record_usage(merged)
+        if outcome != "error":
+            self._write_resp_log("act", player, "".join(parts))
+
+    def _complete(self, msgs: list, kind: str, llm) -> str:
+        start = time.perf_counter()
+        key = None
+        if self.cache is not None:
+            key = self.cache.make_key(llm.model_name, msgs)
+            hit = self.cache.get(key)
+            if hit is not None:
+                self._meter(kind, start, cache_hit=True)
+                return hit
+        try:
+            msg = llm.invoke(msgs)
+        except Exception:
+            self._meter(kind, start, error=True)
+            raise
+        self._meter(kind, start, msg=msg)
+        self._record_usage(msg)
+        resp = msg.content
+        if key is not None and isinstance(resp, str):
+            self.cache.put(key, resp)
+        return resp
+
+    async def _acomplete(self, msgs: list, kind: str, llm) -> str:
+        start = time.perf_counter()
+        key = None
+        if self.cache is not None:
+            key = self.cache.make_key(llm.model_name, msgs)
+            hit = await self.cache.aget(key)
+            if hit is not None:
+                self._meter(kind, start, cache_hit=True)
+                return hit
+        try:
+            msg = await self._ainvoke(msgs, llm, kind)
+        except Exception:
+            self._meter(kind, start, error=True)
+            raise
+        self._meter(kind, start, msg=msg)
+        self._record_usage(msg)
+        resp = msg.content
+        if key is not None and isinstance(resp, str):
+            await self.cache.aput(key, resp)
+        return resp
+
+    async def _ainvoke(self, msgs: list, llm, kind: str):
+        if self.limiter is None:
+            return await self._send(msgs, llm)
+        est = self._estimate(msgs)
+        msg = await self.limiter.run(
+            lambda: self._send(msgs, llm),
+            est,
+            on_retry=lambda e: self._record_retry(kind),
+        )
+        self.limiter.settle(est, sum(usage_tokens(msg)))
+        return msg
+
+    async def _send(self, msgs: list, llm):
+        if self.batcher is not None:
+            return await self.batcher.submit(llm, msgs)
+        return await llm.ainvoke(msgs)
+
+    def _record_retry(self, kind: str) -> None:
+        if self.meter is not None:
+            self.meter.record_retry(self.name, kind, self.day)
+
+    def _estimate(self, msgs: list) -> int:
+        """限流用的 token 预估：提示词按字符估算，回复按固定值"""
+        return sum(estimate_tokens(m.content) for m in msgs if isinstance(m.content, str)) + LLM_EST_COMPLETION_TOKENS
+
+    def _budget(self, world) -> str:
+        """更新当前游戏日并返回预算级别；降级时记一次"""
+        self.day = world.get_day()
+        if self.meter is None:
+            return BUDGET_NORMAL
+        level = self.meter.budget_level(self.name, self.day)
+        if level != BUDGET_NORMAL:
+            self.meter.note_degraded(self.name, level)
+        return level
+
+    def _act_llm(self, level: str):
+        if level == BUDGET_HARD and LLM_BUDGET_FALLBACK_MODEL:
+            return get_llm(LLM_BUDGET_FALLBACK_MODEL)
+        return self.llm
+
+    def _meter(
+        self,
+        kind: str,
+        start: float,
+        msg=None,
+        cache_hit: bool = False,
+        error: bool = False,
+        tokens: Optional[Tuple[int, int]] = None,
+    ) -> None:
+        if self.meter is None:
+            return
+        prompt_tokens, completion_tokens = tokens if tokens is not None else usage_tokens(msg)
+        self.meter.record(
+            self.name,
+            kind,
+            self.day,
+            prompt_tokens=prompt_tokens,
+            completion_tokens=completion_tokens,
+            latency=time.perf_counter() - start,
+            cache_hit=cache_hit,
+            error=error,
+        )
+
+    def _msgs(self, kind: str, instruction: str, prompt: str, player) -> list:
+        pb = self.prompt_builder
+        system = instruction
+        if pb.prefix_stable:
+            # 静态前缀放在最前面，供应商侧前缀缓存才能命中
+            system = pb.get_system_prompt(kind, player) + instruction
+        shared = pb.prefix_stats.observe(kind, system + "\n" + prompt)
+        logger.debug("Agent %s %s prompt shared prefix ~%s tokens", self.name, kind, shared)
+        return [
+            SystemMessage(content=system),
             HumanMessage(content=prompt),
         ]
-        resp = self.llm.invoke(msgs).content
-        print("act response:", resp)
-        with open(f"debug_log/resp/act_{player.id}_{datetime.now().strftime('%Y%m%d%H%M%S')}.txt","w",encoding="utf-8") as f:
-            f.write(f"{resp}\n")
-        actions = None
-        if isinstance(resp, str):
-            draft = self._strip_code_fence(resp)
-            try:
-                actions_obj = self.fixer.parse(draft)
-                actions = actions_obj.root
-            except Exception:
-                try:
-                    single_parser = PydanticOutputParser(pydantic_object=ActionList)
-                    single_fixer = OutputFixingParser.from_llm(
-                        parser=single_parser, llm=self.llm
-                    )
-                    actions_obj = single_fixer.parse(draft)
-                    actions = actions_obj.root
-                except Exception:
-                    logger.error(
-                        f"Agent {self.name} act parse failed, response: {resp}"
-                    )
-                    return [{"type": "wait", "seconds": 1}]
-
-            if isinstance(actions, list):
-                return [
-                    a.model_dump(exclude_none=True) if hasattr(a, "model_dump") else a
-                    for a in actions
-                ]
-            elif actions is not None:
-                return [
-                    actions.model_dump(exclude_none=True)
-                    if hasattr(actions, "model_dump")
-                    else actions
-                ]
-
-        return [{"type": "wait", "seconds": 1}]
-
-    def _strip_code_fence(self, s: str) -> str:
-        s = s.strip()
-        if s.startswith("```"):
-            s = s.strip("` \n")
-            if "\n" in s:
-                s = s.split("\n", 1)[1]
-            if s.endswith("```"):
-                s = s[:-3].strip()
-        return s
+
+    def _record_usage(self, msg) -> None:
+        usage = getattr(msg, "usage_metadata", None) or {}
+        cached = (usage.get("input_token_details") or {}).get("cache_read", 0) or 0
+        self.prompt_builder.prefix_stats.record_provider(usage.get("input_tokens", 0) or 0, cached)
+
+    def _write_resp_log(self, kind: str, player, resp: str) -> None:
+        log_sink.emit("resp", kind=kind, agent=self.name, player=player.id, text=f"{resp}")
 
 
 if __name__ == "__main__":
@@ -65,3 +65,133 @@ WORLD_PLACE_MAP = {
 ACTION_FATIGUE_COST = {"fishing": 8, "cook": 4, "wait": 1}
 # 睡觉一次恢复的疲劳值
 SLEEP_RECOVER = 20
+
+# LLM 连接池：所有 Agent 共用一个异步 HTTP 客户端
+LLM_MAX_CONNECTIONS = 200
+LLM_MAX_KEEPALIVE = 50
+# 单次 LLM 请求超时（秒）
+LLM_TIMEOUT = 60.0
+# 跨 Agent 合批：窗口期（秒）内或攒够 N 条请求后一并提交。
+# 只对有批量接口的模型（supports_batch，目前只有 LLM_BACKEND="mock"）生效；openai 后端没有批量接口，
+# 开启也不会创建合批器，请求照常逐条发送
+LLM_BATCH_ENABLED = False
+LLM_BATCH_WINDOW = 0.05
+LLM_BATCH_MAX_SIZE = 16
+# 提示词→回复缓存：off 关闭，rw 读写，ro 只读回放（只查不写）
+LLM_CACHE_MODE = "off"
+LLM_CACHE_PATH = "debug_log/llm_cache.sqlite"
+LLM_CACHE_MAX_ENTRIES = 50000
+LLM_CACHE_MAX_BYTES = 256 * 1024 * 1024
+# 前缀稳定的提示词布局：静态内容（背景/规则/身份/任务说明）放进系统消息，易变状态放在最后
+PROMPT_PREFIX_STABLE = False
+# LLM 后端：openai 为真实接口，mock 为本地确定性替身（离线压测用）
+LLM_BACKEND = "openai"
+# 为 None 时由运行种子（RUN_SEED / --seed）派生
+MOCK_LLM_SEED = None
+# 延迟分布：fixed / uniform（均值±抖动）/ lognormal（均值×对数正态，抖动为 sigma）
+MOCK_LLM_LATENCY_DIST = "uniform"
+MOCK_LLM_LATENCY = 0.8
+MOCK_LLM_LATENCY_JITTER = 0.3
+MOCK_LLM_ERROR_RATE = 0.0
+MOCK_LLM_TOKEN_SCALE = 1.0
+# 动作解析：本地修复仍失败时是否调用 LLM（OutputFixingParser）修复
+ACTION_PARSE_LLM_REPAIR = True
+# 流式动作：边接收模型输出边执行已完整的动作，与剩余生成过程重叠
+ACT_STREAM_ENABLED = False
+# 生存反射：属性低于阈值时本地直接给出补给/睡觉动作，不调用 LLM
+REFLEX_ENABLED = False
+REFLEX_THRESHOLDS = {"hunger": 15.0, "thirst": 15.0, "fatigue": 20.0}
+REFLEX_SLEEP_MINUTES = 60
+# 计量与预算：每个 Agent 每个游戏日的 token 预算（0 表示不限）
+# 用量达到 soft 比例后跳过反思；超过预算后沿用旧计划，动作改用便宜模型
+AGENT_DAILY_TOKEN_BUDGET = 0
+AGENT_BUDGET_SOFT_RATIO = 0.8
+LLM_BUDGET_FALLBACK_MODEL = "gpt-4.1-nano-2025-04-14"
+METER_REPORT_DIR = "debug_log/metering"
+# 推测执行：当前动作播放动画时按预测状态提前生成下一批动作
+SPECULATIVE_ACT_ENABLED = False
+# 校验推测时属性按该区间粗分比较
+SPECULATION_ATTR_BUCKET = 10
+# LLM 限流：所有 Agent 共用，RPM/TPM 令牌桶 + AIMD 自适应并发 + 抖动退避重试
+LLM_RATE_LIMIT_ENABLED = False
+LLM_RPM = 500
+LLM_TPM = 200000
+LLM_CONCURRENCY_MIN = 2
+LLM_CONCURRENCY_MAX = 64
+LLM_CONCURRENCY_INIT = 16
+# 延迟不超过目标时并发上限增长，超过 2 倍时下降（秒）
+LLM_TARGET_LATENCY = 8.0
+LLM_MAX_RETRIES = 5
+LLM_BACKOFF_BASE = 0.5
+LLM_BACKOFF_MAX = 20.0
+# 预估 TPM 时每次回复按该 token 数计，返回后按实际用量校正
+LLM_EST_COMPLETION_TOKENS = 256
+# 限流器状态（当前并发上限、排队数等）的定时日志间隔（秒）
+LLM_LIMITER_LOG_INTERVAL = 30
+
+# ---------------- 后台反思 ----------------
+# 开启后 summary 在每个 Agent 的后台任务中执行，不再阻塞下一轮计划；
+# 下一轮计划使用最近一次已完成的总结
+REFLECTION_BACKGROUND_ENABLED = False
+# 每个 Agent 待处理反思的队列长度，满了丢弃最旧的请求（合并为最新一次）
+REFLECTION_QUEUE_SIZE = 1
+
+# ---------------- 玩家记忆 ----------------
+# 环形缓冲区保留的最近事件条数（提示词最多取最近 20 条）
+MEMORY_RECENT_SIZE = 50
+# 按天摘要最多保留的天数，以及每天摘要里保留的最后几条事件
+MEMORY_DIGEST_DAYS = 30
+MEMORY_DIGEST_HIGHLIGHTS = 3
+# 完整历史落盘目录，空字符串表示不落盘；每攒够 MEMORY_SPILL_BATCH 条写一次
+MEMORY_SPILL_DIR = ""
+MEMORY_SPILL_BATCH = 32
+# AgentRuntimeCtx.actions_history 保留的最近动作数
+ACTIONS_HISTORY_SIZE = 200
+
+# 提示词段落缓存：市场列表、地点、设施、动作说明、记忆等段落按状态版本号缓存，未变化时不重新渲染
+PROMPT_SECTION_CACHE = True
+
+# ---------------- 调试日志 ----------------
+# 提示词 / 模型回复写入后台日志线程，按运行分目录追加到 JSONL 分段文件
+DEBUG_LOG_ENABLED = True
+DEBUG_LOG_DIR = "debug_log/runs"
+# 队列满时直接丢弃新记录，不阻塞 Agent
+DEBUG_LOG_QUEUE_SIZE = 10000
+# 单个分段文件超过该大小后轮转；开启压缩时分段为 .jsonl.gz
+DEBUG_LOG_SEGMENT_BYTES = 32 * 1024 * 1024
+DEBUG_LOG_COMPRESS = False
+# 各类日志的采样比例，未列出的类别全部保留
+DEBUG_LOG_SAMPLE_RATES = {"prompt": 1.0, "resp": 1.0}
+
+# ---------------- 游戏时钟 ----------------
+# realtime：游戏时间随真实时间按 TIME_RATIO 流逝（配合 Unity）；
+# sim：离散事件时钟，动作按下面的建模耗时推进游戏时间，不等真实时间
+CLOCK_MODE = "realtime"
+# 各动作消耗的游戏时间（分钟）；sleep 按 minutes 参数，wait 按 seconds × TIME_RATIO
+ACTION_GAME_MINUTES = {"move": 15, "consume": 2, "cook": 30, "trade": 5, "store": 2, "retrieve": 2}
+# 地点图：相邻地点之间的步行耗时（游戏分钟），移动耗时取最短路径
+LOCATION_GRAPH = {"家": {"集市": 15}, "集市": {"家": 15}}
+# 无头模式（--headless）下，实时时钟时按建模耗时真实等待，模拟前端动画时长；离散事件时钟下不等待
+HEADLESS_MODELED_DURATIONS = True
+# 无头模式下建模耗时的相对抖动（0.1 即 ±10%），取自 "dispatch" 随机数流
+HEADLESS_DURATION_JITTER = 0.0
+
+# ---------------- 事件日志 ----------------
+# 所有世界状态变化写入只追加的二进制事件日志，定期写快照，可用 Replayer 恢复到任意事件序号
+EVENT_LOG_ENABLED = False
+EVENT_LOG_DIR = "event_log"
+# 每隔多少条事件写一份快照
+EVENT_SNAPSHOT_EVERY = 1000
+# 每隔多少条事件 flush 一次文件缓冲
+EVENT_LOG_FLUSH_EVERY = 64
+
+# ---------------- 断点保存 ----------------
+# 定期把世界、玩家与提示词状态保存到断点文件（后台线程写盘），main 以 --resume <文件> 启动时从中恢复
+CHECKPOINT_ENABLED = False
+CHECKPOINT_PATH = "checkpoints/latest.ckpt"
+CHECKPOINT_INTERVAL_S = 60
+
+# ---------------- 随机数 ----------------
+# 运行种子：集市价格、LLM 替身、无头模式耗时等各子系统的随机数流都由它派生（见 rng.py）；
+# None 表示每次运行随机选取（启动时打印），基准测试时固定为整数或用 --seed 指定
+RUN_SEED = None
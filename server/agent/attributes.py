@@ -0,0 +1,151 @@
+"""
+所有玩家的生存属性集中存放在一张 NumPy 表里（玩家 × 属性）。
+
+- `current` / `max_value` / `decay_per_hour` 三个矩阵，每个玩家一行，每种属性一列；
+- `decay(hours)` 一次完成所有玩家的衰减、上限截断与死亡判定；
+- `Player.attribute` 换成该表上的一行视图 `AttributeRow`，`player.attribute["hunger"].current`
+  这类读写与原来的 pydantic `Attribute` 兼容，ActionMethod / 提示词 / 反射层无需改动。
+"""
+from __future__ import annotations
+
+from typing import Any, Dict, Iterator, List, Mapping, Optional, Tuple
+
+import numpy as np
+
+from .models.state import Attribute
+
+ATTR_NAMES: Tuple[str, ...] = ("hunger", "thirst", "fatigue")
+
+
+class AttributeTable:
+    def __init__(self, names: Tuple[str, ...] = ATTR_NAMES, capacity: int = 16):
+        self.names = tuple(names)
+        self.index = {name: i for i, name in enumerate(self.names)}
+        # 每列属性的显示名（如 "饥饿值"），对应 Attribute.name
+        self.labels: List[str] = list(self.names)
+        capacity = max(1, capacity)
+        self.current = np.zeros((capacity, len(self.names)))
+        self.max_value = np.full((capacity, len(self.names)), 100.0)
+        self.decay_per_hour = np.zeros((capacity, len(self.names)))
+        self.alive = np.zeros(capacity, dtype=bool)
+        self.size = 0
+
+    @classmethod
+    def from_players(cls, players) -> AttributeTable:
+        """把各玩家现有的属性字典搬进表里，并把 player.attribute 换成行视图"""
+        table = cls(capacity=len(players))
+        for player in players:
+            player.attribute = table.view(table.add_row(player.attribute))
+        return table
+
+    def add_row(self, attrs: Mapping[str, Any]) -> int:
+        if self.size == len(self.current):
+            self._grow(len(self.current) * 2)
+        row = self.size
+        self.size += 1
+        self.alive[row] = True
+        for name, attr in attrs.items():
+            col = self.index.get(name)
+            if col is None:
+                raise KeyError(f"未知属性: {name}")
+            self.labels[col] = attr.name
+            self.current[row, col] = attr.current
+            self.max_value[row, col] = attr.max_value
+            self.decay_per_hour[row, col] = attr.decay_per_hour
+        return row
+
+    def _grow(self, capacity: int) -> None:
+        n = self.size
+        for field in ("current", "max_value", "decay_per_hour", "alive"):
+            old = getattr(self, field)
+            new = np.zeros((capacity,) + old.shape[1:], dtype=old.dtype)
+            new[:n] = old[:n]
+            setattr(self, field, new)
+        self.max_value[n:] = 100.0
+
+    def view(self, row: int) -> AttributeRow:
+        return AttributeRow(self, row)
+
+    def decay(self, hours: float) -> np.ndarray:
+        """
+        所有存活玩家按小时衰减；任一属性跌破 0 的玩家判定死亡。
+        返回本次新死亡的行号。属性随后截断到 [0, max_value]。
+        """
+        n = self.size
+        alive = self.alive[:n]
+        current = self.current[:n]
+        current[alive] -= self.decay_per_hour[:n][alive] * hours
+        died = alive & (current < 0).any(axis=1)
+        alive &= ~died
+        self.clamp()
+        return np.flatnonzero(died)
+
+    def clamp(self) -> None:
+        n = self.size
+        np.clip(self.current[:n], 0.0, self.max_value[:n], out=self.current[:n])
+
+    def is_alive(self, row: int) -> bool:
+        return bool(self.alive[row])
+
+
+class AttributeValue:
+    """表中单个属性的引用，接口与 `Attribute` 一致"""
+
+    __slots__ = ("_table", "_row", "_col")
+
+    def __init__(self, table: AttributeTable, row: int, col: int):
+        self._table = table
+        self._row = row
+        self._col = col
+
+    @property
+    def name(self) -> str:
+        return self._table.labels[self._col]
+
+    @property
+    def current(self) -> float:
+        return float(self._table.current[self._row, self._col])
+
+    @current.setter
+    def current(self, value: float) -> None:
+        self._table.current[self._row, self._col] = value
+
+    @property
+    def max_value(self) -> float:
+        return float(self._table.max_value[self._row, self._col])
+
+    @property
+    def decay_per_hour(self) -> float:
+        return float(self._table.decay_per_hour[self._row, self._col])
+
+    def model_copy(self, **kwargs) -> Attribute:
+        """脱离表的独立副本（推测执行在副本上模拟）"""
+        return Attribute(name=self.name, current=self.current, decay_per_hour=self.decay_per_hour, max_value=self.max_value)
+
+    def __repr__(self) -> str:
+        return f"AttributeValue(name={self.name!r}, current={self.current}, max_value={self.max_value})"
+
+
+class AttributeRow(Mapping[str, AttributeValue]):
+    """某个玩家在属性表中的一行，按属性名访问"""
+
+    __slots__ = ("table", "row", "_values")
+
+    def __init__(self, table: AttributeTable, row: int):
+        self.table = table
+        self.row = row
+        self._values: Dict[str, AttributeValue] = {
+            name: AttributeValue(table, row, col) for name, col in table.index.items()
+        }
+
+    def __getitem__(self, name: str) -> AttributeValue:
+        return self._values[name]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._values)
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+    def get(self, name: str, default: Optional[Any] = None) -> Optional[AttributeValue]:
+        return self._values.get(name, default)
@@ -0,0 +1,180 @@
+"""
+运行中游戏的断点保存与恢复。
+
+- capture：在事件循环里同步取一份只含基础类型的状态——世界（价格、各库存、玩家金币 / 位置 / 可达地点、
+  属性表、结算日）、游戏时间、随机数流的状态、每个玩家的记忆，以及提示词模块里的计划和总结。
+  得到的数据不与运行中的对象共享可变部分，耗时为毫秒级，取完后 Agent 可以立即继续修改世界。
+  动作在前端动画结束后才在 world_lock 内一次写入世界，Checkpointer 也在 world_lock 内 capture，
+  所以断点总落在动作之间，不会只含某个动作的一半修改；
+- 序列化（pickle）、压缩（zlib）和写盘放到后台线程（asyncio.to_thread），先写临时文件再原子替换，
+  Agent 不需要为保存断点暂停，崩溃时也不会留下写了一半的文件；
+- main 以 `--resume <文件>` 启动时，按同样的配置创建 World 后调用 restore 写回状态，时钟跳到保存时的游戏时间。
+
+只保存数据而不直接 pickle World / Player：运行中的对象持有 LLM 客户端、asyncio future 和后台线程，
+恢复时由正常的初始化流程重建。
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import pickle
+import time
+import zlib
+from typing import Any, Dict, Optional
+
+from .agent_config import CHECKPOINT_INTERVAL_S, CHECKPOINT_PATH
+from . import event_log
+from .rng import get_rng
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"WCKPT1\n"
+# 写盘在后台线程里，压缩等级取 1：体积与 6 相差不大，耗时少得多
+COMPRESS_LEVEL = 1
+
+
+def capture(world) -> Dict[str, Any]:
+    """当前运行状态的完整快照（只含基础类型）"""
+    return {
+        "saved_at": time.time(),
+        "time": {"base": world.time, "now": world.get_time()},
+        "world": event_log.capture(world),
+        "event_seq": world.events.seq if world.events is not None else None,
+        "rng": get_rng().state(),
+        "players": {
+            str(p.id): {
+                "memory": p.memory.state(),
+                "plan": p.agent.prompt_builder.plan,
+                "summary": p.agent.prompt_builder.summary,
+            }
+            for p in world.players
+        },
+    }
+
+
+def restore(world, state: Dict[str, Any]) -> None:
+    """把 capture 得到的状态写回新建的 World（需按同样的玩家与商品表创建）"""
+    event_log.restore(world, state["world"])
+    # 各随机数流接着保存时的位置继续（World.rng 是共享实例里的 "market" 流）
+    get_rng().load_state(state["rng"])
+    world.time = state["time"]["base"]
+    world.clock.start = world.time
+    world.clock.seek(state["time"]["now"])
+    for player in world.players:
+        saved = state["players"][str(player.id)]
+        player.memory.load_state(saved["memory"])
+        player.agent.prompt_builder.plan = saved["plan"]
+        player.agent.prompt_builder.summary = saved["summary"]
+
+
+def dump(state: Dict[str, Any], path: str) -> int:
+    """写入断点文件，返回字节数"""
+    blob = MAGIC + zlib.compress(pickle.dumps(state, protocol=pickle.HIGHEST_PROTOCOL), COMPRESS_LEVEL)
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(blob)
+    os.replace(tmp, path)
+    return len(blob)
+
+
+def load(path: str) -> Dict[str, Any]:
+    """读取断点文件（只应读取本程序写出的文件）"""
+    with open(path, "rb") as f:
+        data = f.read()
+    if not data.startswith(MAGIC):
+        raise ValueError(f"不是断点文件: {path}")
+    return pickle.loads(zlib.decompress(memoryview(data)[len(MAGIC):]))
+
+
+def resume(world, path: str) -> Dict[str, Any]:
+    start = time.perf_counter()
+    state = load(path)
+    restore(world, state)
+    logger.info(
+        "Resumed from %s (game time %s) in %.1f ms",
+        path, state["time"]["now"].strftime("%Y-%m-%d %H:%M"), (time.perf_counter() - start) * 1000,
+    )
+    return state
+
+
+class Checkpointer:
+    """每 interval_s 秒在后台保存一次断点；stop 时再保存最后一次"""
+
+    def __init__(
+        self,
+        world,
+        world_lock: asyncio.Lock,
+        path: str = CHECKPOINT_PATH,
+        interval_s: float = CHECKPOINT_INTERVAL_S,
+    ):
+        self.world = world
+        self.world_lock = world_lock
+        self.path = path
+        self.interval_s = interval_s
+        self._task: Optional[asyncio.Task] = None
+        # 同一时间只有一次写盘
+        self._lock = asyncio.Lock()
+        self.saves = 0
+        self.skipped = 0
+        self.failures = 0
+        self.bytes = 0
+        self.capture_ms = 0.0
+        self.write_ms = 0.0
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval_s)
+            try:
+                await self.save()
+            except Exception:
+                self.failures += 1
+                logger.exception("checkpoint save to %s failed", self.path)
+
+    async def save(self) -> bool:
+        """保存一次断点；上一次还没写完时跳过，返回是否保存"""
+        if self._lock.locked():
+            self.skipped += 1
+            return False
+        async with self._lock:
+            await self._save()
+        return True
+
+    async def _save(self) -> None:
+        # 等正在写入世界的动作完成；capture 本身不 await，持锁只有毫秒级
+        async with self.world_lock:
+            start = time.perf_counter()
+            state = capture(self.world)
+            captured = time.perf_counter()
+        self.bytes = await asyncio.to_thread(dump, state, self.path)
+        self.capture_ms = (captured - start) * 1000
+        self.write_ms = (time.perf_counter() - captured) * 1000
+        self.saves += 1
+
+    async def stop(self) -> None:
+        """等正在进行的写盘完成后停止定时保存，并保存最后一次"""
+        async with self._lock:
+            if self._task is not None:
+                self._task.cancel()
+                try:
+                    await self._task
+                except asyncio.CancelledError:
+                    pass
+                self._task = None
+            await self._save()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "path": self.path,
+            "saves": self.saves,
+            "skipped": self.skipped,
+            "failures": self.failures,
+            "bytes": self.bytes,
+            "last_capture_ms": round(self.capture_ms, 2),
+            "last_write_ms": round(self.write_ms, 2),
+        }
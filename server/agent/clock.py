@@ -0,0 +1,170 @@
+"""
+可替换的游戏时钟。
+
+- `RealTimeClock`：原来的做法，游戏时间 = 开始时间 + 实际流逝时间 × TIME_RATIO，配合 Unity 使用；
+  动作耗时由前端动画的真实时长体现，`elapse` 不做任何事。
+- `SimClock`：离散事件时钟。动作按 ACTION_GAME_MINUTES 建模的耗时调用 `elapse`，
+  Agent 挂起等待；当所有参与的 Agent 都在等待时，时钟直接跳到最早的唤醒时间并唤醒对应 Agent。
+  思考（LLM 调用）不消耗游戏时间，结果与机器快慢无关，多日对局可以在几秒内跑完。
+"""
+from __future__ import annotations
+
+import asyncio
+import heapq
+import itertools
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from .agent_config import ACTION_GAME_MINUTES, CLOCK_MODE, LOCATION_GRAPH, TIME_RATIO
+
+logger = logging.getLogger(__name__)
+
+
+def travel_minutes(origin: str, target: str) -> float:
+    """按 LOCATION_GRAPH 求两地之间的最短移动耗时（分钟）；图中没有的地点按 move 的默认耗时"""
+    if origin == target:
+        return 0.0
+    if origin not in LOCATION_GRAPH or target not in LOCATION_GRAPH:
+        return float(ACTION_GAME_MINUTES.get("move", 0))
+    dist = {origin: 0.0}
+    heap = [(0.0, origin)]
+    while heap:
+        d, node = heapq.heappop(heap)
+        if node == target:
+            return d
+        if d > dist[node]:
+            continue
+        for nxt, cost in LOCATION_GRAPH.get(node, {}).items():
+            nd = d + cost
+            if nd < dist.get(nxt, float("inf")):
+                dist[nxt] = nd
+                heapq.heappush(heap, (nd, nxt))
+    return float(ACTION_GAME_MINUTES.get("move", 0))
+
+
+def action_seconds(action: Dict[str, Any], origin: Optional[str] = None) -> float:
+    """动作消耗的游戏时间（秒）；origin 为动作开始前所在地点，用于计算移动耗时"""
+    kind = action.get("type")
+    if kind == "move" and origin is not None:
+        return travel_minutes(origin, action.get("target", origin)) * 60
+    if kind == "sleep":
+        return float(action.get("minutes") or 0) * 60
+    if kind == "wait":
+        # wait 的 seconds 是前端等待的真实秒数
+        return float(action.get("seconds") or 0) * TIME_RATIO
+    return float(ACTION_GAME_MINUTES.get(kind, 0)) * 60
+
+
+class Clock:
+    def now(self) -> datetime:
+        raise NotImplementedError
+
+    def seek(self, game_time: datetime) -> None:
+        """把当前游戏时间设为 game_time（断点恢复用）"""
+        raise NotImplementedError
+
+    async def elapse(self, seconds: float) -> None:
+        """当前 Agent 消耗 seconds 秒游戏时间"""
+
+    async def idle(self, real_seconds: float) -> None:
+        """动作之间的节奏停顿，只对实时模式有意义"""
+        await asyncio.sleep(real_seconds)
+
+    def join(self) -> None:
+        """Agent 开始参与调度"""
+
+    def leave(self) -> None:
+        """Agent 退出调度（结束、死亡或异常）"""
+
+
+class RealTimeClock(Clock):
+    def __init__(self, start: datetime, ratio: float = TIME_RATIO):
+        self.start = start
+        self.ratio = ratio
+        # 实际时间的起点；新开局时与 start 相同，断点恢复后前移到恢复时刻之前
+        self.origin = start
+
+    def now(self) -> datetime:
+        return self.start + (datetime.now() - self.origin) * self.ratio
+
+    def seek(self, game_time: datetime) -> None:
+        self.origin = datetime.now() - (game_time - self.start) / self.ratio
+
+
+class SimClock(Clock):
+    def __init__(self, start: datetime):
+        self.start = start
+        self.elapsed = 0.0
+        self.participants = 0
+        # (唤醒时间, 序号, future)，序号保证同一时刻按提交顺序唤醒
+        self._waiters: List[Tuple[float, int, asyncio.Future]] = []
+        self._seq = itertools.count()
+        self._waiting = 0
+        self.jumps = 0
+
+    def now(self) -> datetime:
+        return self.start + timedelta(seconds=self.elapsed)
+
+    def seek(self, game_time: datetime) -> None:
+        self.elapsed = (game_time - self.start).total_seconds()
+
+    async def elapse(self, seconds: float) -> None:
+        if seconds <= 0:
+            return
+        fut = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (self.elapsed + seconds, next(self._seq), fut))
+        self._waiting += 1
+        try:
+            self._advance()
+            await fut
+        finally:
+            if not fut.done() or fut.cancelled():
+                # 被取消：future 留在堆里，推进时跳过
+                fut.cancel()
+                self._waiting -= 1
+                self._advance()
+
+    async def idle(self, real_seconds: float) -> None:
+        # 实时模式下这段停顿对应的游戏时间同样要流逝，否则只思考不行动的 Agent 会让时钟停住
+        await self.elapse(real_seconds * TIME_RATIO)
+
+    def join(self) -> None:
+        self.participants += 1
+
+    def leave(self) -> None:
+        self.participants -= 1
+        self._advance()
+
+    def _advance(self) -> None:
+        """所有参与者都在等待时，跳到最早的唤醒时间，唤醒这一时刻到期的 Agent"""
+        while self._waiters and self._waiting >= self.participants:
+            deadline = self._waiters[0][0]
+            woke = 0
+            while self._waiters and self._waiters[0][0] <= deadline:
+                _, _, fut = heapq.heappop(self._waiters)
+                if fut.done():
+                    continue
+                fut.set_result(None)
+                self._waiting -= 1
+                woke += 1
+            if woke:
+                self.elapsed = max(self.elapsed, deadline)
+                self.jumps += 1
+                return
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "now": self.now().isoformat(timespec="minutes"),
+            "participants": self.participants,
+            "waiting": self._waiting,
+            "jumps": self.jumps,
+        }
+
+
+def make_clock(start: datetime, mode: str = CLOCK_MODE) -> Clock:
+    if mode == "sim":
+        return SimClock(start)
+    if mode != "realtime":
+        raise ValueError(f"未知的 CLOCK_MODE: {mode}")
+    return RealTimeClock(start)
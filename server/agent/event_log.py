@@ -0,0 +1,315 @@
+"""
+世界状态的事件日志（只追加）与快照回放。
+
+- 每次状态变化（移动、解锁地点、金币、属性、库存、价格、每日结算）由 World.record 写成一条带类型的事件，
+  事件携带变化后的值（结算除外），回放时按顺序覆盖即可；
+- 二进制格式：文件头 MAGIC，之后每条记录为 `<II` 前缀（负载长度、CRC32）、`<QBd` 元数据
+  （序号、类型码、游戏时间戳）加 JSON 负载；CRC 覆盖序号之后的所有字节，读到损坏或被截断的尾部时停止（进程崩溃时最多丢最后几条）；
+- 每 EVENT_SNAPSHOT_EVERY 条事件写一份压缩快照 `snapshot-<序号>.json.z`，挂载时写第 0 号快照。
+  触发快照的调用方（通常持有 world_lock、正在执行动作）只在事件循环里取一份只含基础类型的状态，
+  序列化、压缩和写盘交给单个后台写线程，按提交顺序完成，不阻塞其它 Agent；
+- `Replayer.restore` 取目标序号之前最近的快照，再回放其后的事件，把一个新建的 World 恢复到任意序号的状态，
+  不需要重新调用 LLM 或等待动作。
+
+目录结构：EVENT_LOG_DIR/<run_id>/events.bin 与若干快照文件。
+"""
+from __future__ import annotations
+
+import json
+import logging
+import os
+import struct
+import time
+import zlib
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from .agent_config import EVENT_LOG_DIR, EVENT_LOG_FLUSH_EVERY, EVENT_SNAPSHOT_EVERY
+from .item_registry import CompactInventory
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"WEVLOG1\n"
+# 负载长度、CRC32
+PREFIX = struct.Struct("<II")
+# 序号、类型码、游戏时间戳；CRC 覆盖这部分与负载
+META = struct.Struct("<QBd")
+HEADER_SIZE = PREFIX.size + META.size
+# 类型码按位置编号，只能在末尾追加
+EVENT_KINDS = ("move", "accessible", "money", "attr", "inventory", "prices", "settle")
+_KIND_CODES = {kind: i for i, kind in enumerate(EVENT_KINDS)}
+EVENTS_FILE = "events.bin"
+
+
+@dataclass(slots=True)
+class Event:
+    seq: int
+    kind: str
+    time: float
+    data: Dict[str, Any]
+
+
+def _encode(seq: int, kind: str, t: float, data: Dict[str, Any]) -> bytes:
+    payload = json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    body = META.pack(seq, _KIND_CODES[kind], t) + payload
+    return PREFIX.pack(len(payload), zlib.crc32(body)) + body
+
+
+def _scan(path: str) -> Iterator[Tuple[int, int, int, float, memoryview]]:
+    """逐条校验记录，产出 (记录结束位置, 序号, 类型码, 时间, 负载)；遇到损坏或不完整的记录即停止"""
+    with open(path, "rb") as f:
+        data = f.read()
+    if not data.startswith(MAGIC):
+        raise ValueError(f"不是事件日志文件: {path}")
+    view = memoryview(data)
+    pos = len(MAGIC)
+    while pos < len(data):
+        end = pos + HEADER_SIZE
+        if end <= len(data):
+            length, crc = PREFIX.unpack_from(data, pos)
+            end += length
+        if end > len(data) or zlib.crc32(view[pos + PREFIX.size:end]) != crc:
+            logger.warning("event log %s: truncated or corrupt record at byte %d, stopping", path, pos)
+            return
+        seq, code, t = META.unpack_from(data, pos + PREFIX.size)
+        yield end, seq, code, t, view[pos + HEADER_SIZE:end]
+        pos = end
+
+
+def read_events(path: str, start: int = 0) -> Iterator[Event]:
+    """按顺序读出序号大于 start 的事件"""
+    for _, seq, code, t, payload in _scan(path):
+        if seq > start:
+            yield Event(seq, EVENT_KINDS[code], t, json.loads(bytes(payload)))
+
+
+# --- 快照 ---
+
+def _inventories(world) -> Dict[str, CompactInventory]:
+    """按 owner 收集所有库存：集市、玩家背包、家中容器"""
+    invs = {world.market_stock.owner: world.market_stock}
+    for player in world.players:
+        invs[player.inventory.owner] = player.inventory
+    for home in world.players_home.values():
+        for facility in home.inner_things.values():
+            if isinstance(facility, CompactInventory):
+                invs[facility.owner] = facility
+    return invs
+
+
+def capture(world) -> Dict[str, Any]:
+    """世界可变状态的紧凑快照（只含基础类型）"""
+    table = world.attributes
+    n = table.size
+    return {
+        "settled_day": world.settled_day,
+        "prices": {name: meta.get("cur_price") for name, meta in zip(world.item_registry.names, world.item_registry.meta)},
+        "inventories": {owner: list(inv.counts) for owner, inv in _inventories(world).items()},
+        "players": {
+            str(p.id): {"money": p.money, "location": p.cur_location, "accessible": dict(p.accessible)}
+            for p in world.players
+        },
+        "attributes": {"current": table.current[:n].tolist(), "alive": table.alive[:n].tolist()},
+    }
+
+
+def _write_snapshot(path: str, state: Dict[str, Any]) -> int:
+    """后台写线程：压缩后先写临时文件再原子替换，返回字节数"""
+    blob = zlib.compress(json.dumps(state, ensure_ascii=False).encode("utf-8"))
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(blob)
+    os.replace(tmp, path)
+    return len(blob)
+
+
+def restore(world, state: Dict[str, Any]) -> None:
+    """把 capture 得到的快照写回 World（World 需按同样的玩家与商品表创建）"""
+    world.settled_day = state["settled_day"]
+    registry = world.item_registry
+    for name, price in state["prices"].items():
+        registry.meta[registry.id(name)]["cur_price"] = price
+    invs = _inventories(world)
+    for owner, counts in state["inventories"].items():
+        inv = invs[owner]
+        for item_id, n in enumerate(counts):
+            inv.add(item_id, n - inv.counts[item_id])
+    for player in world.players:
+        saved = state["players"][str(player.id)]
+        player.money = saved["money"]
+        player.cur_location = saved["location"]
+        player.accessible = dict(saved["accessible"])
+    table = world.attributes
+    n = len(state["attributes"]["current"])
+    table.current[:n] = state["attributes"]["current"]
+    table.alive[:n] = state["attributes"]["alive"]
+    for key in list(world.versions):
+        world.bump(key)
+
+
+# --- 回放 ---
+
+def _player(world, pid):
+    for p in world.players:
+        if p.id == pid:
+            return p
+    raise KeyError(f"玩家 {pid} 不存在")
+
+
+def _apply_inventory(world, data):
+    inv = _inventories(world)[data["owner"]]
+    item_id = world.item_registry.id(data["item"])
+    inv.add(item_id, data["count"] - inv.counts[item_id])
+
+
+def _apply_prices(world, data):
+    registry = world.item_registry
+    for name, price in data["prices"].items():
+        registry.meta[registry.id(name)]["cur_price"] = price
+
+
+def _apply_settle(world, data):
+    world.attributes.decay(24)
+    world.settled_day = data["day"]
+
+
+_APPLY: Dict[str, Callable[[Any, Dict[str, Any]], None]] = {
+    "move": lambda w, d: setattr(_player(w, d["player"]), "cur_location", d["location"]),
+    "accessible": lambda w, d: _player(w, d["player"]).accessible.__setitem__(d["location"], d["value"]),
+    "money": lambda w, d: setattr(_player(w, d["player"]), "money", d["value"]),
+    "attr": lambda w, d: setattr(_player(w, d["player"]).attribute[d["attr"]], "current", d["value"]),
+    "inventory": _apply_inventory,
+    "prices": _apply_prices,
+    "settle": _apply_settle,
+}
+
+
+def apply(world, event: Event) -> None:
+    _APPLY[event.kind](world, event.data)
+
+
+class EventLog:
+    def __init__(
+        self,
+        out_dir: str = EVENT_LOG_DIR,
+        run_id: Optional[str] = None,
+        snapshot_every: int = EVENT_SNAPSHOT_EVERY,
+        flush_every: int = EVENT_LOG_FLUSH_EVERY,
+    ):
+        self.run_id = run_id or time.strftime("%Y%m%d%H%M%S")
+        self.run_dir = os.path.join(out_dir, self.run_id)
+        self.snapshot_every = snapshot_every
+        self.flush_every = flush_every
+        os.makedirs(self.run_dir, exist_ok=True)
+        path = os.path.join(self.run_dir, EVENTS_FILE)
+        self.seq = 0
+        if os.path.exists(path):
+            # 接着已有日志追加（断点恢复后继续运行）；先截掉崩溃时写了一半的尾部
+            good = len(MAGIC)
+            for good, self.seq, _, _, _ in _scan(path):
+                pass
+            self._file = open(path, "r+b")
+            self._file.truncate(good)
+            self._file.seek(good)
+        else:
+            self._file = open(path, "wb")
+            self._file.write(MAGIC)
+        self.last_snapshot = self.seq
+        self.snapshots = 0
+        self.snapshot_errors = 0
+        self.bytes = 0
+        self._unflushed = 0
+        # 单线程保证快照按序号顺序落盘
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="event-snapshot")
+
+    def attach(self, world) -> None:
+        """挂到 World 上并写下当前序号的快照作为回放起点"""
+        world.events = self
+        self.snapshot(world)
+
+    def append(self, world, kind: str, data: Dict[str, Any]) -> int:
+        self.seq += 1
+        record = _encode(self.seq, kind, world.get_time().timestamp(), data)
+        self._file.write(record)
+        self.bytes += len(record)
+        self._unflushed += 1
+        if self._unflushed >= self.flush_every:
+            self.flush()
+        if self.seq - self.last_snapshot >= self.snapshot_every:
+            self.snapshot(world)
+        return self.seq
+
+    def snapshot(self, world) -> Future:
+        """在调用处取当前状态，写盘在后台线程完成；返回写盘的 Future（结果为快照路径）"""
+        self.flush()
+        path = os.path.join(self.run_dir, f"snapshot-{self.seq:010d}.json.z")
+        future = self._writer.submit(_write_snapshot, path, capture(world))
+        future.add_done_callback(lambda f, path=path: self._written(f, path))
+        self.last_snapshot = self.seq
+        return future
+
+    def _written(self, future: Future, path: str) -> None:
+        if future.cancelled() or future.exception() is not None:
+            self.snapshot_errors += 1
+            logger.error("event log snapshot %s failed: %s", path, None if future.cancelled() else future.exception())
+            return
+        self.snapshots += 1
+
+    def flush(self) -> None:
+        self._file.flush()
+        self._unflushed = 0
+
+    def close(self) -> None:
+        """写完已提交的快照后关闭日志文件"""
+        self._writer.shutdown(wait=True)
+        if not self._file.closed:
+            self.flush()
+            self._file.close()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "run_dir": self.run_dir,
+            "events": self.seq,
+            "bytes": self.bytes,
+            "snapshots": self.snapshots,
+            "snapshot_errors": self.snapshot_errors,
+        }
+
+
+class Replayer:
+    """从事件日志目录恢复 World"""
+
+    def __init__(self, run_dir: str):
+        self.run_dir = run_dir
+        self.path = os.path.join(run_dir, EVENTS_FILE)
+
+    def snapshot_seqs(self) -> List[int]:
+        seqs = []
+        for name in os.listdir(self.run_dir):
+            if name.startswith("snapshot-") and name.endswith(".json.z"):
+                seqs.append(int(name[len("snapshot-"):-len(".json.z")]))
+        return sorted(seqs)
+
+    def load_snapshot(self, seq: int) -> Dict[str, Any]:
+        with open(os.path.join(self.run_dir, f"snapshot-{seq:010d}.json.z"), "rb") as f:
+            return json.loads(zlib.decompress(f.read()))
+
+    def events(self, start: int = 0) -> Iterator[Event]:
+        return read_events(self.path, start)
+
+    def restore(self, world, upto: Optional[int] = None) -> int:
+        """
+        把新建的 World 恢复到第 upto 条事件之后的状态（默认恢复到日志末尾），返回实际到达的序号。
+        """
+        bases = [s for s in self.snapshot_seqs() if upto is None or s <= upto]
+        if not bases:
+            raise FileNotFoundError(f"{self.run_dir} 中没有可用的快照")
+        seq = bases[-1]
+        restore(world, self.load_snapshot(seq))
+        for event in self.events(seq):
+            if upto is not None and event.seq > upto:
+                break
+            apply(world, event)
+            seq = event.seq
+        return seq
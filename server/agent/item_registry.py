@@ -0,0 +1,127 @@
+"""
+物品注册表与紧凑库存。
+
+- `ItemRegistry`：加载商品表时把物品名映射为连续的整数 ID，元数据按 ID 存放；
+- `CompactInventory`：每种物品一格的定长计数数组，外加持有物品的 ID 集合作为稀疏视图。
+  背包、家中容器和集市库存都用它，增减数量只是数组下标运算，不再修改带校验的 pydantic 模型。
+只在提示词和序列化的边界上通过 `to_dict` / `to_container` 转回原来的表示。
+"""
+from __future__ import annotations
+
+import sys
+from array import array
+from typing import Any, Dict, Iterator, Mapping, Optional, Set, Tuple
+
+from .models.state import Container, Item
+
+
+class ItemRegistry:
+    def __init__(self, item_data: Mapping[str, Dict[str, Any]]):
+        self.names: Tuple[str, ...] = tuple(sys.intern(name) for name in item_data)
+        self.index: Dict[str, int] = {name: i for i, name in enumerate(self.names)}
+        # 直接引用传入的字典（集市的 Market.items），价格更新后这里同步可见
+        self.meta: Tuple[Dict[str, Any], ...] = tuple(item_data[name] for name in self.names)
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def __contains__(self, name: object) -> bool:
+        return name in self.index
+
+    def id(self, name: str) -> int:
+        return self.index[name]
+
+    def get(self, name: str) -> Optional[int]:
+        return self.index.get(name)
+
+    def name(self, item_id: int) -> str:
+        return self.names[item_id]
+
+    def data(self, name: str) -> Optional[Dict[str, Any]]:
+        """按物品名取元数据；未注册的物品返回 None"""
+        item_id = self.index.get(name)
+        return None if item_id is None else self.meta[item_id]
+
+
+class CompactInventory:
+    __slots__ = ("registry", "name", "description", "owner", "counts", "_held")
+
+    def __init__(
+        self,
+        registry: ItemRegistry,
+        name: str = "",
+        description: str = "",
+        counts: Optional[array] = None,
+        owner: str = "",
+    ):
+        self.registry = registry
+        self.name = name
+        self.description = description
+        # 全局唯一的归属标识（"market" / "player:1" / "home:1:储物柜"），事件日志据此定位库存
+        self.owner = owner
+        self.counts = array("q", counts) if counts is not None else array("q", [0]) * len(registry)
+        self._held: Set[int] = {i for i, n in enumerate(self.counts) if n > 0}
+
+    @classmethod
+    def from_container(cls, container: Container, registry: ItemRegistry, owner: str = "") -> CompactInventory:
+        inv = cls(registry, name=container.name, description=container.description, owner=owner)
+        for name, item in container.items.items():
+            inv.add(registry.id(name), item.quantity)
+        return inv
+
+    def count(self, item_id: int) -> int:
+        return self.counts[item_id]
+
+    def quantity(self, name: str) -> int:
+        """按物品名查询数量；未注册的物品为 0"""
+        item_id = self.registry.get(name)
+        return 0 if item_id is None else self.counts[item_id]
+
+    def has(self, item_id: int, qty: int = 1) -> bool:
+        return self.counts[item_id] >= qty
+
+    def add(self, item_id: int, qty: int) -> None:
+        self.counts[item_id] += qty
+        if self.counts[item_id] > 0:
+            self._held.add(item_id)
+        else:
+            self._held.discard(item_id)
+
+    def remove(self, item_id: int, qty: int) -> bool:
+        """数量不足时不做修改并返回 False"""
+        if self.counts[item_id] < qty:
+            return False
+        self.add(item_id, -qty)
+        return True
+
+    def held(self) -> Iterator[Tuple[int, int]]:
+        """按 ID 顺序列出持有的 (物品 ID, 数量)"""
+        for item_id in sorted(self._held):
+            yield item_id, self.counts[item_id]
+
+    def __len__(self) -> int:
+        return len(self._held)
+
+    def copy(self) -> CompactInventory:
+        return CompactInventory(self.registry, self.name, self.description, self.counts, self.owner)
+
+    def to_dict(self) -> Dict[str, int]:
+        names = self.registry.names
+        return {names[item_id]: n for item_id, n in self.held()}
+
+    def to_container(self) -> Container:
+        items = {}
+        for item_id, n in self.held():
+            name = self.registry.names[item_id]
+            meta = self.registry.meta[item_id]
+            function = meta.get("function")
+            items[name] = Item(
+                name=name,
+                quantity=n,
+                description=meta.get("description", ""),
+                function=function if isinstance(function, dict) else {},
+            )
+        return Container(name=self.name, items=items, description=self.description)
+
+    def __repr__(self) -> str:
+        return f"CompactInventory(name={self.name!r}, items={self.to_dict()!r})"
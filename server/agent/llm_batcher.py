@@ -0,0 +1,114 @@
+"""
+跨 Agent 的 LLM 请求合批。
+
+各 Agent 的 plan/act/reflect 请求先进入队列，在一个很短的窗口内（或攒够
+`max_batch` 条时）合并为一次 `abatch` 提交，再把结果分发回各自等待的协程。
+
+只有声明 `supports_batch = True` 的模型才合批：它的 `abatch` 必须把整组请求作为
+一次调用提交（例如 MockChatModel 模拟的批量接口）。ChatOpenAI 的 `abatch` 只是
+并发调用多次 `ainvoke`，合批省不掉任何开销，反而多等一个窗口：main 只在模型支持批量接口时
+创建合批器，其它模型（如预算降级的备用模型）经过合批器时直接发送。
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from .agent_config import LLM_BATCH_MAX_SIZE, LLM_BATCH_WINDOW
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class _Bucket:
+    llm: Any
+    items: List[Tuple[Any, asyncio.Future]] = field(default_factory=list)
+    timer: Optional[asyncio.TimerHandle] = None
+
+
+def supports_batch(llm: Any) -> bool:
+    """模型的 abatch 是否把整组请求作为一次调用提交"""
+    return bool(getattr(llm, "supports_batch", False))
+
+
+class LLMBatcher:
+    def __init__(self, window: float = LLM_BATCH_WINDOW, max_batch: int = LLM_BATCH_MAX_SIZE):
+        self.window = window
+        self.max_batch = max_batch
+        # 同一个模型实例的请求才能合批
+        self._buckets: Dict[int, _Bucket] = {}
+        self._inflight: Set[asyncio.Task] = set()
+        self.batches = 0
+        self.requests = 0
+        # 模型不支持批量接口、直接发送的请求数
+        self.direct = 0
+        self.largest_batch = 0
+
+    async def submit(self, llm: Any, msgs: Any) -> Any:
+        """提交一次对话请求，返回模型消息（与 `llm.ainvoke(msgs)` 等价）"""
+        # 没有批量接口的模型（例如预算降级时换用的备用模型）直接发送
+        if not supports_batch(llm):
+            self.direct += 1
+            return await llm.ainvoke(msgs)
+        loop = asyncio.get_running_loop()
+        fut = loop.create_future()
+        key = id(llm)
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = _Bucket(llm=llm)
+        bucket.items.append((msgs, fut))
+        if len(bucket.items) >= self.max_batch:
+            self._flush(key)
+        elif bucket.timer is None:
+            bucket.timer = loop.call_later(self.window, self._flush, key)
+        return await fut
+
+    def _flush(self, key: int) -> None:
+        bucket = self._buckets.pop(key, None)
+        if bucket is None:
+            return
+        if bucket.timer is not None:
+            bucket.timer.cancel()
+        # 等待方已取消的请求不再提交
+        items = [(msgs, fut) for msgs, fut in bucket.items if not fut.done()]
+        if not items:
+            return
+        task = asyncio.create_task(self._run(bucket.llm, items), name="llm-batch")
+        self._inflight.add(task)
+        task.add_done_callback(self._inflight.discard)
+
+    async def _run(self, llm: Any, items: List[Tuple[Any, asyncio.Future]]) -> None:
+        self.batches += 1
+        self.requests += len(items)
+        self.largest_batch = max(self.largest_batch, len(items))
+        try:
+            results = await llm.abatch([msgs for msgs, _ in items], return_exceptions=True)
+        except Exception as e:
+            logger.exception("LLM 合批请求失败")
+            results = [e] * len(items)
+        for (_, fut), res in zip(items, results):
+            if fut.done():
+                continue
+            if isinstance(res, BaseException):
+                fut.set_exception(res)
+            else:
+                fut.set_result(res)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "batches": self.batches,
+            "requests": self.requests,
+            "avg_batch": round(self.requests / self.batches, 2) if self.batches else 0.0,
+            "largest_batch": self.largest_batch,
+            "direct": self.direct,
+            "queued": sum(len(b.items) for b in self._buckets.values()),
+        }
+
+    async def aclose(self) -> None:
+        """立即提交所有排队请求并等待在途批次结束"""
+        for key in list(self._buckets):
+            self._flush(key)
+        if self._inflight:
+            await asyncio.gather(*self._inflight, return_exceptions=True)
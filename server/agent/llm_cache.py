@@ -0,0 +1,30 @@
+"""
+LLM 提示词 → 回复 的持久化缓存，实现见 common/prompt_cache.py（与 DesicionLayer 共用）。
+
+状态未变时 `PromptModule` 生成的提示词逐字节相同，可直接命中缓存。这里只按 agent_config 绑定默认参数。
+"""
+from __future__ import annotations
+
+from typing import Optional
+
+from common.prompt_cache import PromptCache as _PromptCache
+
+from .agent_config import LLM_CACHE_MAX_BYTES, LLM_CACHE_MAX_ENTRIES, LLM_CACHE_MODE, LLM_CACHE_PATH
+
+
+class PromptCache(_PromptCache):
+    def __init__(
+        self,
+        path: str = LLM_CACHE_PATH,
+        max_entries: int = LLM_CACHE_MAX_ENTRIES,
+        max_bytes: int = LLM_CACHE_MAX_BYTES,
+        readonly: bool = False,
+    ):
+        super().__init__(path, max_entries, max_bytes, readonly)
+
+    @classmethod
+    def from_config(cls) -> Optional[PromptCache]:
+        """按 LLM_CACHE_MODE 创建缓存：off 不启用，rw 读写，ro 只读回放"""
+        if LLM_CACHE_MODE == "off":
+            return None
+        return cls(readonly=LLM_CACHE_MODE == "ro")
@@ -0,0 +1,52 @@
+"""
+后台调试日志，实现见 common/log_sink.py（与 DesicionLayer 共用），这里按 agent_config 创建共享实例。
+
+默认实例在第一次 `emit` 时创建，进程退出时自动关闭；main 结束时也会显式关闭并打印统计。
+"""
+from __future__ import annotations
+
+from typing import Any, Dict, Optional
+
+from common.log_sink import LogSink, SharedSink
+
+from .agent_config import (
+    DEBUG_LOG_COMPRESS,
+    DEBUG_LOG_DIR,
+    DEBUG_LOG_ENABLED,
+    DEBUG_LOG_QUEUE_SIZE,
+    DEBUG_LOG_SAMPLE_RATES,
+    DEBUG_LOG_SEGMENT_BYTES,
+)
+from .rng import stream as rng_stream
+
+__all__ = ["LogSink", "close_sink", "emit", "get_sink"]
+
+
+def _create() -> Optional[LogSink]:
+    if not DEBUG_LOG_ENABLED:
+        return None
+    return LogSink(
+        out_dir=DEBUG_LOG_DIR,
+        max_queue=DEBUG_LOG_QUEUE_SIZE,
+        segment_bytes=DEBUG_LOG_SEGMENT_BYTES,
+        compress=DEBUG_LOG_COMPRESS,
+        sample_rates=DEBUG_LOG_SAMPLE_RATES,
+        rng=rng_stream("log_sink"),
+    )
+
+
+_shared = SharedSink(_create)
+
+
+def get_sink() -> Optional[LogSink]:
+    """进程内共享的日志实例；DEBUG_LOG_ENABLED=False 时返回 None"""
+    return _shared.get()
+
+
+def emit(stream: str, **record: Any) -> bool:
+    return _shared.emit(stream, **record)
+
+
+def close_sink() -> Optional[Dict[str, Any]]:
+    """关闭共享实例并返回最终统计；之后的 emit 会重新创建实例"""
+    return _shared.close()
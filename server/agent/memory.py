@@ -0,0 +1,186 @@
+"""
+有界的玩家记忆。
+
+- 最近的事件保存在环形缓冲区里（MEMORY_RECENT_SIZE 条），每条是结构化的 `MemoryEvent`；
+- 挤出缓冲区的旧事件压缩进按天的摘要（各类动作计数 + 当天最后几条），摘要最多保留
+  MEMORY_DIGEST_DAYS 天；
+- 配置了 MEMORY_SPILL_DIR 时，挤出的事件按 JSONL 分批追加到磁盘，保留完整历史。
+`MemoryStore` 兼容原来的 `List[str]` 用法：`len`、下标/切片、迭代得到的仍是
+`{"时间": "内容"}` 形式的字符串，提示词无需改动。
+"""
+from __future__ import annotations
+
+import json
+import logging
+import os
+from collections import deque
+from dataclasses import asdict, dataclass, field
+from typing import Any, Deque, Dict, Iterator, List, Union
+
+from .agent_config import MEMORY_DIGEST_DAYS, MEMORY_DIGEST_HIGHLIGHTS, MEMORY_RECENT_SIZE, MEMORY_SPILL_BATCH, MEMORY_SPILL_DIR
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(slots=True)
+class MemoryEvent:
+    time: str
+    kind: str
+    text: str
+
+    @property
+    def day(self) -> str:
+        return self.time[:10]
+
+    def render(self) -> str:
+        return json.dumps({self.time: self.text}, ensure_ascii=False)
+
+
+@dataclass(slots=True)
+class DayDigest:
+    day: str
+    count: int = 0
+    kinds: Dict[str, int] = field(default_factory=dict)
+    highlights: Deque[str] = field(default_factory=lambda: deque(maxlen=MEMORY_DIGEST_HIGHLIGHTS))
+
+    def add(self, event: MemoryEvent) -> None:
+        self.count += 1
+        self.kinds[event.kind] = self.kinds.get(event.kind, 0) + 1
+        self.highlights.append(event.text)
+
+    def render(self) -> str:
+        kinds = "、".join(f"{k or '其他'}{n}次" for k, n in self.kinds.items())
+        recent = "；".join(self.highlights)
+        return f"{self.day}: 共{self.count}条记录（{kinds}），最后几件事：{recent}"
+
+
+class MemoryStore:
+    def __init__(
+        self,
+        name: str = "",
+        recent_size: int = MEMORY_RECENT_SIZE,
+        digest_days: int = MEMORY_DIGEST_DAYS,
+        spill_dir: str = MEMORY_SPILL_DIR,
+    ):
+        self.name = name
+        self.recent: Deque[MemoryEvent] = deque(maxlen=max(1, recent_size))
+        # 与 recent 一一对应的渲染结果，提示词切片时不用重复 json.dumps
+        self._lines: Deque[str] = deque(maxlen=self.recent.maxlen)
+        self.digests: Dict[str, DayDigest] = {}
+        self.digest_days = digest_days
+        self.spill_path = os.path.join(spill_dir, f"{name or 'memory'}.jsonl") if spill_dir else ""
+        self._spill: List[MemoryEvent] = []
+        self.total = 0
+        self.spilled = 0
+
+    def record(self, time: str, kind: str, text: str) -> MemoryEvent:
+        event = MemoryEvent(time=time, kind=kind, text=text)
+        if len(self.recent) == self.recent.maxlen:
+            self._compact(self.recent[0])
+        self.recent.append(event)
+        self._lines.append(event.render())
+        self.total += 1
+        return event
+
+    def append(self, line: str) -> None:
+        """兼容旧写法 `memory.append(json.dumps({时间: 内容}))`"""
+        try:
+            data = json.loads(line)
+        except (TypeError, ValueError):
+            data = None
+        if isinstance(data, dict) and len(data) == 1:
+            (stamp, text), = data.items()
+            self.record(str(stamp), "", str(text))
+        else:
+            self.record("", "", str(line))
+
+    def _compact(self, event: MemoryEvent) -> None:
+        digest = self.digests.get(event.day)
+        if digest is None:
+            digest = self.digests[event.day] = DayDigest(event.day)
+            while len(self.digests) > self.digest_days:
+                del self.digests[min(self.digests)]
+        digest.add(event)
+        if self.spill_path:
+            self._spill.append(event)
+            if len(self._spill) >= MEMORY_SPILL_BATCH:
+                self.flush()
+
+    def flush(self) -> None:
+        """把待落盘的旧事件追加写入 JSONL"""
+        if not self._spill:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.spill_path) or ".", exist_ok=True)
+            with open(self.spill_path, "a", encoding="utf-8") as f:
+                for event in self._spill:
+                    f.write(json.dumps(asdict(event), ensure_ascii=False) + "\n")
+        except OSError:
+            logger.exception("memory spill failed: %s", self.spill_path)
+            return
+        self.spilled += len(self._spill)
+        self._spill.clear()
+
+    def digest_text(self) -> str:
+        return "\n".join(d.render() for _, d in sorted(self.digests.items()))
+
+    def copy(self) -> MemoryStore:
+        """独立副本（推测执行在上面补记预测的事件），不落盘；摘要也复制一份，副本压缩旧事件时不影响原记忆"""
+        other = MemoryStore(self.name, self.recent.maxlen, self.digest_days, spill_dir="")
+        other.recent.extend(self.recent)
+        other._lines.extend(self._lines)
+        other.digests = {
+            day: DayDigest(d.day, d.count, dict(d.kinds), deque(d.highlights, maxlen=d.highlights.maxlen))
+            for day, d in self.digests.items()
+        }
+        other.total = self.total
+        return other
+
+    def state(self) -> Dict[str, Any]:
+        """只含基础类型的当前状态（断点保存用），与运行中的对象不共享可变部分"""
+        return {
+            "recent": [(e.time, e.kind, e.text) for e in self.recent],
+            "digests": [(d.day, d.count, dict(d.kinds), list(d.highlights)) for d in self.digests.values()],
+            "spill": [(e.time, e.kind, e.text) for e in self._spill],
+            "total": self.total,
+            "spilled": self.spilled,
+        }
+
+    def load_state(self, state: Dict[str, Any]) -> None:
+        self.recent.clear()
+        self._lines.clear()
+        for time, kind, text in state["recent"]:
+            event = MemoryEvent(time, kind, text)
+            self.recent.append(event)
+            self._lines.append(event.render())
+        self.digests = {}
+        for day, count, kinds, highlights in state["digests"]:
+            digest = self.digests[day] = DayDigest(day, count, dict(kinds))
+            digest.highlights.extend(highlights)
+        self._spill = [MemoryEvent(*e) for e in state["spill"]]
+        self.total = state["total"]
+        self.spilled = state["spilled"]
+
+    def __len__(self) -> int:
+        return len(self.recent)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._lines)
+
+    def __getitem__(self, index: Union[int, slice]) -> Union[str, List[str]]:
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self._lines))
+            if step == 1 and stop == len(self._lines):
+                # 常见的 memory[-n:]，从右端取，避免遍历整个 deque
+                return [self._lines[i] for i in range(start, stop)]
+            return list(self._lines)[index]
+        return self._lines[index]
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "recent": len(self.recent),
+            "digest_days": len(self.digests),
+            "total": self.total,
+            "spilled": self.spilled,
+            "pending_spill": len(self._spill),
+        }
@@ -0,0 +1,207 @@
+"""
+LLM 调用计量与预算。
+
+按 (agent, 调用类型, 游戏日) 汇总 prompt/completion token、耗时、重试、缓存命中与错误次数；
+调用类型为 plan / act / summary，以及解析失败时的 repair。
+每个 Agent 每个游戏日有 token 预算（AGENT_DAILY_TOKEN_BUDGET，0 表示不限）：
+- 用量达到 soft 比例：降级为 soft，跳过反思、沿用上一次总结；
+- 超过预算：降级为 hard，另外沿用旧计划，动作改用便宜模型。
+退出时 `write_report` 输出 JSON + CSV 报告。
+"""
+from __future__ import annotations
+
+import csv
+import json
+import logging
+import os
+import time
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+from .agent_config import AGENT_BUDGET_SOFT_RATIO, AGENT_DAILY_TOKEN_BUDGET, METER_REPORT_DIR
+
+logger = logging.getLogger(__name__)
+
+BUDGET_NORMAL = "normal"
+BUDGET_SOFT = "soft"
+BUDGET_HARD = "hard"
+
+
+@dataclass(slots=True)
+class CallStats:
+    calls: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    latency_total: float = 0.0
+    latency_max: float = 0.0
+    retries: int = 0
+    cache_hits: int = 0
+    errors: int = 0
+
+    @property
+    def total_tokens(self) -> int:
+        return self.prompt_tokens + self.completion_tokens
+
+
+@dataclass
+class Meter:
+    daily_budget: int = AGENT_DAILY_TOKEN_BUDGET
+    soft_ratio: float = AGENT_BUDGET_SOFT_RATIO
+    rows: Dict[Tuple[str, str, int], CallStats] = field(default_factory=dict)
+    # 各 Agent 进入降级状态的次数，按级别统计
+    degraded: Dict[str, Dict[str, int]] = field(default_factory=dict)
+
+    def _row(self, agent: str, kind: str, day: int) -> CallStats:
+        key = (agent, kind, day)
+        row = self.rows.get(key)
+        if row is None:
+            row = self.rows[key] = CallStats()
+        return row
+
+    def record(
+        self,
+        agent: str,
+        kind: str,
+        day: int,
+        *,
+        prompt_tokens: int = 0,
+        completion_tokens: int = 0,
+        latency: float = 0.0,
+        cache_hit: bool = False,
+        error: bool = False,
+    ) -> None:
+        row = self._row(agent, kind, day)
+        row.calls += 1
+        row.prompt_tokens += prompt_tokens
+        row.completion_tokens += completion_tokens
+        row.latency_total += latency
+        row.latency_max = max(row.latency_max, latency)
+        row.cache_hits += int(cache_hit)
+        row.errors += int(error)
+
+    def record_retry(self, agent: str, kind: str, day: int, n: int = 1) -> None:
+        self._row(agent, kind, day).retries += n
+
+    def tokens_used(self, agent: str, day: int) -> int:
+        return sum(r.total_tokens for (a, _, d), r in self.rows.items() if a == agent and d == day)
+
+    def budget_level(self, agent: str, day: int) -> str:
+        if self.daily_budget <= 0:
+            return BUDGET_NORMAL
+        used = self.tokens_used(agent, day)
+        if used >= self.daily_budget:
+            return BUDGET_HARD
+        if used >= self.daily_budget * self.soft_ratio:
+            return BUDGET_SOFT
+        return BUDGET_NORMAL
+
+    def note_degraded(self, agent: str, level: str) -> None:
+        counts = self.degraded.setdefault(agent, {})
+        counts[level] = counts.get(level, 0) + 1
+
+    def summary(self) -> Dict[str, Any]:
+        agents: Dict[str, Dict[str, Any]] = {}
+        for (agent, kind, day), row in self.rows.items():
+            total = agents.setdefault(agent, {"tokens": 0, "calls": 0, "cache_hits": 0, "retries": 0, "errors": 0})
+            total["tokens"] += row.total_tokens
+            total["calls"] += row.calls
+            total["cache_hits"] += row.cache_hits
+            total["retries"] += row.retries
+            total["errors"] += row.errors
+        for agent, total in agents.items():
+            total["degraded"] = dict(self.degraded.get(agent, {}))
+        return agents
+
+    def report_rows(self) -> List[Dict[str, Any]]:
+        rows = []
+        for (agent, kind, day), row in sorted(self.rows.items()):
+            data = asdict(row)
+            data["total_tokens"] = row.total_tokens
+            data["latency_avg"] = round(row.latency_total / row.calls, 4) if row.calls else 0.0
+            data["latency_total"] = round(row.latency_total, 4)
+            data["latency_max"] = round(row.latency_max, 4)
+            rows.append({"agent": agent, "kind": kind, "day": day, **data})
+        return rows
+
+    def write_report(self, out_dir: str = METER_REPORT_DIR) -> Tuple[str, str]:
+        os.makedirs(out_dir, exist_ok=True)
+        stamp = time.strftime("%Y%m%d%H%M%S")
+        rows = self.report_rows()
+        json_path = os.path.join(out_dir, f"metering_{stamp}.json")
+        with open(json_path, "w", encoding="utf-8") as f:
+            json.dump(
+                {"budget": {"daily": self.daily_budget, "soft_ratio": self.soft_ratio}, "agents": self.summary(), "rows": rows},
+                f,
+                ensure_ascii=False,
+                indent=2,
+            )
+        csv_path = os.path.join(out_dir, f"metering_{stamp}.csv")
+        with open(csv_path, "w", encoding="utf-8", newline="") as f:
+            if rows:
+                writer = csv.DictWriter(f, fieldnames=list(rows[0].keys()))
+                writer.writeheader()
+                writer.writerows(rows)
+        return json_path, csv_path
+
+
+class MeterCallback(BaseCallbackHandler):
+    """
+    挂在 fixer 所用模型上的回调，统计解析修复（repair）调用的 token 与耗时；
+    这类调用由 OutputFixingParser 内部发起，拿不到返回消息，只能通过回调计量。
+    """
+
+    run_inline = True
+
+    def __init__(self, agent: Any, kind: str = "repair"):
+        self.agent = agent
+        self.kind = kind
+        self._started: Dict[UUID, float] = {}
+
+    def on_chat_model_start(self, serialized, messages, *, run_id: UUID, **kwargs) -> None:
+        self._started[run_id] = time.perf_counter()
+
+    def on_llm_end(self, response, *, run_id: UUID, **kwargs) -> None:
+        started = self._started.pop(run_id, None)
+        meter: Optional[Meter] = getattr(self.agent, "meter", None)
+        if meter is None:
+            return
+        prompt_tokens, completion_tokens = _usage_from_result(response)
+        meter.record(
+            self.agent.name,
+            self.kind,
+            self.agent.day,
+            prompt_tokens=prompt_tokens,
+            completion_tokens=completion_tokens,
+            latency=time.perf_counter() - started if started is not None else 0.0,
+        )
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs) -> None:
+        started = self._started.pop(run_id, None)
+        meter: Optional[Meter] = getattr(self.agent, "meter", None)
+        if meter is not None:
+            meter.record(
+                self.agent.name,
+                self.kind,
+                self.agent.day,
+                latency=time.perf_counter() - started if started is not None else 0.0,
+                error=True,
+            )
+
+
+def usage_tokens(msg: Any) -> Tuple[int, int]:
+    """从模型消息的 usage_metadata 取 (prompt, completion) token 数"""
+    usage = getattr(msg, "usage_metadata", None) or {}
+    return usage.get("input_tokens", 0) or 0, usage.get("output_tokens", 0) or 0
+
+
+def _usage_from_result(result: Any) -> Tuple[int, int]:
+    for gens in getattr(result, "generations", None) or []:
+        for gen in gens:
+            msg = getattr(gen, "message", None)
+            if msg is not None and getattr(msg, "usage_metadata", None):
+                return usage_tokens(msg)
+    usage = (getattr(result, "llm_output", None) or {}).get("token_usage") or {}
+    return usage.get("prompt_tokens", 0) or 0, usage.get("completion_tokens", 0) or 0
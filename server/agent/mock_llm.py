@@ -0,0 +1,230 @@
+"""
+本地确定性 LLM 替身，用于离线压测。
+
+`MockChatModel` 是一个 LangChain 聊天模型，可直接替换 `ChatOpenAI`：
+根据提示词中的位置、属性、背包与集市商品列表生成合法的 `ActionList`
+JSON、计划或总结文本；延迟分布、错误率与 token 计数均可配置。
+同一 seed + 同一提示词总是得到相同的回复，与并发调度顺序无关；
+seed 默认由运行种子的 "mock_llm" 流派生（见 rng.py）。
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import random
+import re
+import time
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+from common.mock_llm import MockLLMError, maybe_fail, prompt_rng, sample_latency
+
+from .agent_config import (
+    MOCK_LLM_ERROR_RATE,
+    MOCK_LLM_LATENCY,
+    MOCK_LLM_LATENCY_DIST,
+    MOCK_LLM_LATENCY_JITTER,
+    MOCK_LLM_SEED,
+    MOCK_LLM_TOKEN_SCALE,
+)
+from .action_parser import ACTION_LIST_ADAPTER, to_action_dicts
+from .new_prompt import estimate_tokens
+from .rng import get_rng
+
+_ATTR_RE = {
+    "hunger": re.compile(r"饥饿值\s*(-?\d+(?:\.\d+)?)"),
+    "fatigue": re.compile(r"疲劳值\s*(-?\d+(?:\.\d+)?)"),
+    "thirst": re.compile(r"口渴值\s*(-?\d+(?:\.\d+)?)"),
+}
+_LOCATION_RE = re.compile(r"你现在所在的位置是：(.+?)。")
+_MONEY_RE = re.compile(r"你身上有 ￥(-?\d+(?:\.\d+)?)")
+_BACKPACK_RE = re.compile(r"你的背包里有：(.*)")
+_MARKET_RE = re.compile(r"^(.+?),描述:.*?商店存货:(\d+),价格:(\d+(?:\.\d+)?)", re.M)
+
+# 各属性对应的补给品，按优先级排列
+_SUPPLIES = {
+    "thirst": ["瓶装水", "饮料", "功能饮料", "咖啡"],
+    "hunger": ["面包", "干粮", "苹果", "烤肉", "丰盛的食物"],
+}
+
+
+class MockChatModel(BaseChatModel):
+    model_name: str = "mock-llm"
+    # 为 None 时使用运行种子派生的子种子
+    seed: Optional[int] = MOCK_LLM_SEED
+    # fixed / uniform / lognormal
+    latency_dist: str = MOCK_LLM_LATENCY_DIST
+    latency: float = MOCK_LLM_LATENCY
+    latency_jitter: float = MOCK_LLM_LATENCY_JITTER
+    error_rate: float = MOCK_LLM_ERROR_RATE
+    # 估算 token 数的放大系数，用于模拟更长/更短的真实 token 计数
+    token_scale: float = MOCK_LLM_TOKEN_SCALE
+    # 流式输出：首 token 占总延迟的比例，其余延迟均摊到各个分片
+    first_token_ratio: float = 0.4
+    stream_chunk_size: int = 8
+    # 模拟批量接口：abatch 把一组请求作为一次调用，只付一次往返延迟（见 LLMBatcher）
+    supports_batch: bool = True
+    # 批量调用里每多一条请求增加的延迟
+    batch_item_latency: float = 0.01
+
+    @property
+    def _llm_type(self) -> str:
+        return "mock"
+
+    def _rng(self, text: str) -> random.Random:
+        # 每条提示词单独取一个随机数生成器，而不是共用一个流，回复才与调用顺序无关
+        return prompt_rng(self.seed if self.seed is not None else get_rng().derive("mock_llm"), text)
+
+    def _latency(self, rng: random.Random) -> float:
+        return sample_latency(rng, self.latency_dist, self.latency, self.latency_jitter)
+
+    def _generate(self, messages: List[BaseMessage], stop=None, run_manager=None, **kwargs) -> ChatResult:
+        text = _joined(messages)
+        rng = self._rng(text)
+        time.sleep(self._latency(rng))
+        return self._respond(text, rng)
+
+    async def _agenerate(self, messages: List[BaseMessage], stop=None, run_manager=None, **kwargs) -> ChatResult:
+        text = _joined(messages)
+        rng = self._rng(text)
+        await asyncio.sleep(self._latency(rng))
+        return self._respond(text, rng)
+
+    async def _astream(
+        self, messages: List[BaseMessage], stop=None, run_manager=None, **kwargs
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        text = _joined(messages)
+        rng = self._rng(text)
+        latency = self._latency(rng)
+        await asyncio.sleep(latency * self.first_token_ratio)
+        maybe_fail(rng, self.error_rate)
+        content = self.reply(text, rng)
+        pieces = [content[i: i + self.stream_chunk_size] for i in range(0, len(content), self.stream_chunk_size)]
+        step = latency * (1 - self.first_token_ratio) / max(len(pieces), 1)
+        for i, piece in enumerate(pieces):
+            if i:
+                await asyncio.sleep(step)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=piece))
+        yield ChatGenerationChunk(message=AIMessageChunk(content="", usage_metadata=self._usage(text, content)))
+
+    async def abatch(self, inputs: List[Any], config=None, *, return_exceptions: bool = False, **kwargs) -> List[Any]:
+        """一次调用处理整组请求：延迟取组内最大值加上每条的少量开销，而不是逐条往返"""
+        texts = [_joined(self._convert_input(msgs).to_messages()) for msgs in inputs]
+        rngs = [self._rng(text) for text in texts]
+        latency = max((self._latency(rng) for rng in rngs), default=0.0)
+        await asyncio.sleep(latency + self.batch_item_latency * len(texts))
+        results: List[Any] = []
+        for text, rng in zip(texts, rngs):
+            try:
+                results.append(self._respond(text, rng).generations[0].message)
+            except MockLLMError as e:
+                if not return_exceptions:
+                    raise
+                results.append(e)
+        return results
+
+    def _respond(self, text: str, rng: random.Random) -> ChatResult:
+        maybe_fail(rng, self.error_rate)
+        content = self.reply(text, rng)
+        msg = AIMessage(content=content, usage_metadata=self._usage(text, content))
+        return ChatResult(generations=[ChatGeneration(message=msg)])
+
+    def _usage(self, text: str, content: str) -> Dict[str, int]:
+        input_tokens = int(estimate_tokens(text) * self.token_scale)
+        output_tokens = int(estimate_tokens(content) * self.token_scale)
+        return {
+            "input_tokens": input_tokens,
+            "output_tokens": output_tokens,
+            "total_tokens": input_tokens + output_tokens,
+        }
+
+    def reply(self, text: str, rng: random.Random) -> str:
+        if "请只输出你的计划" in text:
+            return self._plan(text)
+        if "反思和总结" in text:
+            return self._summary(text)
+        # 经过 ActionList 校验再输出，保证替身的回复与真实模型一样走解析的 fast 阶段
+        actions = to_action_dicts(ACTION_LIST_ADAPTER.validate_python(self._actions(text, rng)))
+        return json.dumps(actions, ensure_ascii=False)
+
+    # --- 回复内容 ---
+    def _plan(self, text: str) -> str:
+        state = _parse_state(text)
+        low = [k for k, v in state["attrs"].items() if v < 50]
+        steps = ["我接下来应该先检查自己的生存属性。"]
+        if "thirst" in low:
+            steps.append("去集市买瓶装水并喝掉。")
+        if "hunger" in low:
+            steps.append("去集市买面包充饥。")
+        if "fatigue" in low:
+            steps.append("回家睡一觉恢复体力。")
+        steps.append("在集市观察价格，低买高卖赚取差价。")
+        return "\n".join(steps)
+
+    def _summary(self, text: str) -> str:
+        state = _parse_state(text)
+        return f"我目前在{state['location'] or '未知地点'}，资金约{state['money']:.0f}。按计划补充了生存物资，下一步继续关注价格变化。"
+
+    def _actions(self, text: str, rng: random.Random) -> List[Dict[str, Any]]:
+        state = _parse_state(text)
+        attrs = state["attrs"]
+        backpack = state["backpack"]
+        market = state["market"]
+        at_market = state["location"] == "集市"
+        for attr in ("thirst", "hunger"):
+            if attrs.get(attr, 100) >= 40:
+                continue
+            for item in _SUPPLIES[attr]:
+                if backpack.get(item, 0) > 0:
+                    return [{"type": "consume", "item": item, "qty": 1}]
+            for item in _SUPPLIES[attr]:
+                if item in market and market[item][0] > 0 and market[item][1] <= state["money"]:
+                    return [{"type": "trade", "mode": "buy", "item": item, "qty": 1}]
+            if not at_market:
+                return [{"type": "move", "target": "集市"}]
+        if attrs.get("fatigue", 100) < 30:
+            if state["location"] in ("家",) or state["location"].endswith("的家"):
+                return [{"type": "sleep", "minutes": 60}]
+            return [{"type": "move", "target": "家"}]
+        if not at_market:
+            return [{"type": "move", "target": "集市"}]
+        affordable = sorted(name for name, (qty, price) in market.items() if qty > 0 and price <= state["money"] * 0.2)
+        roll = rng.random()
+        if affordable and roll < 0.5:
+            return [{"type": "trade", "mode": "buy", "item": rng.choice(affordable), "qty": 1}]
+        sellable = sorted(name for name, qty in backpack.items() if qty > 0 and name in market)
+        if sellable and roll < 0.8:
+            return [{"type": "trade", "mode": "sell", "item": rng.choice(sellable), "qty": 1}]
+        return [{"type": "wait", "seconds": 5}, {"type": "finish"}]
+
+
+def _joined(messages: List[BaseMessage]) -> str:
+    return "\n".join(m.content if isinstance(m.content, str) else json.dumps(m.content, ensure_ascii=False) for m in messages)
+
+
+def _parse_state(text: str) -> Dict[str, Any]:
+    attrs = {}
+    for name, pattern in _ATTR_RE.items():
+        m = pattern.search(text)
+        if m:
+            attrs[name] = float(m.group(1))
+    loc = _LOCATION_RE.search(text)
+    money = _MONEY_RE.search(text)
+    backpack: Dict[str, int] = {}
+    bp = _BACKPACK_RE.search(text)
+    if bp:
+        for part in bp.group(1).split(","):
+            name, _, qty = part.strip().partition("*")
+            if name and qty.isdigit():
+                backpack[name] = int(qty)
+    market = {m.group(1): (int(m.group(2)), float(m.group(3))) for m in _MARKET_RE.finditer(text)}
+    return {
+        "attrs": attrs,
+        "location": loc.group(1) if loc else "",
+        "money": float(money.group(1)) if money else 0.0,
+        "backpack": backpack,
+        "market": market,
+    }
@@ -45,7 +45,7 @@ class Trade(BaseModel):
     qty: Optional[int]
     with_: str | None = None
     get_item: str | None = None
-    get_qty: Optional[int]
+    get_qty: Optional[int] = None
 
 
 class Store(BaseModel):
@@ -0,0 +1,96 @@
+"""
+运行时状态类型（`__slots__` 数据类，不做校验）。
+
+字段与 `schema.py` 一一对应。pydantic 模型只在信任边界上校验数据（加载 `product_list.json`、
+解析 LLM 输出、外部接口）；校验通过后转换成这里的类型，动作处理中直接修改，
+每次赋值不再重复校验。
+"""
+
+from __future__ import annotations
+
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict
+
+from . import schema
+
+
+@dataclass(slots=True)
+class Attribute:
+    """人物属性，随时间下降"""
+
+    name: str
+    current: float
+    decay_per_hour: float
+    max_value: float = 100.0
+
+    @classmethod
+    def from_model(cls, model: schema.Attribute) -> Attribute:
+        return cls(model.name, model.current, model.decay_per_hour, model.max_value)
+
+    def to_model(self) -> schema.Attribute:
+        return schema.Attribute.model_validate(asdict(self))
+
+    def model_copy(self) -> Attribute:
+        """与 pydantic 的同名方法兼容"""
+        return Attribute(self.name, self.current, self.decay_per_hour, self.max_value)
+
+
+@dataclass(slots=True)
+class Item:
+    """道具信息"""
+
+    name: str
+    quantity: int
+    description: str = ""
+    function: Dict[str, Any] = field(default_factory=dict)
+
+    @classmethod
+    def from_model(cls, model: schema.Item) -> Item:
+        return cls(model.name, model.quantity, model.description, dict(model.function))
+
+    def to_model(self) -> schema.Item:
+        return schema.Item.model_validate(asdict(self))
+
+
+@dataclass(slots=True)
+class Container:
+    name: str
+    items: Dict[str, Item] = field(default_factory=dict)
+    description: str = ""
+
+    @classmethod
+    def from_model(cls, model: schema.Container) -> Container:
+        items = {k: Item.from_model(v) for k, v in model.items.items()}
+        return cls(model.name, items, model.description)
+
+    def to_model(self) -> schema.Container:
+        return schema.Container.model_validate(asdict(self))
+
+
+@dataclass(slots=True)
+class Location:
+    name: str
+    description: str
+    inner_things: Dict[str, Any] = field(default_factory=dict)  # 内部设施
+
+    @classmethod
+    def from_model(cls, model: schema.Location) -> Location:
+        return cls(model.name, model.description, dict(model.inner_things))
+
+
+@dataclass(slots=True)
+class Market:
+    description: str
+    items: Dict[str, Dict[str, Any]] = field(default_factory=dict)
+
+    @classmethod
+    def from_model(cls, model: schema.Market) -> Market:
+        return cls(model.description, model.items)
+
+    @classmethod
+    def load(cls, data: Dict[str, Any]) -> Market:
+        """校验商品表（product_list.json 的 market 部分）后转换为运行时对象"""
+        return cls.from_model(schema.Market.model_validate(data))
+
+    def to_model(self) -> schema.Market:
+        return schema.Market.model_validate(asdict(self))
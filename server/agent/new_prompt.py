@@ -1,46 +1,151 @@
-﻿import json,os
-from datetime import datetime
+﻿import json
+from common.prompt_stats import PrefixStats, estimate_tokens
+
+from . import log_sink
 from .world import World
-from typing import Any
-from .models.schema import Container, Item, Location, Market
+from typing import Any, Callable, Dict, Tuple
+from .agent_config import PROMPT_PREFIX_STABLE, PROMPT_SECTION_CACHE
+from .item_registry import CompactInventory
+from .models.state import Location, Market
+
+
+BASE_TITLE = """## 背景与基本信息
+        """
+GAME_BACKGROUND = """
+        你受邀参加了一个贸易游戏，你被带到一个封闭的小镇，小镇中只有一个集市和几个玩家的住所。游戏目标：在不死亡的前提下尽快赚到 ￥10,000。
+        """
+RULES = (
+    "## 重要规则\n"
+    "- 只能使用本提示中的信息、记忆和地点描述，不要猜测或编造任何物品/地点/NPC/规则。\n"
+    "- 技能描述不代表已拥有物品；只有“背包物品”“地点设施/商店列表”里出现的物品才可直接使用。\n"
+    "- 市场价格/库存是实时信息，仅以本次提示为准。\n"
+    "- 信息不足或不确定时，优先选择移动到相关地点\n"
+)
+PLAN_TASK = (
+    "## 计划制定(你现在的任务)\n"
+    "请根据已知信息制定接下来几个小时内的计划，确保计划可执行。只说短期内能实现的事，不用给出类似“我要赚够￥10000”此类宏大的叙\n"
+    "- 先保证生存（饥饿/口渴/疲劳），再考虑赚钱。\n"
+    "- 不要假设未知信息；若关键信息缺失，计划中写“先去××查看”。\n"
+    "- 输出 3-6 条计划，不用刻意分点，第一条以“我接下来应该……”开头。\n"
+)
+ACT_TASK = (
+    "## 动作规划(你现在的任务)\n"
+    "请根据计划和记忆判断哪些事情已经完成，接下来要做什么。\n"
+    "输出最近 1-3 步动作；如计划已完成或无安全动作，输出 {\"type\":\"finish\"} 或等待。\n"
+)
+SUMMARY_TASK = (
+    "## 总结反思(你现在的任务)\n"
+    "你之前的计划是否已经实现？请仅根据记忆总结你至今为止做的事情，"
+    "并反思这段时间的收获和问题（如“通过差价成功盈利”“没有注意饱食度差点饿死”等）。"
+    "不要新增未发生的事件，回答尽量精简。\n"
+)
+STATE_TITLE = "## 当前状态\n"
+TASK_PROMPTS = {"plan": PLAN_TASK, "act": ACT_TASK, "summary": SUMMARY_TASK}
+
+
+class SectionCache:
+    """
+    提示词段落缓存：每个段落记下渲染时依赖状态的版本号（key），
+    key 未变时直接复用上次的文本，只有脏段落才重新渲染
+    """
+
+    def __init__(self, enabled: bool = True) -> None:
+        self.enabled = enabled
+        self._sections: Dict[str, Tuple[Any, str]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, name: str, key: Any, render: Callable[[], str]) -> str:
+        if self.enabled:
+            cached = self._sections.get(name)
+            if cached is not None and cached[0] == key:
+                self.hits += 1
+                return cached[1]
+        self.misses += 1
+        text = render()
+        if self.enabled:
+            self._sections[name] = (key, text)
+        return text
+
+    def snapshot(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+        }
+
+    def copy(self) -> "SectionCache":
+        """沿用已渲染的段落，之后各自写入、各自计数"""
+        other = SectionCache(self.enabled)
+        other._sections = dict(self._sections)
+        return other
 
 
 class PromptModule:
-    def __init__(self) -> None:
+    def __init__(self, prefix_stable: bool = PROMPT_PREFIX_STABLE, section_cache: bool = PROMPT_SECTION_CACHE) -> None:
         self.summary = "今天是第一天，没有总结。\n"
         self.plan = "暂无计划。\n"
         # 如果错误日志不为空，说明上一步动作运行失败，需要把错误日志传入提示词
         self.error_log = ""
-        
+        # 前缀稳定模式：静态内容进系统消息，用户消息按 半静态 → 易变 排序
+        self.prefix_stable = prefix_stable
+        self.prefix_stats = PrefixStats()
+        self.sections = SectionCache(section_cache)
+
+    def fork(self) -> "PromptModule":
+        """推测执行用的独立副本：计划、总结与已渲染段落照搬，之后的修改与统计不影响原模块"""
+        other = PromptModule(self.prefix_stable, self.sections.enabled)
+        other.summary = self.summary
+        other.plan = self.plan
+        other.error_log = self.error_log
+        other.sections = self.sections.copy()
+        return other
 
 
     def _get_base_prompt(self,player,world) -> str:
         # 永驻提示词模块
-        title = """## 背景与基本信息
-        """
-        game_background = """
-        你受邀参加了一个贸易游戏，你被带到一个封闭的小镇，小镇中只有一个集市和几个玩家的住所。游戏目标：在不死亡的前提下尽快赚到 ￥10,000。
-        """
-        rules = (
-            "## 重要规则\n"
-            "- 只能使用本提示中的信息、记忆和地点描述，不要猜测或编造任何物品/地点/NPC/规则。\n"
-            "- 技能描述不代表已拥有物品；只有“背包物品”“地点设施/商店列表”里出现的物品才可直接使用。\n"
-            "- 市场价格/库存是实时信息，仅以本次提示为准。\n"
-            "- 信息不足或不确定时，优先选择移动到相关地点\n"
-            
+        base = self.sections.get(
+            "base",
+            (player.identity, player.info, player.skill),
+            lambda: BASE_TITLE+GAME_BACKGROUND+RULES+f"你的身份是：{player.identity},{player.info} 你的技能是：{player.skill}",
+        )
+        return base+f"目前，你身上有 ￥{player.money}。\n"+self._get_state_prompt(player,world,with_money=False)
+
+    def _get_static_prompt(self,player) -> str:
+        # 前缀稳定模式：只包含不随游戏进程变化的内容，所有玩家共享背景与规则前缀
+        return self.sections.get(
+            "static",
+            (player.identity, player.info, player.skill),
+            lambda: BASE_TITLE+GAME_BACKGROUND+RULES+f"你的身份是：{player.identity},{player.info} 你的技能是：{player.skill}\n",
         )
-        player_identity = f"你的身份是：{player.identity},{player.info} 你的技能是：{player.skill}目前，你身上有 ￥{player.money}。\n"
+
+    def _get_state_prompt(self,player,world,with_money:bool=True) -> str:
+        # 易变的状态信息：资金、位置、时间、属性、背包
+        money = f"目前，你身上有 ￥{player.money}。\n" if with_money else ""
         location =  f"你现在所在的位置是：{player.cur_location}。\n"
         time = f"当前的时间是：{world.get_format_time()}。\n"
         attr = f"你的生存属性有：饥饿值 {round(player.attribute['hunger'].current,2)}，疲劳值 {round(player.attribute['fatigue'].current,2)}，口渴值 {round(player.attribute['thirst'].current,2)}。属性值越低，你的生存状态越差，请注意补充。\n"
-        if len(player.inventory.items) == 0:
+        backpack = player.inventory.to_dict()
+        if not backpack:
             backpack_zipped = "背包物品：你的背包里现在没有物品。\n"
         else:
-            backpack_zipped = "你的背包里有："+",".join([f"{item.name}*{item.quantity}" for item in player.inventory.items.values()])+"\n"
-        return title+game_background+rules+player_identity+location+time+attr+backpack_zipped
+            backpack_zipped = "你的背包里有："+",".join([f"{name}*{qty}" for name, qty in backpack.items()])+"\n"
+        return money+location+time+attr+backpack_zipped
+
+    def get_system_prompt(self,kind:str,player) -> str:
+        """前缀稳定模式下的系统消息：静态前缀 + 本类任务说明"""
+        return self._get_static_prompt(player) + TASK_PROMPTS[kind]
 
 
     def _format_locations_info(self, player, world) -> str:
+        return self.sections.get(
+            "locations",
+            world.version(f"accessible:{player.id}"),
+            lambda: self._render_locations_info(player, world),
+        )
+
+    def _render_locations_info(self, player, world) -> str:
         merged_locations = {}
         if isinstance(world.locations, dict):
             merged_locations.update(world.locations)
@@ -64,6 +169,15 @@ class PromptModule:
 
 
     def _build_action_guide(self, player, world) -> str:
+        # 可移动地点取决于 accessible，可用容器取决于是否在家与家中设施
+        key = (
+            world.version(f"accessible:{player.id}"),
+            player.cur_location in ("家", player.home),
+            world.version(f"home:{player.id}"),
+        )
+        return self.sections.get("action_guide", key, lambda: self._render_action_guide(player, world))
+
+    def _render_action_guide(self, player, world) -> str:
         move_targets = []
         for location, accessible in player.accessible.items():
             if accessible != -1:
@@ -78,7 +192,7 @@ class PromptModule:
             home = world.players_home.get(player.id)
             if home:
                 for name, facility in home.inner_things.items():
-                    if isinstance(facility, Container):
+                    if isinstance(facility, CompactInventory):
                         containers.append(name)
         containers_text = "、".join(containers) if containers else ""
 
@@ -122,7 +236,6 @@ class PromptModule:
 
     def get_top_level_plan(self,player,world) -> str:
         # 计划制定模块
-        base_prompt = self._get_base_prompt(player,world)
         last_summary = "## 上一次的总结\n"+self.summary
         locations_info_zipped = "## 地点信息\n" + self._format_locations_info(player, world)
         home = world.players_home.get(player.id)
@@ -132,17 +245,11 @@ class PromptModule:
                 locations_info_zipped += f"你当前家中设施:\n{formatted_facilities}"
             else:
                 locations_info_zipped += f"你家设施(已知):\n{formatted_facilities}"
-        
-        
-  
-        title = "## 计划制定(你现在的任务)\n"
-        top_level_plan_module = (
-            "请根据已知信息制定接下来几个小时内的计划，确保计划可执行。只说短期内能实现的事，不用给出类似“我要赚够￥10000”此类宏大的叙\n"
-            "- 先保证生存（饥饿/口渴/疲劳），再考虑赚钱。\n"
-            "- 不要假设未知信息；若关键信息缺失，计划中写“先去××查看”。\n"
-            "- 输出 3-6 条计划，不用刻意分点，第一条以“我接下来应该……”开头。\n"
-        )
-        prompt = base_prompt + last_summary + locations_info_zipped + title + top_level_plan_module
+
+        if self.prefix_stable:
+            prompt = locations_info_zipped + last_summary + STATE_TITLE + self._get_state_prompt(player,world)
+        else:
+            prompt = self._get_base_prompt(player,world) + last_summary + locations_info_zipped + PLAN_TASK
         self.write_prompt_log("plan",prompt,player) 
         return prompt
         
@@ -151,17 +258,8 @@ class PromptModule:
 
     def get_local_action(self,player,world) -> str:
         # 局域动作模块
-        base_prompt = self._get_base_prompt(player,world)
-        title = "## 动作规划(你现在的任务)\n"
-        local_action_prompt = (
-            "请根据计划和记忆判断哪些事情已经完成，接下来要做什么。\n"
-            "输出最近 1-3 步动作；如计划已完成或无安全动作，输出 {\"type\":\"finish\"} 或等待。\n"
-        )
         memory_title = "## 你的记忆\n"
-        if len(player.memory) == 0:
-            memory = "你刚来到这里，对周围还不熟悉。\n"
-        else:
-            memory = "近10条动作记录:\n"+"\n".join(player.memory[-10:])+"\n"
+        memory = self.sections.get("memory_act", self._memory_version(player), lambda: self._render_memory(player, 10, suffix="\n"))
         plan_title = "## 当前计划\n"
 
         location = player.cur_location
@@ -179,7 +277,10 @@ class PromptModule:
 
 
         action_guide = self._build_action_guide(player, world)
-        prompt = base_prompt + location_info + memory_title + memory + plan_title + self.plan + title + local_action_prompt + action_guide + self.error_log
+        if self.prefix_stable:
+            prompt = action_guide + plan_title + self.plan + location_info + memory_title + memory + STATE_TITLE + self._get_state_prompt(player,world) + self.error_log
+        else:
+            prompt = self._get_base_prompt(player,world) + location_info + memory_title + memory + plan_title + self.plan + ACT_TASK + action_guide + self.error_log
         self.write_prompt_log("act",prompt,player)
         return prompt    
             
@@ -187,24 +288,31 @@ class PromptModule:
 
     def get_reflection_and_summary(self,player,world) -> str:
         # 反思总结模块
-        reflection_and_summary_module = (
-            "你之前的计划是否已经实现？请仅根据记忆总结你至今为止做的事情，"
-            "并反思这段时间的收获和问题（如“通过差价成功盈利”“没有注意饱食度差点饿死”等）。"
-            "不要新增未发生的事件，回答尽量精简。\n"
-        )
-        base_prompt = self._get_base_prompt(player,world)
-        title = "## 总结反思(你现在的任务)\n"
         plan_title = "## 最近的计划\n"
         memory_title = "## 你的记忆\n"
-        if len(player.memory) == 0:
-            memory = "你刚来到这里，对周围还不熟悉。\n"
+        memory = self.sections.get("memory_summary", self._memory_version(player), lambda: self._render_memory(player, 20, with_digest=True))
+        if self.prefix_stable:
+            prompt = plan_title + self.plan + memory_title + memory + "\n" + STATE_TITLE + self._get_state_prompt(player,world)
         else:
-            memory = "近20条动作记录:\n"+"\n".join(player.memory[-20:])
-        prompt = base_prompt + memory_title + memory + plan_title + self.plan + title + reflection_and_summary_module
+            prompt = self._get_base_prompt(player,world) + memory_title + memory + plan_title + self.plan + SUMMARY_TASK
         self.write_prompt_log("summary",prompt,player)
         return prompt
 
 
+    def _memory_version(self,player) -> int:
+        # MemoryStore.total 只增不减，可直接作为记忆的版本号
+        return getattr(player.memory, "total", len(player.memory))
+
+    def _render_memory(self,player,n:int,suffix:str="",with_digest:bool=False) -> str:
+        if len(player.memory) == 0:
+            return "你刚来到这里，对周围还不熟悉。\n"
+        memory = f"近{n}条动作记录:\n"+"\n".join(player.memory[-n:])+suffix
+        digest = player.memory.digest_text() if with_digest else ""
+        if digest:
+            memory += "\n更早的记录摘要:\n" + digest
+        return memory
+
+
     def chat_with_npc(self,player,anther_player) -> str:
         # 聊天模块
         title = "## 聊天记录\n"
@@ -212,13 +320,16 @@ class PromptModule:
         
         
     def format_market_item_list(self,world) -> str:
+        return self.sections.get("market", world.version("market"), lambda: self._render_market_item_list(world))
+
+    def _render_market_item_list(self,world) -> str:
         # 根据分类提取更加适合模型阅读的商品列表
         title = "### 商品列表\n"
         items = world.locations["集市"].items
         formated_items = ""
 
         for name,item in items.items():
-            quantity = item['quantity']
+            quantity = world.market_stock.quantity(name)
             if quantity == 0:
                 continue
             price = item['cur_price']
@@ -248,6 +359,9 @@ class PromptModule:
         return prompt
     
     def format_facilities(self,player,world) -> str:
+        return self.sections.get("facilities", world.version(f"home:{player.id}"), lambda: self._render_facilities(player,world))
+
+    def _render_facilities(self,player,world) -> str:
         # 格式化设施列表
         title = "### 室内设施列表\n"
         facilities = world.players_home[player.id].inner_things
@@ -255,15 +369,13 @@ class PromptModule:
         for name,facility in facilities.items():
             description = facility.description
             formated_facilities += f"{name},描述:{description}\n"
-            if isinstance(facility,Container):
-                if len(facility.items) == 0:
+            if isinstance(facility,CompactInventory):
+                if len(facility) == 0:
                     formated_facilities += f"{name}内物品：{name}内现在没有物品。\n"
                 else:
-                    formated_facilities += f"{name}内物品:{','.join([f'{item.name}*{item.quantity}' for item in facility.items.values()])}\n"
+                    formated_facilities += f"{name}内物品:{','.join([f'{item}*{qty}' for item, qty in facility.to_dict().items()])}\n"
         prompt = title + formated_facilities
         return prompt
     def write_prompt_log(self,prompt_type:str,prompt:str,player):
-        if os.path.exists("debug_log/prompt") == False:
-            os.makedirs("debug_log/prompt")
-        with open(f"debug_log/prompt/{prompt_type}_{player.id}_{datetime.now().strftime('%Y%m%d%H%M%S')}.txt","w",encoding="utf-8") as f:
-            f.write(json.dumps(prompt,ensure_ascii=False,indent=4))
+        # 交给后台日志线程，不在决策路径上写文件
+        log_sink.emit("prompt",kind=prompt_type,player=player.id,text=prompt)
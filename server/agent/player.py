@@ -1,9 +1,11 @@
 from __future__ import annotations
-from typing import List,Dict,Any
-from .models.schema import Attribute, Container
+from typing import List,Dict,Any,Mapping
+from .models.state import Attribute, Container
+from .item_registry import CompactInventory
 from .agent_config import DECAY_PER_HOUR
 from .utils import to_attr
 from .agent import Agent
+from .memory import MemoryStore
 from dataclasses import dataclass, field
 from typing import Dict, List, Any
 
@@ -20,15 +22,18 @@ class Player:
     money: float = 1000.0
     cur_location: str = "家"
     # 去掉三个属性，合并为attribute属性
-    attribute: Dict[str, Attribute] = field(default_factory=dict)
+    # 创建 World 后换成 AttributeTable 中本玩家一行的视图（AttributeRow），用法不变
+    attribute: Mapping[str, Attribute] = field(default_factory=dict)
 
-    inventory: Container = field(default_factory=lambda: Container(name="背包"))
+    # 创建 World 后换成按物品 ID 计数的 CompactInventory
+    inventory: Container | CompactInventory = field(default_factory=lambda: Container(name="背包"))
     home: str = "家"
     # 0=已知地区, 1=可访问, -1=不可访问
     accessible: Dict[str, int] = field(
         default_factory=dict
     )
-    memory: List[str] = field(default_factory=list)
+    # 有界记忆，用法与原来的 List[str] 兼容
+    memory: MemoryStore = field(default_factory=MemoryStore)
 
     @classmethod
     def from_raw(
@@ -58,4 +63,5 @@ class Player:
             home=f"玩家{id}的家",
             accessible=accessible_dict,
             attribute={"hunger":hunger,"thirst":thirst,"fatigue":fatigue},
+            memory=MemoryStore(f"agent-{id}"),
         )
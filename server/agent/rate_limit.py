@@ -0,0 +1,218 @@
+"""
+所有 Agent 共用的 LLM 限流器。
+
+- RPM / TPM 两个令牌桶：请求前按 1 个请求 + 预估 token 数扣减，返回后按实际用量校正；
+- AIMD 自适应并发：成功且延迟不超过目标时并发上限加性增长，
+  遇到 429 或延迟明显超标时乘性下降（冷却期内只降一次，避免一次突发把上限打到底）；
+- 429 时按指数退避 + 全抖动重试，各 Agent 的重试时间错开，不会一起再撞限流。
+`snapshot()` 给出当前上限、在途数、排队数与各项计数。
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Optional, TypeVar
+
+from .agent_config import (
+    LLM_BACKOFF_BASE,
+    LLM_BACKOFF_MAX,
+    LLM_CONCURRENCY_INIT,
+    LLM_CONCURRENCY_MAX,
+    LLM_CONCURRENCY_MIN,
+    LLM_MAX_RETRIES,
+    LLM_RPM,
+    LLM_TARGET_LATENCY,
+    LLM_TPM,
+)
+from .rng import stream as rng_stream
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# 两次乘性下降之间的最短间隔（秒）
+DECREASE_COOLDOWN = 2.0
+
+
+def is_rate_limited(exc: BaseException) -> bool:
+    return getattr(exc, "status_code", None) == 429 or type(exc).__name__ == "RateLimitError"
+
+
+class TokenBucket:
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, n: float) -> float:
+        """还需要等多久才够扣 n；单次请求超过桶容量时按容量算，避免永远等不到"""
+        self._refill()
+        n = min(n, self.capacity)
+        if self.tokens >= n:
+            return 0.0
+        return (n - self.tokens) / self.rate
+
+    def take(self, n: float) -> None:
+        self._refill()
+        self.tokens -= n
+
+    def refund(self, n: float) -> None:
+        """按实际用量校正预估（n 为负表示补扣）"""
+        self._refill()
+        self.tokens = min(self.capacity, self.tokens + n)
+
+
+class AdaptiveLimiter:
+    def __init__(
+        self,
+        rpm: float = LLM_RPM,
+        tpm: float = LLM_TPM,
+        min_concurrency: int = LLM_CONCURRENCY_MIN,
+        max_concurrency: int = LLM_CONCURRENCY_MAX,
+        initial_concurrency: int = LLM_CONCURRENCY_INIT,
+        target_latency: float = LLM_TARGET_LATENCY,
+        max_retries: int = LLM_MAX_RETRIES,
+        backoff_base: float = LLM_BACKOFF_BASE,
+        backoff_max: float = LLM_BACKOFF_MAX,
+    ):
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self.min_concurrency = min_concurrency
+        self.max_concurrency = max_concurrency
+        self.limit = float(min(max(initial_concurrency, min_concurrency), max_concurrency))
+        self.target_latency = target_latency
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        # 退避抖动
+        self._rng = rng_stream("limiter")
+        self._cond = asyncio.Condition()
+        self._bucket_lock = asyncio.Lock()
+        self._last_decrease = 0.0
+        self.inflight = 0
+        self.waiting = 0
+        self.calls = 0
+        self.throttled = 0
+        self.retries = 0
+        self.increases = 0
+        self.decreases = 0
+        self.latency_total = 0.0
+
+    async def run(
+        self,
+        fn: Callable[[], Awaitable[T]],
+        est_tokens: int = 0,
+        on_retry: Optional[Callable[[BaseException], None]] = None,
+    ) -> T:
+        """在限流下执行 fn；遇到 429 退避后重试，超过 max_retries 时抛出最后一次的异常"""
+        attempt = 0
+        while True:
+            try:
+                async with self.slot(est_tokens):
+                    return await fn()
+            except Exception as e:
+                if not is_rate_limited(e) or attempt >= self.max_retries:
+                    raise
+                attempt += 1
+                self.retries += 1
+                if on_retry is not None:
+                    on_retry(e)
+                delay = self.backoff(attempt)
+                logger.warning("LLM rate limited, retry %s in %.2fs", attempt, delay)
+                await asyncio.sleep(delay)
+
+    @asynccontextmanager
+    async def slot(self, est_tokens: int = 0) -> AsyncIterator[None]:
+        """占用一个并发名额并扣减令牌桶；流式请求直接用它包住整个流"""
+        await self._acquire(est_tokens)
+        start = time.monotonic()
+        try:
+            yield
+        except Exception as e:
+            if is_rate_limited(e):
+                self.throttled += 1
+                self._decrease()
+            raise
+        else:
+            latency = time.monotonic() - start
+            self.latency_total += latency
+            if latency > self.target_latency * 2:
+                self._decrease()
+            elif latency <= self.target_latency:
+                self._increase()
+        finally:
+            await self._release()
+
+    def settle(self, est_tokens: int, actual_tokens: int) -> None:
+        """请求结束后按实际 token 用量校正 TPM 桶"""
+        if actual_tokens > 0:
+            self.tokens.refund(est_tokens - actual_tokens)
+
+    def backoff(self, attempt: int) -> float:
+        return self._rng.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    async def _acquire(self, est_tokens: int) -> None:
+        self.waiting += 1
+        holding = False
+        try:
+            async with self._cond:
+                await self._cond.wait_for(lambda: self.inflight < int(self.limit))
+                self.inflight += 1
+                holding = True
+            # 令牌桶按到达顺序排队扣减
+            async with self._bucket_lock:
+                while True:
+                    delay = max(self.requests.wait_time(1), self.tokens.wait_time(est_tokens))
+                    if delay <= 0:
+                        break
+                    await asyncio.sleep(delay)
+                self.requests.take(1)
+                self.tokens.take(est_tokens)
+        except BaseException:
+            if holding:
+                await self._release()
+            raise
+        finally:
+            self.waiting -= 1
+        self.calls += 1
+
+    async def _release(self) -> None:
+        async with self._cond:
+            self.inflight -= 1
+            self._cond.notify_all()
+
+    def _increase(self) -> None:
+        if self.limit < self.max_concurrency:
+            self.limit = min(self.max_concurrency, self.limit + 1.0 / self.limit)
+            self.increases += 1
+
+    def _decrease(self) -> None:
+        now = time.monotonic()
+        if now - self._last_decrease < DECREASE_COOLDOWN:
+            return
+        self._last_decrease = now
+        self.limit = max(float(self.min_concurrency), self.limit / 2)
+        self.decreases += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "limit": round(self.limit, 2),
+            "inflight": self.inflight,
+            "queued": self.waiting,
+            "rpm_available": round(self.requests.tokens, 1),
+            "tpm_available": round(self.tokens.tokens, 1),
+            "calls": self.calls,
+            "throttled": self.throttled,
+            "retries": self.retries,
+            "increases": self.increases,
+            "decreases": self.decreases,
+            "avg_latency": round(self.latency_total / self.calls, 3) if self.calls else 0.0,
+        }
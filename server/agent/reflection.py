@@ -0,0 +1,19 @@
+"""
+后台反思，实现见 common/reflection.py（与 DesicionLayer 共用），这里按 agent_config 绑定队列长度。
+"""
+from __future__ import annotations
+
+from typing import Optional, TypeVar
+
+from common.reflection import ReflectionStats, ReflectionWorker as _ReflectionWorker
+
+from .agent_config import REFLECTION_QUEUE_SIZE
+
+__all__ = ["ReflectionStats", "ReflectionWorker"]
+
+T = TypeVar("T")
+
+
+class ReflectionWorker(_ReflectionWorker[T]):
+    def __init__(self, name: str = "", maxsize: int = REFLECTION_QUEUE_SIZE, stats: Optional[ReflectionStats] = None):
+        super().__init__(name, maxsize, stats)
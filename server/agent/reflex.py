@@ -0,0 +1,75 @@
+"""
+生存反射层：属性进入危险区间时不经过 LLM，直接在本地给出最便宜的合法动作。
+
+- 饥饿/口渴：背包里有对应补给就 consume（优先消耗均价最低的），
+  没有则在集市买单价/回复量最划算且买得起的一件；
+- 疲劳：睡觉（免费）。
+多个属性同时危险时先处理离阈值最远的那个；都无法处理时返回 None，交给 LLM。
+"""
+from __future__ import annotations
+
+import logging
+import time
+from typing import Any, Dict, Optional, Tuple
+
+from common.reflex_stats import ReflexStats
+
+from .agent_config import REFLEX_SLEEP_MINUTES, REFLEX_THRESHOLDS
+
+logger = logging.getLogger(__name__)
+
+
+class ReflexEngine:
+    def __init__(self, thresholds: Optional[Dict[str, float]] = None, sleep_minutes: float = REFLEX_SLEEP_MINUTES):
+        self.thresholds = dict(REFLEX_THRESHOLDS if thresholds is None else thresholds)
+        self.sleep_minutes = sleep_minutes
+        self.stats = ReflexStats()
+
+    def decide(self, player, world) -> Optional[Dict[str, Any]]:
+        """返回一个反射动作；没有属性处于危险区间或无法本地处理时返回 None"""
+        start = time.perf_counter()
+        critical = []
+        for attr, low in self.thresholds.items():
+            state = player.attribute.get(attr)
+            if state is not None and state.current < low:
+                critical.append((state.current - low, attr))
+        for _, attr in sorted(critical):
+            action = self._fatigue() if attr == "fatigue" else self._supply(attr, player, world)
+            if action is not None:
+                self.stats.record_reflex(attr, time.perf_counter() - start)
+                logger.info("Reflex %s for player %s: %s", attr, player.id, action)
+                return action
+        return None
+
+    def _fatigue(self) -> Dict[str, Any]:
+        return {"type": "sleep", "minutes": self.sleep_minutes}
+
+    def _supply(self, attr: str, player, world) -> Optional[Dict[str, Any]]:
+        best: Optional[Tuple[float, str]] = None
+        registry = world.item_registry
+        for item_id, _ in player.inventory.held():
+            meta = registry.meta[item_id]
+            if _effect(meta, attr) > 0:
+                cost = float(meta.get("avg_price", 0))
+                name = registry.names[item_id]
+                if best is None or (cost, name) < best:
+                    best = (cost, name)
+        if best is not None:
+            return {"type": "consume", "item": best[1], "qty": 1}
+
+        market = world.locations.get("集市")
+        for name, data in (getattr(market, "items", None) or {}).items():
+            gain = _effect(data, attr)
+            price = float(data.get("cur_price", 0))
+            if gain <= 0 or world.market_stock.quantity(name) <= 0 or price > player.money:
+                continue
+            if best is None or (price / gain, name) < best:
+                best = (price / gain, name)
+        if best is not None:
+            return {"type": "trade", "mode": "buy", "item": best[1], "qty": 1}
+        return None
+
+
+def _effect(item_data: Optional[Dict[str, Any]], attr: str) -> float:
+    effect = ((item_data or {}).get("consumable") or {}).get("effect") or {}
+    return float(effect.get(attr, 0))
@@ -0,0 +1,83 @@
+"""
+按子系统划分的随机数流。
+
+每个子系统（集市价格、掉落 / 钓鱼、LLM 替身、无头模式的动作耗时、限流退避、日志采样）
+从运行种子派生自己的种子，各用一个独立的 `random.Random`：
+某个子系统多抽或少抽几次，不会改变其它子系统的随机序列。
+同一 RUN_SEED（或 `--seed`）下两次运行的价格走势、模拟耗时等完全一致，
+不同构建之间的耗时对比只反映代码差异。
+
+RUN_SEED 为 None 时每次运行随机取一个种子，main 启动时打印出来，复现时用 `--seed` 传回。
+"""
+from __future__ import annotations
+
+import hashlib
+import random
+import threading
+from typing import Any, Dict, Optional
+
+from .agent_config import RUN_SEED
+
+# 已知的流名；stream() 也接受其它名字，这里只是约定
+STREAMS = ("market", "loot", "mock_llm", "dispatch", "limiter", "log_sink")
+
+
+def derive_seed(seed: int, name: str) -> int:
+    """由运行种子和流名派生 64 位子种子"""
+    digest = hashlib.sha256(f"{seed}:{name}".encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big")
+
+
+class RngService:
+    def __init__(self, seed: Optional[int] = RUN_SEED):
+        self.seed = seed if seed is not None else random.SystemRandom().randrange(2**63)
+        self._streams: Dict[str, random.Random] = {}
+        self._lock = threading.Lock()
+
+    def derive(self, name: str) -> int:
+        return derive_seed(self.seed, name)
+
+    def stream(self, name: str) -> random.Random:
+        """名为 name 的随机数流；同名多次调用返回同一个对象"""
+        rng = self._streams.get(name)
+        if rng is None:
+            with self._lock:
+                rng = self._streams.get(name)
+                if rng is None:
+                    rng = self._streams[name] = random.Random(self.derive(name))
+        return rng
+
+    def state(self) -> Dict[str, Any]:
+        """各流的内部状态（断点保存用）"""
+        return {"seed": self.seed, "streams": {name: rng.getstate() for name, rng in self._streams.items()}}
+
+    def load_state(self, state: Dict[str, Any]) -> None:
+        self.seed = state["seed"]
+        for name, saved in state["streams"].items():
+            self.stream(name).setstate(saved)
+
+
+_service: Optional[RngService] = None
+_service_lock = threading.Lock()
+
+
+def get_rng() -> RngService:
+    """进程内共享的实例，第一次使用时按 RUN_SEED 创建"""
+    global _service
+    if _service is None:
+        with _service_lock:
+            if _service is None:
+                _service = RngService()
+    return _service
+
+
+def configure(seed: Optional[int]) -> RngService:
+    """用指定种子重建共享实例；需在创建 World / Agent 之前调用"""
+    global _service
+    with _service_lock:
+        _service = RngService(seed)
+    return _service
+
+
+def stream(name: str) -> random.Random:
+    return get_rng().stream(name)
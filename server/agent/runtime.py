@@ -1,39 +1,93 @@
 from __future__ import annotations
 import asyncio
+from contextlib import aclosing
 from dataclasses import dataclass
 import logging
-from typing import Any, Dict, Awaitable, Callable, Optional, List
+import time
+from typing import Any, AsyncIterator, Deque, Dict, Awaitable, Callable, Optional, List
 
+from .agent_config import HEADLESS_DURATION_JITTER, HEADLESS_MODELED_DURATIONS, TIME_RATIO, WORLD_PLACE_MAP
+from .clock import RealTimeClock, travel_minutes
+from .reflection import ReflectionWorker
+from .reflex import ReflexEngine
+from .rng import stream as rng_stream
+from .speculation import Speculation, Speculator
 from .world import World
 logger = logging.getLogger(__name__)
 
 class ActionDispatcher:
-    async def action(self,agent_id:str,cmd:str,target:str,cur_location:str,timeout:float = 25.0) -> Dict[str,Any]:
+    async def action(self,agent_id:str,cmd:str="",target:str="",cur_location:str="",timeout:float = 25.0,value:float = 0,type:str = "command") -> Dict[str,Any]:
         raise NotImplementedError("This method should be overridden by subclasses.")
 
 class WsDispatcher(ActionDispatcher):
     def __init__(self,server_module):
         self.server = server_module
 
-    async def action(self,agent_id:str,cmd:str,target:str,cur_location:str,timeout:float = 25.0) -> Dict[str,Any]:
+    async def action(self,agent_id:str,cmd:str="",target:str="",cur_location:str="",timeout:float = 25.0,value:float = 0,type:str = "command") -> Dict[str,Any]:
     
         msg = await self.server.send_action(
             agent_id=agent_id,
             cmd=cmd,
             target=target,
             cur_location=cur_location,
+            value=value,
             timeout=timeout,
+            type=type,
         )
         ok = bool(msg) and (msg.get('status') == 'ok' or msg.get('OK') is True)
         if ok:
             return {"OK": True, "MSG": "ok", "type": "complete"}
         return {"OK": False, "MSG": "failed or timeout", "type": "complete"}
 
+class HeadlessDispatcher(ActionDispatcher):
+    """
+    无头调度器：不连 Unity，移动 / 睡觉 / 等待 / 动画在本地直接确认完成。
+    modeled_durations=True 且为实时时钟时，按建模耗时真实等待（移动按地点图、睡觉按 value、等待按秒数），
+    保持与有前端时相同的节奏；否则立即返回，配合 SimClock 以最快速度推进。
+    jitter 为等待时长的相对抖动，取自运行种子派生的 "dispatch" 流，同一种子下各次运行一致。
+    """
+    def __init__(self,world:World,modeled_durations:bool = HEADLESS_MODELED_DURATIONS,jitter:float = HEADLESS_DURATION_JITTER):
+        self.world = world
+        self.modeled_durations = modeled_durations
+        self.jitter = jitter
+        self.rng = rng_stream("dispatch")
+        # 导航点 -> 地点，例如 "收银台" -> "集市"
+        self._places = {inner: place for place, inner in WORLD_PLACE_MAP.items()}
+        self.counts:Dict[str,int] = {}
+        self.waited_s = 0.0
+
+    def _real_seconds(self,cmd:str,target:Any,cur_location:str,value:float) -> float:
+        if cmd == "go_to":
+            place = self._places.get(target, target)
+            return travel_minutes(cur_location, place) * 60 / TIME_RATIO
+        if cmd == "sleeping":
+            return float(value or 0)
+        if cmd == "waiting":
+            return float(target or 0)
+        return 0.0
+
+    async def action(self,agent_id:str,cmd:str="",target:str="",cur_location:str="",timeout:float = 25.0,value:float = 0,type:str = "command") -> Dict[str,Any]:
+        key = cmd or type
+        self.counts[key] = self.counts.get(key, 0) + 1
+        if self.modeled_durations and isinstance(self.world.clock, RealTimeClock):
+            delay = self._real_seconds(cmd, target, cur_location, value)
+            if self.jitter > 0 and delay > 0:
+                delay *= 1 + self.rng.uniform(-self.jitter, self.jitter)
+            delay = min(delay, timeout)
+            if delay > 0:
+                self.waited_s += delay
+                await asyncio.sleep(delay)
+        return {"OK": True, "MSG": "ok", "type": "complete"}
+
+    def stats(self) -> Dict[str,Any]:
+        return {"commands": dict(self.counts), "waited_s": round(self.waited_s, 1)}
+
 # ObserveFn = Callable[['AgentRuntimeCtx'], Awaitable[Dict[str, Any]]]
 PlanFn    = Callable[['AgentRuntimeCtx', str], Awaitable[str]]
 SummaryFn    = Callable[['AgentRuntimeCtx', str], Awaitable[str]]
 ActFn    = Callable[['AgentRuntimeCtx', str], Awaitable[List[Dict[str, Any]]]]
 LinkFn     = Callable[['AgentRuntimeCtx', Dict[str, Any]], Awaitable[Dict[str, Any]]]
+ActStreamFn = Callable[['AgentRuntimeCtx', str], AsyncIterator[Dict[str, Any]]]
 
 
 @dataclass
@@ -44,7 +98,7 @@ class AgentRuntimeCtx:
     world:World
     world_lock:asyncio.Lock
     dispatch:ActionDispatcher
-    actions_history:List[Dict[str,Any]] 
+    actions_history:Deque[Dict[str,Any]] 
   
 
     # observe_fn:ObserveFn
@@ -52,73 +106,153 @@ class AgentRuntimeCtx:
     act:ActFn
     summary:SummaryFn
     link:LinkFn
+    # 可选：流式产出动作，设置后 agent_loop 边生成边执行
+    act_stream:Optional[ActStreamFn] = None
+    # 可选：生存反射层，危险属性下跳过 LLM 直接给出动作
+    reflex:Optional[ReflexEngine] = None
+    # 可选：推测执行，动作播放期间提前生成下一批动作
+    speculator:Optional[Speculator] = None
+    # 可选：后台反思，summary 不再阻塞下一轮计划
+    reflector:Optional[ReflectionWorker] = None
+
+async def _iter_actions(actions:Optional[List[Dict[str,Any]]]) -> AsyncIterator[Dict[str,Any]]:
+    for action in actions or []:
+        yield action
+
+async def _stream_actions(ctx:AgentRuntimeCtx,plan:str) -> AsyncIterator[Dict[str,Any]]:
+    """生产者任务读取模型的流式输出放入队列，消费方按到达顺序逐个执行，执行与生成互相重叠"""
+    queue:asyncio.Queue = asyncio.Queue()
+    done = object()
+
+    async def produce():
+        try:
+            async for action in ctx.act_stream(ctx,plan):
+                queue.put_nowait(action)
+        except Exception as e:
+            queue.put_nowait(e)
+        finally:
+            queue.put_nowait(done)
+
+    producer = asyncio.create_task(produce(),name=f"act-stream-{ctx.agent_id}")
+    try:
+        while True:
+            item = await queue.get()
+            if item is done:
+                break
+            if isinstance(item,Exception):
+                raise item
+            yield item
+    finally:
+        if not producer.done():
+            producer.cancel()
+            await asyncio.gather(producer,return_exceptions=True)
 
-def apply_daily_decay(player: Any) -> bool:
-    for attr in getattr(player, "attribute", {}).values():
-        decay_per_hour = getattr(attr, "decay_per_hour", 0)
-        attr.current -= decay_per_hour * 24
-        if attr.current < 0:
-            return False
-    return True
-
+def _last_action(actions:Optional[List[Dict[str,Any]]]) -> Optional[Dict[str,Any]]:
+    """finish 之前的最后一个动作，推测执行从它开始"""
+    last = None
+    for action in actions or []:
+        if action.get("type") == "finish":
+            break
+        last = action
+    return last
+
 async def agent_loop(ctx:AgentRuntimeCtx,stop_event:asyncio.Event,tick_sleep:float=0.1):
     """Agent 主循环"""
     today = ctx.world.get_time().day
     summary = None
     plan = None
     max_step = 20
+    ctx.world.clock.join()
     try:
         while not stop_event.is_set():
+            if ctx.reflector is not None:
+                summary = ctx.reflector.latest
             try:
                 plan = await ctx.plan(ctx,summary)
             except Exception:
                 logger.exception("大模型计划出错: %s", ctx.agent_id)
             step = 0
-            while step < max_step:      
-                actions = await ctx.act(ctx,plan)
-                for action in actions or []:
-                    if action.get("type") == "finish":
-                        break
-                    try:
-                        res = await ctx.link(ctx,action)
-                    except Exception:
-                        logger.exception("action step failed for %s", ctx.agent_id)
-                        res = {"OK": False, "MSG": "action 执行异常"}
-                    if res.get("OK") != True:
-                        # 仅测试，出问题直接终止
-                        print("动作执行出错：",action)
-                        print("返回结果：",res)
-                        raise Exception("测试中断")
-                        
-                    
-                    ctx.actions_history.append(action)
-                    if not res.get("OK",False):
-                        if res.get("MSG","") == "玩家死亡，游戏结束":
-                            logger.info(f"Agent {ctx.agent_id} 死亡")
-                            stop_event.set()
-                        break
-                    await asyncio.sleep(1.5)  # 动作间隔
-                step += 1
+            spec:Optional[Speculation] = None
+            try:
+                while step < max_step:      
+                    reflex_action = ctx.reflex.decide(ctx.player,ctx.world) if ctx.reflex is not None else None
+                    speculated = None
+                    if spec is not None:
+                        if reflex_action is None and ctx.act_stream is None:
+                            speculated = await spec.resolve(ctx.player,ctx.world)
+                        else:
+                            await spec.cancel()
+                        spec = None
+                    batch = None
+                    if reflex_action is not None:
+                        batch = [reflex_action]
+                        actions = _iter_actions(batch)
+                    elif ctx.act_stream is not None:
+                        actions = _stream_actions(ctx,plan)
+                    else:
+                        started = time.perf_counter()
+                        batch = speculated if speculated is not None else await ctx.act(ctx,plan)
+                        actions = _iter_actions(batch)
+                        if ctx.reflex is not None:
+                            ctx.reflex.stats.record_llm(time.perf_counter() - started)
+                    last = _last_action(batch) if ctx.speculator is not None else None
+                    async with aclosing(actions):
+                        async for action in actions:
+                            if action.get("type") == "finish":
+                                break
+                            if action is last:
+                                spec = ctx.speculator.start(ctx,plan,action)
+                            try:
+                                res = await ctx.link(ctx,action)
+                            except Exception:
+                                logger.exception("action step failed for %s", ctx.agent_id)
+                                res = {"OK": False, "MSG": "action 执行异常"}
+                            if res.get("OK") != True:
+                                # 仅测试，出问题直接终止
+                                print("动作执行出错：",action)
+                                print("返回结果：",res)
+                                raise Exception("测试中断")
+                                
+                            
+                            ctx.actions_history.append(action)
+                            if not res.get("OK",False):
+                                if res.get("MSG","") == "玩家死亡，游戏结束":
+                                    logger.info(f"Agent {ctx.agent_id} 死亡")
+                                    stop_event.set()
+                                break
+                            await ctx.world.clock.idle(1.5)  # 动作间隔
+                    step += 1
+            finally:
+                if spec is not None:
+                    await spec.cancel()
             if step >= max_step:
                 logger.error(f"Agent {ctx.agent_id} 达到最大步骤数 {max_step}，结束本轮行动")
-            summary = await ctx.summary(ctx,plan)
+            if ctx.reflector is not None:
+                # 提交给后台反思，下一轮计划使用最近一次已完成的总结
+                ctx.reflector.submit(lambda plan=plan: ctx.summary(ctx,plan))
+            else:
+                summary = await ctx.summary(ctx,plan)
                 
-            # 如果时间到了第二天，刷新商店库存
+            # 如果时间到了第二天，做每日结算（所有玩家的属性衰减 + 刷新商店库存，每天只做一次）
             day = ctx.world.get_time().day
             if today!= day:
                 today = day
-                if not apply_daily_decay(ctx.player):
+                async with ctx.world_lock:
+                    ctx.world.settle_day(ctx.world.get_day())
+                if not ctx.world.is_alive(ctx.player):
                     logger.info(f"Agent {ctx.agent_id} 因每日结算死亡")
                     stop_event.set()
                     break
-                async with ctx.world_lock:
-                    ctx.world.update_market(ctx.world.locations['集市'])
-            await asyncio.sleep(tick_sleep)
+            await ctx.world.clock.idle(tick_sleep)
     except asyncio.CancelledError:
         logger.error(f"Agent {ctx.agent_id} 取消")
         raise
     except Exception as e:
         logger.exception(f"Agent {ctx.agent_id} 异常")
+    finally:
+        ctx.world.clock.leave()
+        if ctx.reflector is not None:
+            await ctx.reflector.stop()
 
 class AgentManager:
     def __init__(self):
@@ -0,0 +1,172 @@
+"""
+推测执行：当前动作在 Unity 中播放时，提前按预测的动作后状态生成下一批动作。
+
+- `predict_player` 在玩家的浅拷贝上模拟动作效果（移动、消耗、买卖、睡觉、等待），
+  并按动作处理器的同一份模板补记这一步的记忆；结果不可预测的动作（烹饪、存取、对话等）不做推测；
+- 推测请求使用 Agent 的副本（独立的 PromptModule），不改动真实的计划、段落缓存和前缀统计；
+- 推测请求在后台任务里执行，预测状态的指纹随任务一起保存；
+- 动作真正完成后比较实际状态的指纹：一致则直接使用推测结果（任务可能仍在进行，
+  等待剩余部分即可），不一致则取消任务，照常重新请求。
+"""
+from __future__ import annotations
+
+import asyncio
+import dataclasses
+import logging
+import time
+from datetime import timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from .actions import memory_lines
+from .agent_config import ACTION_FATIGUE_COST, SLEEP_RECOVER, SPECULATION_ATTR_BUCKET
+from .clock import RealTimeClock, action_seconds
+
+logger = logging.getLogger(__name__)
+
+
+def fingerprint(player, world) -> Tuple:
+    """决定下一步动作的关键状态；属性按区间粗分，避免小幅变化导致推测作废"""
+    return (
+        world.get_day(),
+        player.cur_location,
+        round(player.money),
+        tuple(player.inventory.held()),
+        tuple(sorted((k, int(a.current // SPECULATION_ATTR_BUCKET)) for k, a in player.attribute.items())),
+    )
+
+
+def predict_player(player, world, action: Dict[str, Any]):
+    """返回执行 action 之后的预测玩家副本；无法预测时返回 None"""
+    kind = action.get("type")
+    if kind not in ("move", "consume", "trade", "sleep", "wait"):
+        return None
+    lines = memory_lines(player, action)
+    predicted = dataclasses.replace(
+        player,
+        attribute={k: a.model_copy() for k, a in player.attribute.items()},
+        inventory=player.inventory.copy(),
+        memory=player.memory.copy(),
+        agent=player.agent.fork(),
+    )
+    inventory = predicted.inventory
+    if kind == "move":
+        predicted.cur_location = action.get("target", predicted.cur_location)
+    elif kind == "consume":
+        item, qty = action.get("item"), action.get("qty") or 1
+        item_id = world.item_registry.get(item)
+        if item_id is None:
+            return None
+        effect = (world.item_registry.meta[item_id].get("consumable") or {}).get("effect")
+        if not effect or not inventory.remove(item_id, qty):
+            return None
+        for attr, value in effect.items():
+            if attr in predicted.attribute:
+                state = predicted.attribute[attr]
+                state.current = min(state.current + value, 100)
+    elif kind == "trade":
+        market = world.locations.get("集市")
+        item, qty = action.get("item"), action.get("qty") or 1
+        data = (getattr(market, "items", None) or {}).get(item)
+        item_id = world.item_registry.get(item)
+        if data is None or item_id is None:
+            return None
+        price = float(data.get("cur_price", 0))
+        predicted.cur_location = "集市"
+        if action.get("mode") == "buy":
+            if not world.market_stock.has(item_id, qty) or predicted.money < price * qty:
+                return None
+            predicted.money -= price * qty
+            inventory.add(item_id, qty)
+        elif action.get("mode") == "sell":
+            if not inventory.remove(item_id, qty):
+                return None
+            predicted.money += price * 0.5 * qty
+        else:
+            return None
+    fatigue = predicted.attribute.get("fatigue")
+    if fatigue is not None:
+        if kind == "sleep":
+            fatigue.current = min(fatigue.current + SLEEP_RECOVER, fatigue.max_value)
+        fatigue.current -= ACTION_FATIGUE_COST.get(kind, 0)
+    # 实时时钟下记忆在动作播放完后写入；离散事件时钟在动作返回后才推进，写入时仍是开始时间
+    now = world.get_time()
+    if isinstance(world.clock, RealTimeClock):
+        now += timedelta(seconds=action_seconds(action, player.cur_location))
+    stamp = now.strftime("%Y-%m-%d %H:%M")
+    for memory_kind, text in lines:
+        predicted.memory.record(stamp, memory_kind, text)
+    return predicted
+
+
+class SpeculationStats:
+    def __init__(self):
+        self.started = 0
+        self.hits = 0
+        self.misses = 0
+        self.cancelled = 0
+        self.failed = 0
+        # 命中时推测任务已经跑了多久，即省下的等待时间
+        self.saved = 0.0
+
+    def snapshot(self) -> Dict[str, Any]:
+        resolved = self.hits + self.misses
+        return {
+            "started": self.started,
+            "hits": self.hits,
+            "misses": self.misses,
+            "cancelled": self.cancelled,
+            "failed": self.failed,
+            "hit_rate": round(self.hits / resolved, 4) if resolved else 0.0,
+            "saved_s": round(self.saved, 3),
+        }
+
+
+@dataclasses.dataclass
+class Speculation:
+    task: asyncio.Task
+    expected: Tuple
+    started: float
+    stats: SpeculationStats
+
+    async def resolve(self, player, world) -> Optional[List[Dict[str, Any]]]:
+        """实际状态与预测一致时返回推测得到的动作，否则取消并返回 None"""
+        if fingerprint(player, world) != self.expected:
+            self.stats.misses += 1
+            await self.cancel(count=False)
+            return None
+        self.stats.saved += time.perf_counter() - self.started
+        try:
+            actions = await self.task
+        except Exception:
+            logger.exception("speculative act failed")
+            self.stats.failed += 1
+            return None
+        self.stats.hits += 1
+        return actions
+
+    async def cancel(self, count: bool = True) -> None:
+        if count:
+            self.stats.cancelled += 1
+        if not self.task.done():
+            self.task.cancel()
+        await asyncio.gather(self.task, return_exceptions=True)
+
+
+class Speculator:
+    def __init__(self):
+        self.stats = SpeculationStats()
+
+    def start(self, ctx, plan: str, action: Dict[str, Any]) -> Optional[Speculation]:
+        """在 action 执行前调用：按预测状态在后台开始生成下一批动作"""
+        predicted = predict_player(ctx.player, ctx.world, action)
+        if predicted is None:
+            return None
+        spec_ctx = dataclasses.replace(ctx, player=predicted)
+        task = asyncio.create_task(ctx.act(spec_ctx, plan), name=f"speculative-act-{ctx.agent_id}")
+        self.stats.started += 1
+        return Speculation(
+            task=task,
+            expected=fingerprint(predicted, ctx.world),
+            started=time.perf_counter(),
+            stats=self.stats,
+        )
@@ -1,7 +1,12 @@
 import json,random
 from datetime import datetime
-from typing import List,Dict,Any
-from .models.schema import Container, Item, Location, Market
+from typing import List,Dict,Any,Optional
+from .attributes import AttributeTable
+from .clock import Clock, make_clock
+from .event_log import EventLog
+from .item_registry import CompactInventory, ItemRegistry
+from .models.state import Container, Item, Location, Market
+from .rng import stream as rng_stream
 from .agent_config import PLAYER_INFO,TIME_RATIO
 # from .player import Player
 from dataclasses import dataclass, field
@@ -12,17 +17,41 @@ class World:
     players: List[Any]
     product_list_path: str = "agent/product_list.json"
     time: datetime = field(default_factory=datetime.now)
+    # 游戏时钟，默认按 CLOCK_MODE 创建
+    clock: Optional[Clock] = None
+    # 事件日志，由 EventLog.attach 挂载；为 None 时 record 不做任何事
+    events: Optional[EventLog] = None
+    # 集市价格用的随机数流，默认取运行种子派生的 "market" 流
+    rng: Optional[random.Random] = None
     players_home:Dict[int,Location] = field(init=False)
     locations: Dict[str, Any] = field(init=False)
     item_data: Dict[str, Any] = field(init=False)
+    # 物品名 -> 整数 ID，背包 / 容器 / 集市库存都按 ID 计数
+    item_registry: ItemRegistry = field(init=False)
+    market_stock: CompactInventory = field(init=False)
+    # 各类状态的版本号（market / accessible:{id} / home:{id}），变化时递增
+    versions: Dict[str, int] = field(init=False)
+    # 所有玩家的生存属性表，player.attribute 是其中一行的视图
+    attributes: AttributeTable = field(init=False)
+    # 已完成每日结算的游戏日
+    settled_day: int = field(init=False)
 
     def __post_init__(self) -> None:
+        if self.clock is None:
+            self.clock = make_clock(self.time)
+        if self.rng is None:
+            self.rng = rng_stream("market")
+        self.versions = {}
         self.locations = {}
         self.players_home = {}
         # self.locations["河流"] = self._init_river()
         self.locations["集市"] = self._init_market()
         # self.locations["森林"] = self._init_forest()
         self._init_players_home()
+        for player in self.players:
+            player.inventory = CompactInventory.from_container(player.inventory, self.item_registry, owner=f"player:{player.id}")
+        self.attributes = AttributeTable.from_players(self.players)
+        self.settled_day = self.get_day()
 
 
     # --- 初始化逻辑 ---
@@ -42,7 +71,13 @@ class World:
         with open(self.product_list_path, "r", encoding="utf-8") as f:
             data = json.load(f)["market"]
         self.item_data = data["items"]
-        market = Market(description=data["description"], items=self.item_data)
+        # 商品表是外部数据，加载时用 pydantic 校验一次，运行期使用无校验的 Market
+        market = Market.load({"description": data["description"], "items": self.item_data})
+        self.item_registry = ItemRegistry(market.items)
+        # 库存从商品表搬进紧凑数组，Market.items 只保留价格和描述
+        self.market_stock = CompactInventory(self.item_registry, name="集市", owner="market")
+        for item_id, meta in enumerate(self.item_registry.meta):
+            self.market_stock.add(item_id, int(meta.pop("quantity", 0)))
         self.update_market(market)
         return market
     
@@ -81,18 +116,52 @@ class World:
             # 对第一次价格变动加大扰动
             if self.get_day() == 1:
                 vol *= 4
-            new_price = avg + vol * (2 * random.random() - 1) 
+            new_price = avg + vol * (2 * self.rng.random() - 1) 
             new_price = max(avg * 0.5, min(new_price, avg * 1.5))
             item["cur_price"] = round(new_price, 2)
+        self.bump("market")
+        self.record("prices", prices={name: item["cur_price"] for name, item in market.items.items()})
+
+    def settle_day(self, day: int) -> List[Any]:
+        """
+        每日结算：所有玩家统一衰减 24 小时属性并刷新集市。
+        同一游戏日只结算一次，多个 Agent 先后调用也不会重复扣减；返回本次死亡的玩家。
+        """
+        if day <= self.settled_day:
+            return []
+        self.settled_day = day
+        died = [self.players[row] for row in self.attributes.decay(24)]
+        self.record("settle", day=day)
+        self.update_market(self.locations["集市"])
+        return died
+
+    def is_alive(self, player: Any) -> bool:
+        row = getattr(player.attribute, "row", None)
+        return row is None or self.attributes.is_alive(row)
+
+    def record(self, kind: str, **data: Any) -> None:
+        """状态已经改变后调用，写一条事件；未开启事件日志时不做任何事"""
+        if self.events is not None:
+            self.events.append(self, kind, data)
+
+    def record_inventory(self, inventory: CompactInventory, item: str) -> None:
+        self.record("inventory", owner=inventory.owner, item=item, count=inventory.quantity(item))
+
+    def bump(self, key: str) -> int:
+        """状态变化后递增版本号，提示词据此判断对应段落是否需要重新渲染"""
+        self.versions[key] = self.versions.get(key, 0) + 1
+        return self.versions[key]
+
+    def version(self, key: str) -> int:
+        return self.versions.get(key, 0)
 
 
 
    
     """游戏时间处理"""
     def get_time(self) -> datetime:
-        """实际时间3分钟等于游戏时间1天"""
-        cur_time = self.time +(datetime.now() - self.time) * TIME_RATIO
-        return cur_time 
+        """实时模式下实际时间3分钟等于游戏时间1天；离散事件模式下由动作耗时推进"""
+        return self.clock.now()
     def get_format_time(self) -> str:
         """按照游戏日显示时间 第d日 HH:MM"""
         
@@ -0,0 +1,67 @@
+"""
+提示词构建耗时的微基准：对比关闭 / 开启段落缓存时 plan、act、summary 三类提示词的平均构建时间。
+
+模拟一段对局：每一轮构建三类提示词，并按固定频率写入记忆、刷新集市价格，
+使缓存既有命中也有失效。在 server 目录下运行：
+
+    python bench_prompt.py --rounds 2000
+"""
+import argparse
+import time
+
+from agent.agent_config import PLAYER_INFO
+from agent.new_prompt import PromptModule
+from agent.player import Player
+from agent.world import World
+
+
+class BenchPromptModule(PromptModule):
+    def write_prompt_log(self, prompt_type, prompt, player):
+        # 基准只测渲染，不写调试文件
+        pass
+
+
+def run(section_cache: bool, rounds: int, memory_every: int, market_every: int):
+    players = [
+        Player.from_raw(id=i + 1, raw=raw, player_num=len(PLAYER_INFO))
+        for i, raw in enumerate(PLAYER_INFO.values())
+    ]
+    world = World(players=players)
+    player = players[0]
+    builder = BenchPromptModule(section_cache=section_cache)
+    cost = {"plan": 0.0, "act": 0.0, "summary": 0.0}
+    for i in range(rounds):
+        if i % memory_every == 0:
+            player.memory.record(world.get_time().strftime("%Y-%m-%d %H:%M"), "wait", f"你等待了{i}秒")
+        if i % market_every == 0:
+            world.update_market(world.locations["集市"])
+        # 集市和家轮流出现，覆盖两种地点的段落
+        player.cur_location = "集市" if i % 2 else "家"
+        for kind, build in (
+            ("plan", builder.get_top_level_plan),
+            ("act", builder.get_local_action),
+            ("summary", builder.get_reflection_and_summary),
+        ):
+            start = time.perf_counter()
+            build(player, world)
+            cost[kind] += time.perf_counter() - start
+    return {k: v / rounds * 1e6 for k, v in cost.items()}, builder.sections.snapshot()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rounds", type=int, default=2000)
+    parser.add_argument("--memory-every", type=int, default=3)
+    parser.add_argument("--market-every", type=int, default=50)
+    args = parser.parse_args()
+
+    before, _ = run(False, args.rounds, args.memory_every, args.market_every)
+    after, stats = run(True, args.rounds, args.memory_every, args.market_every)
+    print(f"{'kind':<8}{'before(us)':>12}{'after(us)':>12}{'speedup':>10}")
+    for kind in before:
+        print(f"{kind:<8}{before[kind]:>12.1f}{after[kind]:>12.1f}{before[kind] / after[kind]:>9.2f}x")
+    print("section cache:", stats)
+
+
+if __name__ == "__main__":
+    main()
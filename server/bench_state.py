@@ -0,0 +1,80 @@
+"""
+状态模型的微基准：对比 pydantic 模型（validate_assignment=True）与 `__slots__` 运行时状态类型
+在动作处理热路径上的单次耗时。
+
+每种操作对应动作处理器里的一段写法：
+- attr：consume 回复属性，`attr.current = min(attr.current + v, max_value)`；
+- qty：买卖时已有物品 `quantity += qty`；
+- new_item：背包里新增一种物品（构造 Item 并放入容器）；
+- trade：模拟一次买入（查找或新增物品、叠加数量、扣减疲劳、用完移除）。
+在 server 目录下运行：
+
+    python bench_state.py --rounds 100000
+"""
+import argparse
+import time
+
+from agent.models import schema, state
+
+
+def _attr(mod):
+    return mod.Attribute(name="饥饿值", current=50.0, decay_per_hour=2.0)
+
+
+def bench_attr(mod, rounds: int) -> float:
+    attr = _attr(mod)
+    start = time.perf_counter()
+    for _ in range(rounds):
+        attr.current = min(attr.current + 0.5, attr.max_value)
+    return time.perf_counter() - start
+
+
+def bench_qty(mod, rounds: int) -> float:
+    item = mod.Item(name="面包", quantity=1)
+    start = time.perf_counter()
+    for _ in range(rounds):
+        item.quantity += 1
+    return time.perf_counter() - start
+
+
+def bench_new_item(mod, rounds: int) -> float:
+    container = mod.Container(name="背包")
+    start = time.perf_counter()
+    for i in range(rounds):
+        container.items["面包"] = mod.Item(name="面包", quantity=i, description="", function={})
+    return time.perf_counter() - start
+
+
+def bench_trade(mod, rounds: int) -> float:
+    container = mod.Container(name="背包")
+    fatigue = _attr(mod)
+    fatigue.current = 1e9
+    start = time.perf_counter()
+    for i in range(rounds):
+        name = "鱼" if i % 2 else "面包"
+        if container.items.get(name) is None:
+            container.items[name] = mod.Item(name=name, quantity=0, description="", function={})
+        container.items[name].quantity += 1
+        fatigue.current = fatigue.current - 1
+        if container.items[name].quantity > 3:
+            del container.items[name]
+    return time.perf_counter() - start
+
+
+BENCHES = {"attr": bench_attr, "qty": bench_qty, "new_item": bench_new_item, "trade": bench_trade}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rounds", type=int, default=100000)
+    args = parser.parse_args()
+
+    print(f"{'op':<10}{'pydantic(ns)':>14}{'slots(ns)':>12}{'speedup':>10}")
+    for op, bench in BENCHES.items():
+        before = bench(schema, args.rounds) / args.rounds * 1e9
+        after = bench(state, args.rounds) / args.rounds * 1e9
+        print(f"{op:<10}{before:>14.0f}{after:>12.0f}{before / after:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,28 @@
+import argparse
 import asyncio 
 import json
+from collections import deque
 from agent.player import Player
-from agent.agent_config import PLAYER_INFO
+from agent.agent_config import PLAYER_INFO,LLM_BATCH_ENABLED,ACT_STREAM_ENABLED,REFLEX_ENABLED,SPECULATIVE_ACT_ENABLED,LLM_RATE_LIMIT_ENABLED,LLM_LIMITER_LOG_INTERVAL,REFLECTION_BACKGROUND_ENABLED,ACTIONS_HISTORY_SIZE,EVENT_LOG_ENABLED,CHECKPOINT_ENABLED
 from agent.actions import ActionMethod
+from agent.agent import aclose_llm_clients
+from agent.action_parser import parse_stats
+from agent.llm_batcher import LLMBatcher, supports_batch
+from agent.log_sink import close_sink
+from agent.llm_cache import PromptCache
+from agent.metering import Meter
+from agent.rate_limit import AdaptiveLimiter
+from agent.reflex import ReflexEngine
+from agent.speculation import Speculator
+from agent.reflection import ReflectionWorker
+from agent.clock import SimClock
+from agent.event_log import EventLog
+from agent.checkpoint import Checkpointer, resume as resume_checkpoint
+from agent.rng import configure as configure_rng, get_rng
 from agent.world import World
 from server import AgentServer
 from typing import Dict,Any,List
-from agent.runtime import AgentManager,AgentRuntimeCtx,WsDispatcher
+from agent.runtime import AgentManager,AgentRuntimeCtx,HeadlessDispatcher,WsDispatcher
 import logging
 
 logger = logging.getLogger(__name__)
@@ -27,80 +43,159 @@ logging.getLogger("urllib3").setLevel(logging.WARNING)
 async def llm_plan(ctx:AgentRuntimeCtx,summary:str=None) -> str:
     if summary is not None:
         ctx.player.agent.prompt_builder.summary = summary
-    plan = await asyncio.to_thread(ctx.player.agent.plan, ctx.player, ctx.world)
+    plan = await ctx.player.agent.aplan(ctx.player, ctx.world)
     return plan
     
 
 async def llm_act(ctx:AgentRuntimeCtx,plan:str=None) -> List[Dict[str,Any]]:
     if plan is not None:
         ctx.player.agent.prompt_builder.plan = plan
-    actions = await asyncio.to_thread(ctx.player.agent.act, ctx.player, ctx.world)
+    actions = await ctx.player.agent.aact(ctx.player, ctx.world)
     return actions
 
-async def llm_summary(ctx:AgentRuntimeCtx,plan:str=None) -> str:
+async def llm_act_stream(ctx:AgentRuntimeCtx,plan:str=None):
     if plan is not None:
         ctx.player.agent.prompt_builder.plan = plan
-    summary = await asyncio.to_thread(ctx.player.agent.reflect, ctx.player, ctx.world)
-    ctx.player.agent.prompt_builder.summary = summary
-    return summary
+    async for action in ctx.player.agent.astream_act(ctx.player, ctx.world):
+        yield action
+
+async def llm_summary(ctx:AgentRuntimeCtx,plan:str=None) -> str:
+    # 在副本上构建反思提示词：后台反思与下一轮计划、行动并发，不能改写正在使用的计划和总结；
+    # 结果只通过返回值（后台时即 reflector.latest）交给下一次 llm_plan
+    agent = ctx.player.agent.fork()
+    if plan is not None:
+        agent.prompt_builder.plan = plan
+    return await agent.areflect(ctx.player, ctx.world)
 
 async def ws_link(ctx:AgentRuntimeCtx,action:Dict[str,Any]):
     status = await ctx.actionMethod.method_action(ctx,action)
     return status
 
 
-async def main():
+async def main(headless:bool=False,resume:str=None,seed:int=None):
+
+    # 提示词与回复日志由 log_sink 写入 debug_log/runs/<本次运行>，不再需要清空上一轮的目录
 
-    # 清空上一轮的debug日志,删除debug_log/resp目录下的所有文件，但不删除目录
-    import os
-    import shutil
-    resp_dir = "debug_log/resp"  
-    prompt_dir = "debug_log/prompt"  
-    if os.path.exists(resp_dir):
-        shutil.rmtree(resp_dir)
-        os.makedirs(resp_dir)
-    if os.path.exists(prompt_dir):
-        shutil.rmtree(prompt_dir)
-        os.makedirs(prompt_dir)
+    # 开启ws服务；无头模式不连 Unity，动作由 HeadlessDispatcher 在本地完成
+    wsserver = None
+    if not headless:
+        wsserver = AgentServer()
+        await wsserver.start()
 
-    # 开启ws服务
-    wsserver = AgentServer()
-    await wsserver.start()
+    # 随机数种子须在创建玩家与世界之前确定；--seed 优先于 RUN_SEED
+    rng = configure_rng(seed) if seed is not None else get_rng()
+    logger.info("Run seed: %d", rng.seed)
 
     # 初始化玩家
     players:List[Player] = [Player.from_raw(id=id+1,raw=raw,player_num=len(PLAYER_INFO)) for id,raw in enumerate(PLAYER_INFO.values())]
+    # 只有模型提供真正的批量接口时才合批；ChatOpenAI 等模型逐条发送，不经过合批器
+    batcher = LLMBatcher() if LLM_BATCH_ENABLED and all(supports_batch(p.agent.llm) for p in players) else None
+    if LLM_BATCH_ENABLED and batcher is None:
+        logger.info("LLM batching disabled: %s has no batch endpoint", type(players[0].agent.llm).__name__)
+    cache = PromptCache.from_config()
+    meter = Meter()
+    limiter = AdaptiveLimiter() if LLM_RATE_LIMIT_ENABLED else None
+    for p in players:
+        p.agent.batcher = batcher
+        p.agent.cache = cache
+        p.agent.meter = meter
+        p.agent.limiter = limiter
     
    
     # 初始化世界
     world = World(players=players)
     world_lock = asyncio.Lock()
+    if resume:
+        # 事件日志在恢复之后挂载，第 0 号快照即为恢复后的状态
+        resume_checkpoint(world, resume)
+    if EVENT_LOG_ENABLED:
+        EventLog().attach(world)
     
-    # 等待所有agent连接
-    needed = [f"agent-{p.id}" for p in players]
-    logger.info(f"Waiting for agents: {needed}")
-    while not all(wsserver.is_connected(k) for k in needed):
-        await asyncio.sleep(0.5)
-    
-    logger.info("All agents connected: {}".format(wsserver.connected_ids()))
+    if headless:
+        dispatcher = HeadlessDispatcher(world)
+        logger.info("Headless mode: actions are simulated locally")
+    else:
+        # 等待所有agent连接
+        needed = [f"agent-{p.id}" for p in players]
+        logger.info(f"Waiting for agents: {needed}")
+        while not all(wsserver.is_connected(k) for k in needed):
+            await asyncio.sleep(0.5)
+        
+        logger.info("All agents connected: {}".format(wsserver.connected_ids()))
+        dispatcher = WsDispatcher(wsserver)
 
 
     # 创建agent运行环境
-    dispatcher = WsDispatcher(wsserver)
 
-    ctxs = [AgentRuntimeCtx(actionMethod=ActionMethod(),agent_id=f"agent-{p.id}",player=p,world=world,world_lock=world_lock,dispatch=dispatcher,actions_history=[],plan=llm_plan,act=llm_act,summary=llm_summary,link=ws_link) for p in players]
+    reflex = ReflexEngine() if REFLEX_ENABLED else None
+    speculator = Speculator() if SPECULATIVE_ACT_ENABLED else None
+    ctxs = [AgentRuntimeCtx(actionMethod=ActionMethod(),agent_id=f"agent-{p.id}",player=p,world=world,world_lock=world_lock,dispatch=dispatcher,actions_history=deque(maxlen=ACTIONS_HISTORY_SIZE),plan=llm_plan,act=llm_act,summary=llm_summary,link=ws_link,act_stream=llm_act_stream if ACT_STREAM_ENABLED else None,reflex=reflex,speculator=speculator,reflector=ReflectionWorker(f"agent-{p.id}") if REFLECTION_BACKGROUND_ENABLED else None) for p in players]
 
     # 启动agent运行环境，并保持主协程存活
     mgr = AgentManager()
     await mgr.start(ctxs,tick_sleep=0.1)
+    checkpointer = None
+    if CHECKPOINT_ENABLED:
+        checkpointer = Checkpointer(world, world_lock)
+        checkpointer.start()
 
     try:
         while True:
-            await asyncio.sleep(3600)
+            if limiter is None:
+                await asyncio.sleep(3600)
+                continue
+            await asyncio.sleep(LLM_LIMITER_LOG_INTERVAL)
+            logger.info("LLM limiter: %s", limiter.snapshot())
     except (KeyboardInterrupt, asyncio.CancelledError):
         pass
     finally:
         await mgr.stop()
-        await wsserver.stop()
+        if checkpointer is not None:
+            await checkpointer.stop()
+            logger.info("Checkpoint: %s", checkpointer.stats())
+        if world.events is not None:
+            world.events.close()
+            logger.info("Event log: %s", world.events.stats())
+        if wsserver is not None:
+            await wsserver.stop()
+        if isinstance(dispatcher, HeadlessDispatcher):
+            logger.info("Headless dispatcher: %s", dispatcher.stats())
+        for p in players:
+            logger.info("Prompt prefix stats %s: %s", p.agent.name, p.agent.prompt_builder.prefix_stats.snapshot())
+            logger.info("Prompt section cache %s: %s", p.agent.name, p.agent.prompt_builder.sections.snapshot())
+            p.memory.flush()
+            logger.info("Memory stats %s: %s", p.agent.name, p.memory.stats())
+        logger.info("Action parse stats: %s", parse_stats.snapshot())
+        if world.events is not None:
+            world.events.close()
+            logger.info("Event log: %s", world.events.stats())
+        if isinstance(world.clock, SimClock):
+            logger.info("Sim clock: %s", world.clock.snapshot())
+        if reflex is not None:
+            logger.info("Reflex stats: %s", reflex.stats.snapshot())
+        if speculator is not None:
+            logger.info("Speculative act stats: %s", speculator.stats.snapshot())
+        for ctx in ctxs:
+            if ctx.reflector is not None:
+                logger.info("Background reflection %s: %s", ctx.agent_id, ctx.reflector.snapshot())
+        if batcher is not None:
+            await batcher.aclose()
+            logger.info("LLM batcher stats: %s", batcher.stats())
+        if cache is not None:
+            logger.info("LLM cache stats: %s", cache.stats())
+            cache.close()
+        if limiter is not None:
+            logger.info("LLM limiter stats: %s", limiter.snapshot())
+        await aclose_llm_clients()
+        logger.info("Debug log sink: %s", close_sink())
+        json_path, csv_path = meter.write_report()
+        logger.info("LLM metering: %s", meter.summary())
+        logger.info("LLM metering report written to %s / %s", json_path, csv_path)
 
 if __name__ == '__main__':
-    asyncio.run(main())
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--headless", action="store_true", help="不连接 Unity，在本地模拟动作（配合 CLOCK_MODE=\"sim\" 以最快速度运行）")
+    parser.add_argument("--resume", metavar="PATH", help="从断点文件恢复世界、玩家记忆与计划后继续运行（见 CHECKPOINT_PATH）")
+    parser.add_argument("--seed", type=int, help="运行种子，覆盖 RUN_SEED；同一种子下价格走势与模拟耗时可复现")
+    args = parser.parse_args()
+    asyncio.run(main(headless=args.headless,resume=args.resume,seed=args.seed))
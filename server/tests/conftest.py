@@ -0,0 +1,5 @@
+import os
+import sys
+
+# 测试按 server 目录下运行 main.py 时的方式导入 agent 包
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,67 @@
+"""动作解析流水线：提示词里的格式示例必须在本地阶段解析成功，不能落到 LLM 修复"""
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from agent.action_parser import ActionStreamParser, parse_action_object, parse_local, to_action_dicts
+from agent.item_registry import CompactInventory, ItemRegistry
+from agent.new_prompt import PromptModule
+
+
+def _guide_examples():
+    registry = ItemRegistry({})
+    player = SimpleNamespace(id=1, home="home-1", cur_location="家", accessible={"home-1": 1, "集市": 1})
+    world = SimpleNamespace(players_home={1: SimpleNamespace(inner_things={"储物柜": CompactInventory(registry, name="储物柜")})})
+    guide = PromptModule._render_action_guide(None, player, world)
+    return [line for line in guide.splitlines() if line.startswith("{\"type\"")]
+
+
+GUIDE_EXAMPLES = _guide_examples()
+
+
+def test_guide_has_examples():
+    types = {json.loads(line)["type"] for line in GUIDE_EXAMPLES}
+    assert {"move", "consume", "trade", "store", "retrieve", "wait", "finish"} <= types
+
+
+@pytest.mark.parametrize("line", GUIDE_EXAMPLES)
+def test_guide_example_parses_fast(line):
+    result, stage = parse_local(line)
+    assert stage == "fast"
+    assert to_action_dicts(result) == [json.loads(line)]
+
+
+def test_guide_examples_as_array():
+    result, stage = parse_local("[" + ",".join(GUIDE_EXAMPLES) + "]")
+    assert stage == "fast"
+    assert len(to_action_dicts(result)) == len(GUIDE_EXAMPLES)
+
+
+def test_trade_without_get_qty():
+    result, stage = parse_local('[{"type":"trade","mode":"buy","item":"面包","qty":2}]')
+    assert stage == "fast"
+    assert to_action_dicts(result) == [{"type": "trade", "mode": "buy", "item": "面包", "qty": 2}]
+
+
+def test_local_repair():
+    text = "```json\n{'mode':'buy','item':'面包','qty':2,}，{\"type\"：\"finish\"}\n```"
+    result, stage = parse_local(text)
+    assert stage == "repair"
+    assert to_action_dicts(result) == [
+        {"type": "trade", "mode": "buy", "item": "面包", "qty": 2},
+        {"type": "finish"},
+    ]
+
+
+def test_unparseable():
+    assert parse_local("我决定先休息一下") == (None, "failed")
+
+
+def test_stream_parser_splits_objects():
+    parser = ActionStreamParser()
+    text = '[{"type":"move","target":"集市"},{"type":"trade","mode":"buy","item":"面包","qty":2}]'
+    objects = []
+    for i in range(0, len(text), 5):
+        objects.extend(parser.feed(text[i:i + 5]))
+    assert [parse_action_object(o)["type"] for o in objects] == ["move", "trade"]
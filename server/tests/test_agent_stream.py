@@ -0,0 +1,104 @@
+"""流式动作：被拒绝的对象不能被跳过，它和之后的动作按原顺序经完整解析后产出"""
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+import agent.agent as agent_mod
+from agent.mock_llm import MockChatModel
+from agent.models.actions import ActionList
+
+
+class ScriptedModel(MockChatModel):
+    text: str = ""
+
+    def reply(self, text, rng):
+        return self.text
+
+
+class StubFixer:
+    def __init__(self, fixed):
+        self.fixed = fixed
+        self.inputs = []
+
+    async def aparse(self, text):
+        self.inputs.append(text)
+        return ActionList.model_validate(self.fixed)
+
+
+@pytest.fixture
+def make_agent(monkeypatch):
+    monkeypatch.setattr(agent_mod, "LLM_BACKEND", "mock")
+
+    def make(text):
+        ag = agent_mod.Agent("test")
+        ag.llm = ScriptedModel(text=text, latency=0.0, stream_chunk_size=7)
+        ag.prompt_builder.get_local_action = lambda player, world: "act"
+        return ag
+
+    return make
+
+
+def _collect(ag):
+    player = SimpleNamespace(id=1)
+    world = SimpleNamespace(get_day=lambda: 1)
+
+    async def run():
+        return [a async for a in ag.astream_act(player, world)]
+
+    return asyncio.run(run())
+
+
+def test_valid_stream_emits_in_order(make_agent):
+    ag = make_agent('[{"type":"move","target":"集市"},{"type":"trade","mode":"buy","item":"面包","qty":2},{"type":"finish"}]')
+    assert [a["type"] for a in _collect(ag)] == ["move", "trade", "finish"]
+
+
+def test_rejected_object_is_repaired_in_place(make_agent):
+    ag = make_agent('[{"type":"move","target":"集市"},{"type":"trade","mode":"buy","qty":2},{"type":"consume","item":"面包","qty":1}]')
+    fixed = [{"type": "trade", "mode": "buy", "item": "面包", "qty": 2}, {"type": "consume", "item": "面包", "qty": 1}]
+    ag.action_parser.fixer = StubFixer(fixed)
+    actions = _collect(ag)
+    assert [a["type"] for a in actions] == ["move", "trade", "consume"]
+    # 交给修复的是被拒绝的对象及其后的全部文本，已执行的 move 不在其中
+    assert len(ag.action_parser.fixer.inputs) == 1
+    assert "move" not in ag.action_parser.fixer.inputs[0]
+    assert "consume" in ag.action_parser.fixer.inputs[0]
+
+
+def test_rejected_object_never_skipped(make_agent):
+    ag = make_agent('[{"type":"move","target":"集市"},{"type":"trade","mode":"buy","qty":2},{"type":"consume","item":"面包","qty":1}]')
+    ag.action_parser.llm_repair = False
+    # 修复失败时退回兜底动作，后面的 consume 不能越过失败的 trade 单独执行
+    assert [a["type"] for a in _collect(ag)] == ["move", "wait"]
+
+
+class RecordingMeter:
+    def __init__(self):
+        self.calls = []
+
+    def record(self, name, kind, day, **kw):
+        self.calls.append(kw)
+
+    def budget_level(self, name, day):
+        return "normal"
+
+
+def test_usage_recorded_when_consumer_stops_early(make_agent):
+    ag = make_agent('[{"type":"move","target":"集市"},{"type":"finish"},{"type":"wait","seconds":5}]')
+    ag.meter = RecordingMeter()
+    player = SimpleNamespace(id=1)
+    world = SimpleNamespace(get_day=lambda: 1)
+
+    async def run():
+        gen = ag.astream_act(player, world)
+        async for action in gen:
+            if action["type"] == "finish":
+                break
+        await gen.aclose()
+
+    asyncio.run(run())
+    assert len(ag.meter.calls) == 1
+    call = ag.meter.calls[0]
+    assert not call["error"]
+    assert call["prompt_tokens"] > 0 and call["completion_tokens"] > 0
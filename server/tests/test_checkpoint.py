@@ -0,0 +1,141 @@
+"""断点只落在动作之间：动作在 world_lock 内一次写入世界，capture 也在 world_lock 内进行"""
+import asyncio
+import os
+from types import SimpleNamespace
+
+import pytest
+
+import agent.agent as agent_mod
+from agent.actions import ActionMethod
+from agent.agent_config import PLAYER_INFO
+from agent.checkpoint import Checkpointer
+from agent.player import Player
+from agent.world import World
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class GatedDispatch:
+    """gated(kwargs) 为真的指令（默认为属性动画）等到 release 之后才应答"""
+
+    def __init__(self, gated=lambda kwargs: kwargs.get("type") == "animation" and kwargs.get("target") != "item"):
+        self.gated = gated
+        self.in_animation = asyncio.Event()
+        self.release = asyncio.Event()
+
+    async def action(self, **kwargs):
+        if self.gated(kwargs):
+            self.in_animation.set()
+            await self.release.wait()
+        return {"status": "ok"}
+
+
+@pytest.fixture
+def world(monkeypatch):
+    monkeypatch.setattr(agent_mod, "LLM_BACKEND", "mock")
+    monkeypatch.chdir(SERVER_DIR)
+    players = [Player.from_raw(id=i + 1, raw=raw, player_num=len(PLAYER_INFO)) for i, raw in enumerate(PLAYER_INFO.values())]
+    return World(players=players)
+
+
+def _consumable(world):
+    for name in world.item_registry.names:
+        effect = (world.item_registry.data(name).get("consumable") or {}).get("effect")
+        if effect:
+            return name, effect
+    pytest.skip("商品表里没有可消耗物品")
+
+
+def test_consume_writes_world_only_after_animations(world, tmp_path):
+    item, effect = _consumable(world)
+    player = world.players[0]
+    method = ActionMethod()
+    method._increase_qty(world, player.inventory, item, 2)
+    for attr in effect:
+        player.attribute[attr].current = 10.0
+    item_id = world.item_registry.id(item)
+
+    async def scenario():
+        dispatch = GatedDispatch()
+        ctx = SimpleNamespace(player=player, world=world, dispatch=dispatch, agent_id="agent-1", world_lock=asyncio.Lock())
+        task = asyncio.create_task(method._run_action(ctx, {"type": "consume", "item": item, "qty": 1}))
+        await dispatch.in_animation.wait()
+        # 动画进行中：属性和背包都还没变
+        assert player.inventory.has(item_id, 2)
+        assert all(player.attribute[attr].current == 10.0 for attr in effect)
+        checkpointer = Checkpointer(world, ctx.world_lock, path=str(tmp_path / "ckpt"))
+        await checkpointer.save()
+        dispatch.release.set()
+        res = await task
+        assert res["OK"]
+        assert player.inventory.has(item_id, 1) and not player.inventory.has(item_id, 2)
+        assert all(player.attribute[attr].current == min(10.0 + value, 100) for attr, value in effect.items())
+
+    asyncio.run(scenario())
+
+
+def _go_to(kwargs):
+    return kwargs.get("cmd") == "go_to"
+
+
+def test_move_writes_world_only_after_arrival(world, tmp_path):
+    player = world.players[0]
+    origin = player.cur_location
+    assert player.accessible["集市"] == 1
+
+    async def scenario():
+        dispatch = GatedDispatch(_go_to)
+        ctx = SimpleNamespace(player=player, world=world, dispatch=dispatch, agent_id="agent-1", world_lock=asyncio.Lock())
+        task = asyncio.create_task(ActionMethod()._run_action(ctx, {"type": "move", "target": "集市"}))
+        await dispatch.in_animation.wait()
+        assert player.cur_location == origin
+        assert player.accessible["集市"] == 1
+        await Checkpointer(world, ctx.world_lock, path=str(tmp_path / "ckpt")).save()
+        dispatch.release.set()
+        res = await task
+        assert res["OK"], res
+        assert player.cur_location == "集市"
+        assert player.accessible["集市"] == 0
+
+    asyncio.run(scenario())
+
+
+def test_trade_moves_to_market_then_buys(world, tmp_path):
+    player = world.players[0]
+    item = next(iter(world.locations["集市"].items))
+    item_id = world.item_registry.id(item)
+    money = player.money
+    assert player.cur_location != "集市"
+
+    async def scenario():
+        dispatch = GatedDispatch(_go_to)
+        ctx = SimpleNamespace(player=player, world=world, dispatch=dispatch, agent_id="agent-1", world_lock=asyncio.Lock())
+        task = asyncio.create_task(
+            ActionMethod()._run_action(ctx, {"type": "trade", "mode": "buy", "item": item, "qty": 1})
+        )
+        await dispatch.in_animation.wait()
+        assert player.money == money
+        assert not player.inventory.has(item_id, 1)
+        await Checkpointer(world, ctx.world_lock, path=str(tmp_path / "ckpt")).save()
+        dispatch.release.set()
+        res = await task
+        assert res["OK"], res
+        assert player.cur_location == "集市"
+        assert player.inventory.has(item_id, 1)
+        assert player.money == pytest.approx(money - res["price"])
+
+    asyncio.run(scenario())
+
+
+def test_save_waits_for_world_lock(world, tmp_path):
+    async def scenario():
+        lock = asyncio.Lock()
+        checkpointer = Checkpointer(world, lock, path=str(tmp_path / "ckpt"))
+        async with lock:
+            task = asyncio.create_task(checkpointer.save())
+            await asyncio.sleep(0.01)
+            assert checkpointer.saves == 0
+        assert await task
+        assert checkpointer.saves == 1
+
+    asyncio.run(scenario())
@@ -0,0 +1,136 @@
+"""离散事件时钟：所有参与者都在等待时才推进，按唤醒时间顺序唤醒；退出与取消都要更新参与者计数"""
+import asyncio
+from datetime import datetime, timedelta
+
+from agent.clock import SimClock
+
+START = datetime(2026, 1, 1, 8, 0)
+
+
+async def _settle():
+    # 让已唤醒的协程跑到下一个 await
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+def _at(clock):
+    return (clock.now() - START).total_seconds()
+
+
+def test_single_participant_jumps_immediately():
+    async def scenario():
+        clock = SimClock(START)
+        clock.join()
+        await clock.elapse(90)
+        assert clock.now() == START + timedelta(seconds=90)
+        await clock.elapse(0)
+        assert _at(clock) == 90
+        assert clock.snapshot()["jumps"] == 1
+
+    asyncio.run(scenario())
+
+
+def test_wakes_in_deadline_order():
+    async def scenario():
+        clock = SimClock(START)
+        woke = []
+
+        async def agent(name, steps):
+            try:
+                for seconds in steps:
+                    await clock.elapse(seconds)
+                    woke.append((name, _at(clock)))
+            finally:
+                clock.leave()
+
+        # 与 main 一样先全部加入再开跑，否则先开跑的 Agent 会独自把时钟推走
+        clock.join()
+        clock.join()
+        await asyncio.gather(agent("a", [100, 100]), agent("b", [30, 30, 30]))
+        return woke, clock
+
+    woke, clock = asyncio.run(scenario())
+    assert woke == [("b", 30), ("b", 60), ("b", 90), ("a", 100), ("a", 200)]
+    assert clock.participants == 0
+    assert clock.snapshot()["waiting"] == 0
+
+
+def test_does_not_advance_while_a_participant_is_running():
+    async def scenario():
+        clock = SimClock(START)
+        clock.join()
+        clock.join()
+        sleeper = asyncio.create_task(clock.elapse(60))
+        await _settle()
+        # 另一个参与者还在“思考”，时钟不能跳
+        assert not sleeper.done()
+        assert _at(clock) == 0
+        clock.leave()
+        await _settle()
+        assert sleeper.done()
+        assert _at(clock) == 60
+
+    asyncio.run(scenario())
+
+
+def test_same_deadline_wakes_together_in_submit_order():
+    async def scenario():
+        clock = SimClock(START)
+        order = []
+
+        async def agent(name):
+            await clock.elapse(45)
+            order.append(name)
+
+        # 多一个仍在运行的参与者，由它退出触发推进，三个等待者都经事件循环唤醒
+        for _ in range(4):
+            clock.join()
+        tasks = [asyncio.create_task(agent(name)) for name in ("first", "second", "third")]
+        await _settle()
+        assert order == []
+        clock.leave()
+        await asyncio.gather(*tasks)
+        return order, clock
+
+    order, clock = asyncio.run(scenario())
+    assert order == ["first", "second", "third"]
+    assert _at(clock) == 45
+    assert clock.jumps == 1
+
+
+def test_cancelled_waiter_is_skipped_and_unblocks_others():
+    async def scenario():
+        clock = SimClock(START)
+        clock.join()
+        clock.join()
+        clock.join()
+        early = asyncio.create_task(clock.elapse(10))
+        late = asyncio.create_task(clock.elapse(50))
+        await _settle()
+        # 第三个参与者仍在运行：两者都在等
+        assert not early.done() and not late.done()
+        early.cancel()
+        await _settle()
+        assert early.cancelled()
+        assert clock.snapshot()["waiting"] == 1
+        # 被取消的参与者退出后，剩下的都在等待，时钟跳过已取消的 10 秒直接到 50 秒
+        clock.leave()
+        clock.leave()
+        await _settle()
+        assert late.done()
+        assert _at(clock) == 50
+        snap = clock.snapshot()
+        assert snap["participants"] == 1 and snap["waiting"] == 0
+
+    asyncio.run(scenario())
+
+
+def test_seek_moves_the_base_for_later_deadlines():
+    async def scenario():
+        clock = SimClock(START)
+        clock.join()
+        clock.seek(START + timedelta(hours=2))
+        await clock.elapse(60)
+        assert clock.now() == START + timedelta(hours=2, seconds=60)
+
+    asyncio.run(scenario())
@@ -0,0 +1,83 @@
+"""事件日志：快照 + 回放能把新建的 World 恢复到任意序号，包括两次快照之间的位置"""
+import json
+import os
+
+import pytest
+
+import agent.agent as agent_mod
+from agent.actions import ActionMethod
+from agent.agent_config import PLAYER_INFO
+from agent.event_log import EventLog, Replayer, capture
+from agent.player import Player
+from agent.world import World
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _world():
+    players = [Player.from_raw(id=i + 1, raw=raw, player_num=len(PLAYER_INFO)) for i, raw in enumerate(PLAYER_INFO.values())]
+    return World(players=players)
+
+
+@pytest.fixture(autouse=True)
+def _env(monkeypatch):
+    monkeypatch.setattr(agent_mod, "LLM_BACKEND", "mock")
+    monkeypatch.chdir(SERVER_DIR)
+
+
+def _state(world):
+    # 与快照文件一样经过一次 JSON，便于直接比较
+    return json.loads(json.dumps(capture(world), ensure_ascii=False))
+
+
+def _play(world, log):
+    """做一串会写事件的状态变化，返回每个序号之后的世界状态"""
+    states = {log.seq: _state(world)}
+    append = log.append
+
+    def recording_append(w, kind, data):
+        seq = append(w, kind, data)
+        states[seq] = _state(w)
+        return seq
+
+    log.append = recording_append
+    method = ActionMethod()
+    items = world.item_registry.names
+    for i, player in enumerate(world.players):
+        player.money -= 10 * (i + 1)
+        world.record("money", player=player.id, value=player.money)
+        method._increase_qty(world, player.inventory, items[i % len(items)], i + 1)
+        method._apply_attribute_delta(world, player, {"hunger": -5.0 * (i + 1)})
+        player.accessible["集市"] = 0
+        world.record("accessible", player=player.id, location="集市", value=0)
+        player.cur_location = "集市"
+        world.record("move", player=player.id, location="集市")
+    world.settle_day(world.settled_day + 1)
+    return states
+
+
+def test_snapshot_and_replay_round_trip(tmp_path):
+    world = _world()
+    log = EventLog(out_dir=str(tmp_path), run_id="run", snapshot_every=7, flush_every=3)
+    log.attach(world)
+    states = _play(world, log)
+    log.close()
+
+    replayer = Replayer(log.run_dir)
+    snaps = replayer.snapshot_seqs()
+    assert snaps[0] == 0 and len(snaps) >= 3
+    assert log.stats()["snapshots"] == len(snaps) and log.stats()["snapshot_errors"] == 0
+    # 快照内容是触发时的状态，而不是后台线程写盘时的状态
+    for seq in snaps:
+        assert replayer.load_snapshot(seq) == states[seq]
+
+    fresh = _world()
+    assert replayer.restore(fresh) == log.seq
+    assert _state(fresh) == _state(world)
+
+    # 两次快照之间的位置：从前一次快照开始回放部分事件
+    upto = snaps[1] + 3
+    assert upto not in snaps and upto in states
+    fresh = _world()
+    assert replayer.restore(fresh, upto=upto) == upto
+    assert _state(fresh) == states[upto]
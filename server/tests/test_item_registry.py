@@ -0,0 +1,90 @@
+"""紧凑库存：计数数组与持有集合保持一致，只在边界上转回 Container / dict"""
+import sys
+
+from agent.item_registry import CompactInventory, ItemRegistry
+from agent.models.state import Container, Item
+
+ITEMS = {
+    "面包": {"description": "充饥", "function": {"hunger": 20}},
+    "水": {"description": "解渴"},
+    "小麦": {"description": "原料", "function": "not a dict"},
+}
+
+
+def _registry():
+    return ItemRegistry({name: dict(meta) for name, meta in ITEMS.items()})
+
+
+def test_registry_assigns_dense_ids_in_table_order():
+    registry = _registry()
+    assert len(registry) == 3
+    assert [registry.id(name) for name in ITEMS] == [0, 1, 2]
+    assert registry.name(1) == "水"
+    assert registry.get("石头") is None and "石头" not in registry
+    assert registry.data("面包")["function"] == {"hunger": 20}
+    assert registry.data("石头") is None
+    # 名字经过 intern，和字面量是同一个对象
+    assert registry.names[0] is sys.intern("面包")
+
+
+def test_registry_meta_tracks_source_table():
+    table = {name: dict(meta) for name, meta in ITEMS.items()}
+    registry = ItemRegistry(table)
+    table["面包"]["price"] = 12
+    assert registry.data("面包")["price"] == 12
+
+
+def test_add_remove_keeps_held_set_in_sync():
+    registry = _registry()
+    inv = CompactInventory(registry, name="背包")
+    assert len(inv) == 0 and inv.to_dict() == {}
+    bread, water = registry.id("面包"), registry.id("水")
+    inv.add(water, 2)
+    inv.add(bread, 3)
+    assert len(inv) == 2
+    assert list(inv.held()) == [(bread, 3), (water, 2)]
+    assert inv.has(bread, 3) and not inv.has(bread, 4)
+    # 数量不足时不修改
+    assert not inv.remove(water, 3)
+    assert inv.count(water) == 2
+    assert inv.remove(water, 2)
+    assert inv.count(water) == 0 and len(inv) == 1
+    assert inv.to_dict() == {"面包": 3}
+    assert inv.quantity("面包") == 3 and inv.quantity("石头") == 0
+    # add 负数到 0 同样移出持有集合
+    inv.add(bread, -3)
+    assert len(inv) == 0 and list(inv.held()) == []
+
+
+def test_copy_is_independent():
+    registry = _registry()
+    inv = CompactInventory(registry, name="集市", owner="market")
+    inv.add(registry.id("小麦"), 5)
+    clone = inv.copy()
+    clone.add(registry.id("小麦"), -5)
+    clone.add(registry.id("水"), 1)
+    assert inv.to_dict() == {"小麦": 5}
+    assert clone.to_dict() == {"水": 1}
+    assert clone.owner == "market" and clone.name == "集市"
+
+
+def test_container_round_trip():
+    registry = _registry()
+    container = Container(
+        name="储物柜",
+        description="家里的柜子",
+        items={"水": Item(name="水", quantity=4), "面包": Item(name="面包", quantity=1)},
+    )
+    inv = CompactInventory.from_container(container, registry, owner="home:1:储物柜")
+    assert inv.owner == "home:1:储物柜"
+    assert inv.to_dict() == {"面包": 1, "水": 4}
+    inv.add(registry.id("小麦"), 2)
+
+    out = inv.to_container()
+    assert out.name == "储物柜" and out.description == "家里的柜子"
+    assert list(out.items) == ["面包", "水", "小麦"]
+    assert out.items["面包"].function == {"hunger": 20}
+    assert out.items["水"].description == "解渴" and out.items["水"].function == {}
+    # 元数据里 function 不是字典时按空字典输出
+    assert out.items["小麦"].quantity == 2 and out.items["小麦"].function == {}
+    assert CompactInventory.from_container(out, registry).to_dict() == inv.to_dict()
@@ -0,0 +1,49 @@
+"""合批只用于有真正批量接口的模型，其它模型的请求不等窗口直接发送"""
+import asyncio
+
+from langchain_core.messages import HumanMessage
+
+from agent.llm_batcher import LLMBatcher, supports_batch
+from agent.mock_llm import MockChatModel
+
+
+class PlainModel:
+    def __init__(self):
+        self.calls = 0
+
+    async def ainvoke(self, msgs):
+        self.calls += 1
+        return "ok"
+
+
+def test_batch_capable_model_gets_one_call():
+    model = MockChatModel(latency=0.0, batch_item_latency=0.0)
+    batcher = LLMBatcher(window=0.01)
+
+    async def run():
+        return await asyncio.gather(*(batcher.submit(model, [HumanMessage(f"第{i}条")]) for i in range(5)))
+
+    results = asyncio.run(run())
+    assert len(results) == 5 and all(r.content for r in results)
+    assert batcher.stats()["batches"] == 1
+    assert batcher.stats()["largest_batch"] == 5
+
+
+def test_model_without_batch_endpoint_is_sent_directly():
+    model = PlainModel()
+    batcher = LLMBatcher(window=10.0)
+
+    async def run():
+        return await asyncio.wait_for(batcher.submit(model, []), timeout=1.0)
+
+    assert asyncio.run(run()) == "ok"
+    assert model.calls == 1
+    assert batcher.stats()["batches"] == 0 and batcher.stats()["direct"] == 1
+
+
+def test_only_mock_backend_supports_batch():
+    from langchain_openai import ChatOpenAI
+
+    assert supports_batch(MockChatModel())
+    # ChatOpenAI 的 abatch 只是并发多次 ainvoke，main 不会为它创建合批器
+    assert not supports_batch(ChatOpenAI(model="gpt-4.1-mini", api_key="unused"))
@@ -0,0 +1,46 @@
+"""提示词缓存：命中不逐条提交、异步接口、LRU 淘汰与只读回放"""
+import asyncio
+
+from agent.llm_cache import PromptCache
+
+
+def test_async_roundtrip(tmp_path):
+    cache = PromptCache(path=str(tmp_path / "c.sqlite"))
+
+    async def run():
+        key = cache.make_key("m", [{"role": "user", "content": "你好"}])
+        assert await cache.aget(key) is None
+        await cache.aput(key, "回复")
+        return await cache.aget(key)
+
+    assert asyncio.run(run()) == "回复"
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+    cache.close()
+
+
+def test_hits_do_not_commit_each_time(tmp_path):
+    cache = PromptCache(path=str(tmp_path / "c.sqlite"))
+    cache.put("a", "1")
+    changes = cache._conn.total_changes
+    for _ in range(10):
+        assert cache.get("a") == "1"
+    assert cache._conn.total_changes == changes
+    cache.close()
+
+
+def test_lru_uses_batched_touches(tmp_path):
+    path = str(tmp_path / "c.sqlite")
+    cache = PromptCache(path=path, max_entries=2)
+    cache.put("a", "1")
+    cache.put("b", "2")
+    cache.get("a")
+    # 写入时先落下暂存的访问时间，淘汰的是最久未访问的 b
+    cache.put("c", "3")
+    assert cache.get("a") == "1" and cache.get("b") is None
+    cache.close()
+
+    replay = PromptCache(path=path, readonly=True)
+    assert replay.get("c") == "3"
+    replay.put("d", "4")
+    assert replay.get("d") is None
+    replay.close()
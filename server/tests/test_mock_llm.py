@@ -0,0 +1,48 @@
+"""LLM 替身的动作回复必须是完整合法的 ActionList，并且在本地解析的 fast 阶段通过"""
+import random
+
+import pytest
+
+from agent.action_parser import ACTION_LIST_ADAPTER, parse_local
+from agent.mock_llm import MockChatModel
+
+MARKET = "面包,描述:充饥,商店存货:5,价格:3\n瓶装水,描述:解渴,商店存货:5,价格:2\n鱼竿,描述:钓鱼,商店存货:1,价格:50\n"
+
+
+def _prompt(location, hunger=80, thirst=80, fatigue=80, money=100, backpack="面包*2"):
+    return (
+        f"你现在所在的位置是：{location}。\n你身上有 ￥{money}\n"
+        f"饥饿值 {hunger} 疲劳值 {fatigue} 口渴值 {thirst}\n你的背包里有：{backpack}\n" + MARKET
+    )
+
+
+PROMPTS = [
+    _prompt("集市"),
+    _prompt("集市", thirst=10, backpack=""),
+    _prompt("集市", hunger=10),
+    _prompt("家", fatigue=10),
+    _prompt("家", hunger=10, backpack=""),
+    _prompt("河边", fatigue=10),
+    _prompt("集市", money=0, backpack=""),
+]
+
+
+@pytest.mark.parametrize("prompt", PROMPTS)
+def test_actions_are_schema_valid(prompt):
+    model = MockChatModel(seed=0)
+    for i in range(20):
+        text = model.reply(prompt, random.Random(i))
+        ACTION_LIST_ADAPTER.validate_json(text)
+        assert parse_local(text)[1] == "fast"
+
+
+def test_trades_are_emitted():
+    model = MockChatModel(seed=0)
+    replies = [model.reply(_prompt("集市"), random.Random(i)) for i in range(20)]
+    assert any('"trade"' in r for r in replies)
+
+
+def test_same_prompt_same_reply():
+    model = MockChatModel(seed=7)
+    prompt = _prompt("集市")
+    assert model.reply(prompt, model._rng(prompt)) == model.reply(prompt, model._rng(prompt))
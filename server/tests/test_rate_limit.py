@@ -0,0 +1,187 @@
+"""LLM 限流器：令牌桶按时间补充、AIMD 加性增长 / 乘性下降、并发上限与 429 重试"""
+import asyncio
+
+import pytest
+
+import agent.rate_limit as rate_limit
+from agent.rate_limit import DECREASE_COOLDOWN, AdaptiveLimiter, TokenBucket
+from common.mock_llm import MockLLMError
+
+
+class FakeTime:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+@pytest.fixture
+def fake_time(monkeypatch):
+    clock = FakeTime()
+    monkeypatch.setattr(rate_limit.time, "monotonic", clock.monotonic)
+    return clock
+
+
+def _limiter(**kwargs):
+    params = dict(
+        rpm=6000, tpm=1_000_000, min_concurrency=1, max_concurrency=8, initial_concurrency=2,
+        target_latency=10.0, max_retries=3, backoff_base=0.0, backoff_max=0.0,
+    )
+    params.update(kwargs)
+    return AdaptiveLimiter(**params)
+
+
+def test_token_bucket_refills_over_time(fake_time):
+    bucket = TokenBucket(60)
+    assert bucket.wait_time(60) == 0.0
+    bucket.take(60)
+    assert bucket.wait_time(1) == pytest.approx(1.0)
+    fake_time.now += 0.5
+    assert bucket.wait_time(1) == pytest.approx(0.5)
+    fake_time.now += 1000
+    # 补充不超过容量
+    assert bucket.wait_time(60) == 0.0 and bucket.tokens == 60
+    # 单次超过容量的请求按容量算
+    assert bucket.wait_time(600) == 0.0
+
+
+def test_settle_corrects_token_estimate(fake_time):
+    limiter = _limiter(tpm=1000)
+    limiter.tokens.take(500)
+    limiter.settle(500, 200)
+    assert limiter.tokens.tokens == 800
+    limiter.settle(200, 400)
+    assert limiter.tokens.tokens == 600
+    # 没拿到实际用量时保持预估
+    limiter.settle(300, 0)
+    assert limiter.tokens.tokens == 600
+
+
+def test_additive_increase_on_fast_success(fake_time):
+    limiter = _limiter(initial_concurrency=2, max_concurrency=3)
+
+    async def ok():
+        return "ok"
+
+    async def scenario():
+        assert await limiter.run(ok) == "ok"
+        assert limiter.limit == pytest.approx(2.5)
+        await limiter.run(ok)
+        assert limiter.limit == pytest.approx(2.9)
+        for _ in range(5):
+            await limiter.run(ok)
+        assert limiter.limit == 3
+
+    asyncio.run(scenario())
+    assert limiter.increases == 3
+    assert limiter.calls == 7 and limiter.inflight == 0
+
+
+def test_multiplicative_decrease_once_per_cooldown(fake_time):
+    limiter = _limiter(initial_concurrency=8, max_retries=0)
+
+    async def limited():
+        raise MockLLMError("429")
+
+    async def scenario():
+        with pytest.raises(MockLLMError):
+            await limiter.run(limited)
+        assert limiter.limit == 4
+        # 冷却期内的第二次 429 不再下降
+        with pytest.raises(MockLLMError):
+            await limiter.run(limited)
+        assert limiter.limit == 4
+        fake_time.now += DECREASE_COOLDOWN
+        for _ in range(3):
+            with pytest.raises(MockLLMError):
+                await limiter.run(limited)
+            fake_time.now += DECREASE_COOLDOWN
+        # 不低于下限
+        assert limiter.limit == 1
+
+    asyncio.run(scenario())
+    assert limiter.throttled == 5 and limiter.decreases == 4
+
+
+def test_slow_success_decreases(fake_time):
+    limiter = _limiter(initial_concurrency=4, target_latency=1.0)
+
+    async def slow():
+        fake_time.now += 2.5
+        return "ok"
+
+    async def okay():
+        fake_time.now += 1.5
+        return "ok"
+
+    async def scenario():
+        await limiter.run(okay)
+        # 延迟在 1~2 倍目标之间：不增不减
+        assert limiter.limit == 4
+        await limiter.run(slow)
+        assert limiter.limit == 2
+
+    asyncio.run(scenario())
+
+
+def test_inflight_never_exceeds_limit():
+    limiter = _limiter(initial_concurrency=2, max_concurrency=2)
+    peak = 0
+
+    async def call():
+        nonlocal peak
+        peak = max(peak, limiter.inflight)
+        await asyncio.sleep(0.01)
+        return limiter.inflight
+
+    async def scenario():
+        results = await asyncio.gather(*(limiter.run(call) for _ in range(6)))
+        assert max(results) <= 2
+
+    asyncio.run(scenario())
+    assert peak == 2
+    assert limiter.inflight == 0 and limiter.waiting == 0 and limiter.calls == 6
+
+
+def test_retries_rate_limited_then_succeeds():
+    limiter = _limiter(max_retries=3)
+    attempts = []
+    seen = []
+
+    async def flaky():
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise MockLLMError("429")
+        return "ok"
+
+    assert asyncio.run(limiter.run(flaky, on_retry=seen.append)) == "ok"
+    assert len(attempts) == 3 and limiter.retries == 2 and len(seen) == 2
+
+
+def test_gives_up_after_max_retries_and_skips_other_errors():
+    limiter = _limiter(max_retries=2)
+    attempts = []
+
+    async def always_limited():
+        attempts.append(1)
+        raise MockLLMError("429")
+
+    async def broken():
+        attempts.append(1)
+        raise ValueError("bad request")
+
+    with pytest.raises(MockLLMError):
+        asyncio.run(limiter.run(always_limited))
+    assert len(attempts) == 3
+    attempts.clear()
+    with pytest.raises(ValueError):
+        asyncio.run(limiter.run(broken))
+    assert len(attempts) == 1 and limiter.retries == 2
+
+
+def test_backoff_is_bounded_full_jitter():
+    limiter = _limiter(backoff_base=0.5, backoff_max=4.0)
+    for attempt in range(1, 8):
+        cap = min(4.0, 0.5 * 2 ** attempt)
+        assert all(0 <= limiter.backoff(attempt) <= cap for _ in range(20))
@@ -0,0 +1,45 @@
+"""后台反思在 Agent 副本上进行，结果只通过 reflector.latest 交给下一轮计划"""
+import asyncio
+import os
+from types import SimpleNamespace
+
+import pytest
+
+import agent.agent as agent_mod
+from agent.agent_config import PLAYER_INFO
+from agent.player import Player
+from agent.reflection import ReflectionWorker
+from agent.world import World
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture
+def world(monkeypatch):
+    monkeypatch.setattr(agent_mod, "LLM_BACKEND", "mock")
+    monkeypatch.chdir(SERVER_DIR)
+    players = [Player.from_raw(id=i + 1, raw=raw, player_num=len(PLAYER_INFO)) for i, raw in enumerate(PLAYER_INFO.values())]
+    return World(players=players)
+
+
+def test_background_summary_leaves_live_prompt_module_alone(world):
+    from main import llm_summary
+
+    player = world.players[0]
+    builder = player.agent.prompt_builder
+    builder.plan = "本轮的新计划"
+    builder.summary = "上一次的总结"
+    ctx = SimpleNamespace(player=player, world=world)
+
+    async def scenario():
+        worker = ReflectionWorker("agent-1")
+        worker.submit(lambda: llm_summary(ctx, "上一轮的旧计划"))
+        await worker._queue.join()
+        await worker.stop()
+        return worker
+
+    worker = asyncio.run(scenario())
+    assert worker.stats.completed == 1
+    assert isinstance(worker.latest, str) and worker.latest
+    assert builder.plan == "本轮的新计划"
+    assert builder.summary == "上一次的总结"
@@ -0,0 +1,44 @@
+"""推测执行：预测副本要带上这一步的记忆，且不能改动真实 Agent 的提示词模块"""
+import os
+
+import pytest
+
+import agent.agent as agent_mod
+from agent.actions import MEMORY_TEXT
+from agent.agent_config import PLAYER_INFO
+from agent.player import Player
+from agent.speculation import predict_player
+from agent.world import World
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture
+def world(monkeypatch):
+    monkeypatch.setattr(agent_mod, "LLM_BACKEND", "mock")
+    monkeypatch.chdir(SERVER_DIR)
+    players = [Player.from_raw(id=i + 1, raw=raw, player_num=len(PLAYER_INFO)) for i, raw in enumerate(PLAYER_INFO.values())]
+    return World(players=players)
+
+
+def test_predicted_memory_matches_handler_text(world):
+    player = world.players[0]
+    item = world.item_registry.names[0]
+    before = len(player.memory)
+    predicted = predict_player(player, world, {"type": "trade", "mode": "buy", "item": item, "qty": 1})
+    texts = [event.text for event in predicted.memory.recent]
+    assert texts[-2:] == [
+        MEMORY_TEXT["move"].format(origin=player.cur_location, target="集市"),
+        MEMORY_TEXT["buy"].format(qty=1, item=item),
+    ]
+    assert len(player.memory) == before
+
+
+def test_speculation_uses_its_own_prompt_builder(world):
+    player = world.players[0]
+    predicted = predict_player(player, world, {"type": "move", "target": "集市"})
+    predicted.agent.prompt_builder.plan = "推测用的计划"
+    predicted.agent.prompt_builder.sections.get("memory_act", "k", lambda: "推测")
+    assert player.agent.prompt_builder.plan != "推测用的计划"
+    assert player.agent.prompt_builder.sections.get("memory_act", "k", lambda: "真实") == "真实"
+    assert predicted.agent.llm is player.agent.llm
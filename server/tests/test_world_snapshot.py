@@ -0,0 +1,125 @@
+"""DesicionLayer 的共享快照：只重建版本变化的部分，其余沿用上一份快照里的对象；pin 期间所有角色拿到同一份"""
+import os
+import sys
+from types import MappingProxyType
+
+import pytest
+
+# DesicionLayer 用绝对导入（model.…）；追加到末尾，不遮住 server 自己的 config
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "DesicionLayer"))
+
+from model.state.WorldSnapshot import SnapshotManager, loc_key  # noqa: E402
+
+
+class FakeCatalog:
+    def __init__(self):
+        self.version = 1
+
+    def snapshot(self):
+        return MappingProxyType({"version": self.version})
+
+
+class FakeLocation:
+    def __init__(self, stock):
+        self.stock = stock
+
+    def observe(self):
+        return {"stock": dict(self.stock), "tags": ["open"]}
+
+
+class FakeWorld:
+    """SnapshotManager 用到的 WorldState 接口"""
+
+    def __init__(self):
+        self.day = 0
+        self.catalog = FakeCatalog()
+        self.locations = {"market": FakeLocation({"bread": 3}), "farm": FakeLocation({"wheat": 5})}
+        self.versions = {}
+
+    def version(self, key):
+        return self.versions.get(key, 0)
+
+    def touch_location(self, loc_id):
+        key = loc_key(loc_id)
+        self.versions[key] = self.versions.get(key, 0) + 1
+
+
+@pytest.fixture
+def world():
+    return FakeWorld()
+
+
+def test_unchanged_world_returns_same_snapshot(world):
+    manager = SnapshotManager(world)
+    first = manager.get()
+    assert manager.get() is first
+    assert manager.stats() == {"builds": 1, "reused": 1, "location_builds": 2, "catalog_builds": 1}
+
+
+def test_only_touched_location_is_rebuilt(world):
+    manager = SnapshotManager(world)
+    first = manager.get()
+    world.locations["market"].stock["bread"] = 1
+    # 没有 bump 版本号时修改不可见
+    assert manager.get() is first
+    world.touch_location("market")
+    second = manager.get()
+    assert second is not first
+    assert second.location_snapshot["market"]["stock"]["bread"] == 1
+    assert second.location_snapshot["farm"] is first.location_snapshot["farm"]
+    assert second.catalog_snapshot is first.catalog_snapshot
+    assert second.versions[loc_key("market")] == 1
+    assert manager.location_builds == 3 and manager.catalog_builds == 1
+
+
+def test_day_change_rebuilds_without_touching_parts(world):
+    manager = SnapshotManager(world)
+    first = manager.get()
+    world.day += 1
+    second = manager.get()
+    assert second.day == 1 and first.day == 0
+    assert second.location_snapshot["market"] is first.location_snapshot["market"]
+    assert manager.location_builds == 2
+
+
+def test_catalog_reload_rebuilds_catalog(world):
+    manager = SnapshotManager(world)
+    first = manager.get()
+    world.catalog.version += 1
+    second = manager.get()
+    assert second.catalog_snapshot is not first.catalog_snapshot
+    assert second.catalog_snapshot["version"] == 2
+    assert manager.catalog_builds == 2
+
+
+def test_removed_location_is_dropped(world):
+    manager = SnapshotManager(world)
+    manager.get()
+    del world.locations["farm"]
+    snap = manager.get()
+    assert set(snap.location_snapshot) == {"market"}
+    # 同 id 的地点重新出现时重新构建，不复用删除前的对象
+    world.locations["farm"] = FakeLocation({"wheat": 0})
+    assert manager.get().location_snapshot["farm"]["stock"]["wheat"] == 0
+
+
+def test_snapshot_is_read_only(world):
+    snap = SnapshotManager(world).get()
+    with pytest.raises(TypeError):
+        snap.location_snapshot["market"]["stock"]["bread"] = 0
+    with pytest.raises(TypeError):
+        snap.location_snapshot["new"] = {}
+    assert snap.location_snapshot["market"]["tags"] == ("open",)
+
+
+def test_pin_holds_snapshot_until_unpin(world):
+    manager = SnapshotManager(world)
+    pinned = manager.pin()
+    world.touch_location("market")
+    world.day += 1
+    assert manager.get() is pinned
+    manager.unpin()
+    fresh = manager.get()
+    assert fresh is not pinned and fresh.day == 1
+    # 再次 pin 取的是当前世界而不是上一次固定的那份
+    assert manager.pin() is fresh